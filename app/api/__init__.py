@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import review, webhook
+from app.api.endpoints import metrics, review, webhook
 
 api_router = APIRouter()
 
 api_router.include_router(webhook.router, tags=["webhook"])
 api_router.include_router(review.router, prefix="/api", tags=["review"])
+api_router.include_router(metrics.router, prefix="/api", tags=["metrics"])
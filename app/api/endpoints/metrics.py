@@ -0,0 +1,48 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter
+
+from app.infra.ai.client import get_http_client
+from app.infra.ai.router import get_endpoint_router
+from app.infra.ai.single_flight import get_single_flight
+from app.infra.cache.file_review_cache import get_file_review_cache
+from app.infra.cache.http_cache import get_conditional_cache
+from app.infra.cache.idempotency import get_delivery_deduplicator
+from app.infra.cache.redis_client import redis_stats
+from app.infra.cache.response_cache import get_response_cache
+from app.infra.cache.snapshot_cache import get_snapshot_cache
+from app.infra.config.settings import get_settings
+from app.infra.debouncer import get_debouncer
+from app.infra.git.factory import GitClientFactory
+from app.infra.job_queue import get_job_queue
+from app.infra.scheduler import get_scheduler
+from app.models.pipeline.anchoring import anchor_stats
+from app.models.pipeline.minify import minify_stats
+
+router = APIRouter()
+settings = get_settings()
+
+
+@router.get("/metrics")
+async def get_metrics() -> Dict[str, Any]:
+    """
+    获取缓存等运行时指标
+    """
+    metrics = {
+        "ai_response_cache": get_response_cache().stats(),
+        "ai_single_flight": get_single_flight().stats(),
+        "ai_endpoints": get_endpoint_router(get_http_client()).stats(),
+        "comment_anchoring": anchor_stats(),
+        "diff_minify": minify_stats(),
+        "file_review_cache": get_file_review_cache().stats(),
+        "git_connection_pool": GitClientFactory.get_client().pool_stats(),
+        "git_http_cache": get_conditional_cache().stats(),
+        "git_snapshot_cache": get_snapshot_cache().stats(),
+        "mr_debouncer": get_debouncer().stats(),
+        "webhook_deliveries": get_delivery_deduplicator().stats(),
+        "redis": redis_stats(),
+        "scheduler": get_scheduler().stats(),
+    }
+    if settings.USE_JOB_QUEUE:
+        metrics["job_queue"] = await get_job_queue().stats()
+    return metrics
@@ -5,15 +5,15 @@ from pydantic import BaseModel
 
 from app.models.comment import Comment, Discussion
 from app.models.review import ReviewResult
-from app.services.discussion_service import DiscussionService
-from app.services.reviewer_service import ReviewerService
+from app.services.discussion_service import DiscussionService, get_discussion_service
+from app.services.reviewer_service import ReviewerService, get_reviewer_service
 
 router = APIRouter()
 
 
 @router.post("/pulls/{owner}/{repo}/{mr_id}/review", response_model=ReviewResult)
 async def create_review(
-    owner: str, repo: str, mr_id: str, reviewer_service: ReviewerService = Depends()
+    owner: str, repo: str, mr_id: str, reviewer_service: ReviewerService = Depends(get_reviewer_service)
 ):
     """
     对指定的 PR 进行代码审查
@@ -33,7 +33,7 @@ async def reply_to_comment(
     repo: str,
     mr_id: str,
     comment_id: str,
-    reviewer_service: ReviewerService = Depends(),
+    reviewer_service: ReviewerService = Depends(get_reviewer_service),
 ):
     """
     回复 PR 中的评论
@@ -49,7 +49,7 @@ async def reply_to_comment(
     "/pulls/{owner}/{repo}/{mr_id}/discussions", response_model=List[Discussion]
 )
 async def list_discussions(
-    owner: str, repo: str, mr_id: str, discussion_service: DiscussionService = Depends()
+    owner: str, repo: str, mr_id: str, discussion_service: DiscussionService = Depends(get_discussion_service)
 ):
     """
     获取 PR 的所有讨论
@@ -1,17 +1,21 @@
 import asyncio
 import re
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Union
 import logging
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 
-from app.infra.git.base_webhook_handler import WebHookEvent, WebHookEventType
+from app.infra.cache.idempotency import get_delivery_deduplicator
+from app.infra.debouncer import get_debouncer
+from app.infra.git.base_webhook_handler import MergeRequestCommentEvent, WebHookEvent, WebHookEventType
+from app.infra.job_queue import JobKind, get_job_queue
+from app.infra.scheduler import JobClass, get_scheduler
 from app.infra.git.github.webhook_handler import GitHubWebhookHandler
 from app.infra.git.gitlab.webhook_handler import GitLabWebhookHandler
 from app.models.const import BOT_PREFIX
 from app.models.git import MergeRequest
 from app.models.review import ReviewResult
-from app.services.reviewer_service import ReviewerService
+from app.services.reviewer_service import ReviewerService, get_reviewer_service
 from app.infra.config.settings import get_settings
 logger = logging.getLogger(__name__)
 
@@ -27,14 +31,32 @@ async def verify_webhook():
     return {"status": "Webhook verified", "message": "GET request received"}
 
 
+def parse_instruction(comment_body: str) -> Optional[str]:
+    """解析评论中的 #ai: 指令"""
+    match = re.search(r'#ai:\s*(\w+)', comment_body)
+    if not match:
+        logger.warning("No instruction found")
+        return None
+    return match.group(1)
+
+
 async def process_pr(
-    owner: str, repo: str, mr_id: str, reviewer_service: ReviewerService
+    owner: str,
+    repo: str,
+    mr_id: str,
+    reviewer_service: ReviewerService,
+    head_sha: Optional[str] = None,
+    incremental: bool = False,
 ):
     """异步处理 PR"""
     try:
-        await reviewer_service.review_mr(owner, repo, mr_id)
+        await get_scheduler().run(
+            JobClass.INCREMENTAL if incremental else JobClass.FULL,
+            f"{owner}/{repo}",
+            lambda: reviewer_service.review_mr(owner, repo, mr_id, head_sha=head_sha, incremental=incremental),
+        )
     except Exception as e:
-        print(f"Error processing PR: {e}")
+        logger.exception(f"Error processing PR: {e}")
 
 async def process_comment_with_instruction(
     owner: str,
@@ -44,17 +66,16 @@ async def process_comment_with_instruction(
     comment_body: str,
 ):
     """异步处理带有指令的评论"""
-    match = re.search(r'#ai:\s*(\w+)', comment_body)
-    if match:
-        instruction = match.group(1)
-        if instruction == "review":
-            await reviewer_service.review_mr(
-                owner=owner, repo=repo, mr_id=mr_id, check_limit=False
-            )
-        else:
-            logger.warning(f"Unknown instruction: {instruction}")
-    else:
-        logger.warning("No instruction found")
+    instruction = parse_instruction(comment_body)
+    if instruction == "review":
+        # 有上次审查记录时只审查之后的新提交
+        await get_scheduler().run(
+            JobClass.INCREMENTAL,
+            f"{owner}/{repo}",
+            lambda: reviewer_service.review_mr(owner=owner, repo=repo, mr_id=mr_id, check_limit=False, incremental=True),
+        )
+    elif instruction:
+        logger.warning(f"Unknown instruction: {instruction}")
 
 async def process_comment(
     owner: str,
@@ -65,11 +86,43 @@ async def process_comment(
 ):
     """异步处理评论"""
     try:
-        await reviewer_service.handle_comment(
-            owner=owner, repo=repo, mr_id=mr_id, comment_id=comment_id
+        await get_scheduler().run(
+            JobClass.REPLY,
+            f"{owner}/{repo}",
+            lambda: reviewer_service.handle_comment(owner=owner, repo=repo, mr_id=mr_id, comment_id=comment_id),
         )
     except Exception as e:
-        print(f"Error processing comment: {e}")
+        logger.exception(f"Error processing comment: {e}")
+
+
+async def enqueue_comment(event_data: MergeRequestCommentEvent) -> Optional[str]:
+    """将评论事件投递到任务队列，由 worker 进程执行"""
+    queue = get_job_queue()
+    if '#ai:' in event_data.comment_body:
+        instruction = parse_instruction(event_data.comment_body)
+        if instruction != "review":
+            if instruction:
+                logger.warning(f"Unknown instruction: {instruction}")
+            return None
+        return await queue.enqueue(
+            JobKind.REVIEW_MR,
+            {
+                "owner": event_data.owner,
+                "repo": event_data.repo,
+                "mr_id": event_data.mr_id,
+                "check_limit": False,
+                "incremental": True,
+            },
+        )
+    return await queue.enqueue(
+        JobKind.HANDLE_COMMENT,
+        {
+            "owner": event_data.owner,
+            "repo": event_data.repo,
+            "mr_id": event_data.mr_id,
+            "comment_id": event_data.comment_id,
+        },
+    )
 
 
 @router.post("/webhook/{service}", response_model=Union[ReviewResult, Dict[str, Any]])
@@ -77,7 +130,7 @@ async def handle_git_webhook(
     service: str,
     request: Request,
     background_tasks: BackgroundTasks,
-    reviewer_service: ReviewerService = Depends(),
+    reviewer_service: ReviewerService = Depends(get_reviewer_service),
 ):
     """Handle webhooks from Git services
     
@@ -102,6 +155,9 @@ async def handle_git_webhook(
         if not event_info:
             return {"message": "Event ignored"}
 
+        if event_info.event_type == WebHookEventType.DUPLICATE:
+            return {"message": "Duplicate delivery ignored"}
+
         # Handle ping event
         if event_info.event_type == WebHookEventType.PING:
             return {
@@ -110,11 +166,27 @@ async def handle_git_webhook(
                 "data": {},
             }
 
-        # Handle MR/PR event
+        # Handle MR/PR event, bursts for the same MR are coalesced into one review
         if event_info.event_type == WebHookEventType.MERGE_REQUEST:
             event_data = event_info.event_data
-            background_tasks.add_task(process_pr, event_data.owner, event_data.repo, event_data.mr_id, reviewer_service)
-            return {"message": f"MR review task for {event_data.owner}/{event_data.repo}#{event_data.mr_id} scheduled"}
+            coalesced = await get_debouncer().submit(
+                event_data,
+                lambda event: process_pr(
+                    event.owner, event.repo, event.mr_id, reviewer_service, event.head_sha, event.incremental
+                ),
+            )
+            return {
+                "message": f"MR review task for {event_data.owner}/{event_data.repo}#{event_data.mr_id} scheduled",
+                "coalesced": coalesced,
+            }
+
+        # Hand comment events to the worker pool
+        if settings.USE_JOB_QUEUE and event_info.event_type == WebHookEventType.MERGE_REQUEST_COMMENT:
+            event_data = event_info.event_data
+            job_id = await enqueue_comment(event_data)
+            if job_id is None:
+                return {"message": "Event ignored"}
+            return {"message": f"Task for {event_data.owner}/{event_data.repo}#{event_data.mr_id} queued", "job_id": job_id}
 
         # Handle comment event
         elif event_info.event_type == WebHookEventType.MERGE_REQUEST_COMMENT:
@@ -134,5 +206,9 @@ async def handle_git_webhook(
             return {"message": f"Event {event_info.event_type} ignored"}
 
     except Exception as e:
+        # Let the platform retry deliveries that were not scheduled
+        delivery_key = getattr(request.state, "delivery_key", None)
+        if delivery_key:
+            await get_delivery_deduplicator().forget(delivery_key)
         logger.exception(f"Error handling webhook: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,19 +1,52 @@
+import asyncio
 import logging
+import math
 import os
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import AsyncIterator, Dict, List, Optional, Union
 import httpx
-from openai import OpenAI
 
-from app.infra.cache.redis_client import RedisClient
+from app.infra.ai.router import EndpointRouter, get_endpoint_router
+from app.infra.ai.single_flight import get_single_flight
+from app.infra.ai.tokenizer import get_tokenizer
+from app.infra.cache.redis_client import get_redis_client
+from app.infra.cache.response_cache import get_response_cache
 from app.infra.config.settings import get_settings
-from app.infra.rate_limiter import RateLimiter
+from app.infra.rate_limiter import get_rate_limiter
+from app.infra.scheduler import JobClass, current_job_class
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# 所有 AIClient 共享的异步连接池
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享的异步 HTTP 客户端"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            verify=False,
+            timeout=settings.GPT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.GPT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GPT_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.GPT_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """关闭共享的异步 HTTP 客户端"""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
 
 class Message:
     def __init__(self, role: str, content: str):
@@ -30,22 +63,27 @@ class Message:
 
 
 class AIClient:
-    def __init__(self):
-        self.http_client = httpx.Client(verify=False)
-        self.client = OpenAI(
-            api_key=settings.GPT_API_KEY, base_url=settings.GPT_API_URL, http_client=self.http_client
-        )
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        if http_client is None:
+            self.http_client = get_http_client()
+            self.router = get_endpoint_router(self.http_client)
+        else:
+            self.http_client = http_client
+            self.router = EndpointRouter(settings.gpt_endpoints, http_client)
         self.model = settings.GPT_MODEL
-        self.redis_client = RedisClient()
+        self.redis_client = get_redis_client()
         self.use_debug_cache = settings.USE_AI_DEBUG_CACHE
         self.cache_dir = Path(settings.AI_CACHE_DIR)
+        self.response_cache = get_response_cache()
+        self.single_flight = get_single_flight()
         self.timeout = settings.GPT_TIMEOUT
-        self.rate_limiter = RateLimiter()
+        self.rate_limiter = get_rate_limiter()
         self.max_tokens = settings.MAX_TOKENS
+        self.tokenizer = get_tokenizer()
         
     def _count_tokens(self, text: str) -> int:
         """计算文本的 token 数量"""
-        return len(text) // 4
+        return self.tokenizer.count(text)
 
     def _check_max_tokens(
         self, messages: List[Dict[str, str]]
@@ -77,131 +115,269 @@ class AIClient:
             ]
         return []
 
-    def _get_cached_response(self, messages: List[Message]) -> Optional[str]:
-        """从缓存获取响应"""
-        if not self.use_debug_cache:
+    def _read_debug_cache(self, cache_key: str) -> Optional[str]:
+        """读取调试缓存文件"""
+        cache_file = self.cache_dir / f"{cache_key}.json"
+        # 如果缓存文件不存在，使用默认响应
+        if not cache_file.exists():
             return None
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return f.read()
 
-        try:
-            # 使用最后一条用户消息作为缓存键
-            user_messages = [msg for msg in messages if msg.role == "user"]
-            if not user_messages:
-                return None
-
-            last_user_msg = user_messages[-1].content
-            cache_key = last_user_msg.lower().replace(" ", "_")[:50] + ".json"
-            cache_file = self.cache_dir / cache_key
-
-            # 如果缓存文件不存在，使用默认响应
-            if not cache_file.exists():
-                return None
-
-            with open(cache_file, "r", encoding="utf-8") as f:
-                response = f.read()
-                logger.debug(f"使用缓存响应: {cache_key}")
-                return response
-        except Exception as e:
-            logger.exception("读取缓存响应失败")
-            return None
+    def _write_debug_cache(self, cache_key: str, response: str):
+        """写入调试缓存文件"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.cache_dir / f"{cache_key}.json", "w", encoding="utf-8") as f:
+            f.write(response)
 
-    def _save_to_cache(self, messages: List[Message], response: str):
+    async def _get_cached_response(self, cache_key: str) -> Optional[str]:
+        """从缓存获取响应"""
+        if self.use_debug_cache:
+            try:
+                # 文件 I/O 放到线程池，避免阻塞事件循环
+                response = await asyncio.to_thread(self._read_debug_cache, cache_key)
+                if response is not None:
+                    logger.debug(f"使用调试缓存响应: {cache_key}")
+                    return response
+            except Exception as e:
+                logger.exception("读取缓存响应失败")
+
+        if settings.AI_RESPONSE_CACHE_ENABLED:
+            return await self.response_cache.get(cache_key)
+        return None
+
+    async def _save_to_cache(self, cache_key: str, response: str):
         """保存响应到缓存"""
-        if not self.use_debug_cache:
-            return
+        if self.use_debug_cache:
+            try:
+                await asyncio.to_thread(self._write_debug_cache, cache_key, response)
+                logger.debug(f"保存响应到调试缓存: {cache_key}")
+            except Exception as e:
+                logger.exception("保存响应到缓存失败")
 
-        try:
-            user_messages = [msg for msg in messages if msg.role == "user"]
-            if not user_messages:
-                return
+        if settings.AI_RESPONSE_CACHE_ENABLED:
+            await self.response_cache.set(cache_key, response)
 
-            last_user_msg = user_messages[-1].content
-            cache_key = last_user_msg.lower().replace(" ", "_")[:50] + ".json"
-            cache_file = self.cache_dir / cache_key
+    def _route(self, endpoint, route: Optional[Dict[str, str]]) -> str:
+        """端点实际使用的模型，route 不为空时记录下来供调用方计算缓存键"""
+        model = endpoint.model or self.model
+        if route is not None:
+            route["model"] = model
+        return model
 
-            os.makedirs(self.cache_dir, exist_ok=True)
-            with open(cache_file, "w", encoding="utf-8") as f:
-                f.write(response)
-            logger.debug(f"保存响应到缓存: {cache_key}")
-        except Exception as e:
-            logger.exception("保存响应到缓存失败")
+    async def _stream_completion(
+        self,
+        chat_messages: List[Dict[str, str]],
+        temperature: float = settings.GPT_TEMPERATURE,
+        route: Optional[Dict[str, str]] = None,
+    ) -> AsyncIterator[str]:
+        """以流式方式调用 AI 接口，逐段产出响应文本"""
+        # 故障转移只发生在建立流之前，流开始后的错误直接抛出
+        completion = await self.router.call(
+            lambda client, endpoint: client.chat.completions.create(
+                model=self._route(endpoint, route),
+                messages=[
+                    {"role": msg["role"], "content": msg["content"]}
+                    for msg in chat_messages
+                ],
+                timeout=self.timeout,
+                temperature=temperature,
+                stream=True,
+            )
+        )
+        async for chunk in completion:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-    async def chat(
+    async def _create_completion(
         self,
-        messages: List[Message],
-        session_id: Optional[str] = None,
+        chat_messages: List[Dict[str, str]],
         temperature: float = settings.GPT_TEMPERATURE,
         stream: bool = False,
+        route: Optional[Dict[str, str]] = None,
     ) -> str:
-        """发送消息到 AI 并获取回复"""
-        # 检查是否使用缓存
-        if self.use_debug_cache:
-            cached_response = self._get_cached_response(messages)
-            if cached_response:
-                logger.info("使用缓存的响应")
-                return cached_response
+        """调用 AI 接口并返回完整响应文本，全程不阻塞事件循环"""
+        if stream:
+            full_response = []
+            async for delta in self._stream_completion(chat_messages, temperature, route):
+                full_response.append(delta)
+            return "".join(full_response)
 
-        # 检查速率限制
-        key = self.rate_limiter.get_ai_requests_key()
-        if not await self.rate_limiter.check_and_increment(
-            key, settings.MAX_AI_REQUESTS_PER_HOUR
-        ):
-            raise RuntimeError(
-                f"已达到每小时 AI 请求限制 ({settings.MAX_AI_REQUESTS_PER_HOUR})"
+        completion = await self.router.call(
+            lambda client, endpoint: client.chat.completions.create(
+                model=self._route(endpoint, route),
+                messages=[
+                    {"role": msg["role"], "content": msg["content"]}
+                    for msg in chat_messages
+                ],
+                timeout=self.timeout,
+                temperature=temperature,
             )
+        )
+        return completion.choices[0].message.content
 
-        logger.info("开始 AI 对话")
-        # 如果提供了session_id，获取历史记录
+    def _cache_key(self, model: str, temperature: float, chat_messages: List[Dict[str, str]]) -> str:
+        return self.response_cache.fingerprint(model, temperature, chat_messages)
+
+    async def _build_chat_messages(
+        self, messages: List[Message], session_id: Optional[str]
+    ) -> List[Dict[str, str]]:
+        """拼接历史记录和新消息"""
         chat_messages = []
+        # 如果提供了session_id，获取历史记录
         if session_id:
             history = await self.get_chat_history(session_id)
             chat_messages.extend([msg.to_dict() for msg in history])
 
         # 添加新消息
         chat_messages.extend([msg.to_dict() for msg in messages])
+        return chat_messages
+
+    def _request_cost(self, chat_messages: List[Dict[str, str]]) -> int:
+        """按 token 数计算请求消耗的配额，大型审查比简短回复消耗更多"""
+        tokens = sum(self._count_tokens(msg["content"]) for msg in chat_messages)
+        return max(1, math.ceil(tokens / settings.AI_REQUEST_TOKENS_PER_COST_UNIT))
 
-        # 截断消息以符合 token 限制
-        self._check_max_tokens(chat_messages)
-
-        # 调用 API
-        completion = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": msg["role"], "content": msg["content"]}
-                for msg in chat_messages
-            ],
-            timeout=self.timeout,
-            temperature=temperature,
-            stream=stream,
+    async def _check_rate_limit(self, cost: int = 1):
+        """检查速率限制，审查任务不能使用为评论回复预留的配额"""
+        key = self.rate_limiter.get_ai_requests_key()
+        reserve = 0
+        if current_job_class.get() not in (None, JobClass.REPLY):
+            reserve = math.ceil(settings.MAX_AI_REQUESTS_PER_HOUR * settings.AI_REPLY_RESERVED_RATIO)
+        if not await self.rate_limiter.check_and_increment(
+            key, settings.MAX_AI_REQUESTS_PER_HOUR, cost=cost, reserve=reserve
+        ):
+            raise RuntimeError(
+                f"已达到每小时 AI 请求限制 ({settings.MAX_AI_REQUESTS_PER_HOUR})"
+            )
+
+    async def _save_chat_history(
+        self, session_id: Optional[str], chat_messages: List[Dict[str, str]], response_text: str
+    ):
+        """如果有session_id，保存对话历史"""
+        if not session_id:
+            return
+        chat_messages.append(
+            {
+                "role": "assistant",
+                "content": response_text,
+                "timestamp": datetime.utcnow().isoformat(),
+            }
         )
+        await self.redis_client.set_chat_history(session_id, chat_messages)
 
-        # 获取响应
-        if stream:
-            full_response = []
-            for chunk in completion:
-                if chunk.choices[0].delta.content:
-                    full_response.append(chunk.choices[0].delta.content)
-            response_text = "".join(full_response)
+    async def chat(
+        self,
+        messages: List[Message],
+        session_id: Optional[str] = None,
+        temperature: float = settings.GPT_TEMPERATURE,
+        stream: bool = False,
+    ) -> str:
+        """发送消息到 AI 并获取回复"""
+        chat_messages = await self._build_chat_messages(messages, session_id)
+
+        # 检查是否命中缓存，缓存键覆盖路由选中的模型、温度和完整的消息列表
+        cache_key = self._cache_key(self.router.preferred_model() or self.model, temperature, chat_messages)
+        response_text = await self._get_cached_response(cache_key)
+        if response_text is not None:
+            logger.info(f"使用缓存的响应: {cache_key[:12]}")
         else:
-            response_text = completion.choices[0].message.content
+            async def call_upstream() -> str:
+                await self._check_rate_limit(self._request_cost(chat_messages))
 
-        # 保存到缓存
-        if self.use_debug_cache:
-            self._save_to_cache(messages, response_text)
+                logger.info("开始 AI 对话")
+                # 截断消息以符合 token 限制
+                self._check_max_tokens(chat_messages)
 
-        # 如果有session_id，保存对话历史
-        if session_id:
-            chat_messages.append(
-                {
-                    "role": "assistant",
-                    "content": response_text,
-                    "timestamp": datetime.utcnow().isoformat(),
-                }
-            )
-            await self.redis_client.set_chat_history(session_id, chat_messages)
+                # 调用 API
+                route: Dict[str, str] = {}
+                text = await self._create_completion(
+                    chat_messages, temperature=temperature, stream=stream, route=route
+                )
 
+                # 按实际响应的模型保存到缓存（故障转移可能切换到其他模型的端点）
+                await self._save_to_cache(self._cache_key(route["model"], temperature, chat_messages), text)
+                return text
+
+            # 相同的并发请求只调用一次上游
+            response_text = await self.single_flight.do(cache_key, call_upstream)
+
+        await self._save_chat_history(session_id, chat_messages, response_text)
         return response_text
 
+    async def chat_stream(
+        self,
+        messages: List[Message],
+        session_id: Optional[str] = None,
+        temperature: float = settings.GPT_TEMPERATURE,
+    ) -> AsyncIterator[str]:
+        """发送消息到 AI，在模型生成过程中逐段产出回复
+
+        命中缓存时一次性产出完整回复。
+        """
+        chat_messages = await self._build_chat_messages(messages, session_id)
+
+        cache_key = self._cache_key(self.router.preferred_model() or self.model, temperature, chat_messages)
+        response_text = await self._get_cached_response(cache_key)
+        if response_text is not None:
+            logger.info(f"使用缓存的响应: {cache_key[:12]}")
+            yield response_text
+        else:
+            deltas: "asyncio.Queue[str]" = asyncio.Queue()
+
+            async def call_upstream() -> str:
+                await self._check_rate_limit(self._request_cost(chat_messages))
+
+                logger.info("开始 AI 流式对话")
+                self._check_max_tokens(chat_messages)
+
+                full_response = []
+                route: Dict[str, str] = {}
+                async for delta in self._stream_completion(chat_messages, temperature, route):
+                    full_response.append(delta)
+                    deltas.put_nowait(delta)
+                text = "".join(full_response)
+
+                await self._save_to_cache(self._cache_key(route["model"], temperature, chat_messages), text)
+                return text
+
+            # 作为 leader 时边生成边产出；合并到其他请求时等待完整结果后一次性产出
+            flight = asyncio.ensure_future(self.single_flight.do(cache_key, call_upstream))
+            streamed = False
+            try:
+                while not flight.done() or not deltas.empty():
+                    if deltas.empty():
+                        getter = asyncio.ensure_future(deltas.get())
+                        await asyncio.wait({getter, flight}, return_when=asyncio.FIRST_COMPLETED)
+                        if not getter.done():
+                            getter.cancel()
+                            continue
+                        delta = getter.result()
+                    else:
+                        delta = deltas.get_nowait()
+                    streamed = True
+                    yield delta
+                response_text = await flight
+            finally:
+                # 调用方提前关闭时停止上游调用，合并到本请求的其他调用方会自行重新请求
+                if not flight.done():
+                    flight.cancel()
+            if not streamed:
+                yield response_text
+
+        await self._save_chat_history(session_id, chat_messages, response_text)
+
     async def clear_chat_history(self, session_id: str):
         """清除聊天历史"""
         await self.redis_client.delete_chat_history(session_id)
-        logger.info(f"清除聊天历史: {session_id}")
\ No newline at end of file
+        logger.info(f"清除聊天历史: {session_id}")
+
+_ai_client: Optional[AIClient] = None
+
+
+def get_ai_client() -> AIClient:
+    """获取全局共享的 AI 客户端"""
+    global _ai_client
+    if _ai_client is None:
+        _ai_client = AIClient()
+    return _ai_client
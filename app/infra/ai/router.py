@@ -0,0 +1,202 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from app.infra.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+class AIEndpoint:
+    """一个 OpenAI 兼容端点及其多个 key，记录延迟和错误率的 EWMA"""
+
+    def __init__(
+        self,
+        url: str,
+        keys: List[str],
+        http_client: httpx.AsyncClient,
+        weight: float = 1.0,
+        model: Optional[str] = None,
+        max_retries: int = 2,
+    ):
+        self.url = url
+        self.weight = max(weight, 0.01)
+        self.model = model
+        self.clients = [
+            AsyncOpenAI(api_key=key, base_url=url, http_client=http_client, max_retries=max_retries)
+            for key in keys
+        ]
+        self.key_cooldown_until = [0.0] * len(keys)
+        self._next_key = 0
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.cooldown_until = 0.0
+        self.inflight = 0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return self.cooldown_until <= now and bool(self.available_keys(now))
+
+    def available_keys(self, now: float) -> List[int]:
+        """按轮询顺序返回未处于冷却中的 key"""
+        count = len(self.clients)
+        order = [(self._next_key + i) % count for i in range(count)]
+        return [i for i in order if self.key_cooldown_until[i] <= now]
+
+    def take_key(self, key_index: int) -> AsyncOpenAI:
+        self._next_key = (key_index + 1) % len(self.clients)
+        return self.clients[key_index]
+
+    def score(self) -> float:
+        """越小越优先：EWMA 延迟按并发数和错误率放大，再除以权重
+
+        还没有延迟数据的端点得分为 0，会被优先探测。
+        """
+        latency = self.latency_ewma or 0.0
+        return (
+            latency
+            * (1 + self.inflight)
+            * (1 + settings.AI_ENDPOINT_ERROR_PENALTY * self.error_ewma)
+            / self.weight
+        )
+
+    def record_success(self, latency: float):
+        alpha = settings.AI_ENDPOINT_EWMA_ALPHA
+        self.requests += 1
+        self.latency_ewma = (
+            latency if self.latency_ewma is None else alpha * latency + (1 - alpha) * self.latency_ewma
+        )
+        self.error_ewma = (1 - alpha) * self.error_ewma
+
+    def record_failure(self, cooldown: float = 0.0):
+        alpha = settings.AI_ENDPOINT_EWMA_ALPHA
+        self.requests += 1
+        self.failures += 1
+        self.error_ewma = alpha + (1 - alpha) * self.error_ewma
+        if cooldown:
+            self.cooldown_until = time.monotonic() + cooldown
+
+    def cool_key(self, key_index: int, cooldown: float):
+        self.key_cooldown_until[key_index] = time.monotonic() + cooldown
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "url": self.url,
+            "weight": self.weight,
+            "keys": len(self.clients),
+            "available_keys": len(self.available_keys(now)),
+            "latency_ewma": self.latency_ewma,
+            "error_ewma": round(self.error_ewma, 4),
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "cooling_down": self.cooldown_until > now,
+        }
+
+
+def _retry_after(error: openai.APIStatusError) -> Optional[float]:
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EndpointRouter:
+    """在多个 AI 端点间按 EWMA 延迟和错误率路由，429/5xx 时故障转移并轮换 key"""
+
+    def __init__(self, endpoints: List[Dict[str, Any]], http_client: httpx.AsyncClient):
+        # 多个端点或 key 时由路由器负责重试，关闭 SDK 自带的重试
+        total_keys = sum(len(endpoint["keys"]) for endpoint in endpoints)
+        max_retries = 0 if total_keys > 1 else 2
+        self.endpoints = [
+            AIEndpoint(
+                url=endpoint["url"],
+                keys=endpoint["keys"],
+                http_client=http_client,
+                weight=float(endpoint.get("weight", 1.0)),
+                model=endpoint.get("model"),
+                max_retries=max_retries,
+            )
+            for endpoint in endpoints
+        ]
+
+    def candidates(self) -> List[AIEndpoint]:
+        """可用端点按得分排序；全部在冷却时按冷却结束时间排序，仍然尝试"""
+        now = time.monotonic()
+        available = [endpoint for endpoint in self.endpoints if endpoint.available(now)]
+        if available:
+            return sorted(available, key=lambda endpoint: endpoint.score())
+        return sorted(self.endpoints, key=lambda endpoint: endpoint.cooldown_until)
+
+    def preferred_model(self) -> Optional[str]:
+        """当前优先使用的端点配置的模型，未配置时返回 None"""
+        candidates = self.candidates()
+        return candidates[0].model if candidates else None
+
+    async def call(self, fn: Callable[[AsyncOpenAI, AIEndpoint], Awaitable[T]]) -> T:
+        """选择端点和 key 调用 fn，失败时依次转移到其他 key 和端点"""
+        last_error: Optional[Exception] = None
+        attempts = 0
+        for endpoint in self.candidates():
+            keys = endpoint.available_keys(time.monotonic()) or list(range(len(endpoint.clients)))
+            for key_index in keys:
+                if attempts >= settings.AI_ENDPOINT_MAX_ATTEMPTS:
+                    raise last_error
+                attempts += 1
+
+                client = endpoint.take_key(key_index)
+                endpoint.inflight += 1
+                start = time.monotonic()
+                try:
+                    result = await fn(client, endpoint)
+                except openai.APIStatusError as e:
+                    last_error = e
+                    if e.status_code == 429:
+                        # key 级别限流：冷却该 key，换下一个 key
+                        cooldown = _retry_after(e) or settings.AI_ENDPOINT_KEY_COOLDOWN
+                        logger.warning(f"AI 端点限流 {endpoint.url} key#{key_index}，冷却 {cooldown}s")
+                        endpoint.cool_key(key_index, cooldown)
+                        endpoint.record_failure()
+                        continue
+                    if e.status_code >= 500:
+                        logger.warning(f"AI 端点错误 {endpoint.url}: {e.status_code}，切换端点")
+                        endpoint.record_failure(settings.AI_ENDPOINT_COOLDOWN)
+                        break
+                    raise
+                except (openai.APIConnectionError, httpx.TransportError) as e:
+                    last_error = e
+                    logger.warning(f"AI 端点连接失败 {endpoint.url}: {str(e)}，切换端点")
+                    endpoint.record_failure(settings.AI_ENDPOINT_COOLDOWN)
+                    break
+                else:
+                    endpoint.record_success(time.monotonic() - start)
+                    return result
+                finally:
+                    endpoint.inflight -= 1
+
+        if last_error is not None:
+            raise last_error
+        raise RuntimeError("没有可用的 AI 端点")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+
+_router: Optional[EndpointRouter] = None
+
+
+def get_endpoint_router(http_client: httpx.AsyncClient) -> EndpointRouter:
+    """获取基于配置的共享端点路由器"""
+    global _router
+    if _router is None:
+        _router = EndpointRouter(settings.gpt_endpoints, http_client)
+    return _router
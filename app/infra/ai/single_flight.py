@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.infra.cache.redis_client import RedisClient
+from app.infra.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 仅在锁仍属于自己时释放
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _LeaderCancelled(Exception):
+    """进程内 leader 被取消，等待者需要自行请求"""
+
+
+class SingleFlight:
+    """合并相同指纹的并发请求，只让一个请求访问上游
+
+    同一进程内的请求共享一个 Future；跨 worker 时通过 Redis 锁选出 leader，
+    其他 worker 轮询 leader 写入的结果。Redis 不可用时退化为仅进程内合并。
+    """
+
+    def __init__(self, namespace: str = "ai:singleflight", redis_client: Optional[RedisClient] = None):
+        self.namespace = namespace
+        self.redis_client = redis_client or RedisClient()
+        self.lock_ttl_ms = settings.AI_SINGLE_FLIGHT_LOCK_TTL * 1000
+        self.result_ttl_ms = settings.AI_SINGLE_FLIGHT_RESULT_TTL * 1000
+        self.wait_timeout = settings.AI_SINGLE_FLIGHT_WAIT_TIMEOUT
+        self.poll_interval = settings.AI_SINGLE_FLIGHT_POLL_INTERVAL
+        self._inflight: Dict[str, "asyncio.Future[str]"] = {}
+        self.counters: Dict[str, int] = {
+            "leaders": 0,
+            "local_shared": 0,
+            "remote_shared": 0,
+            "fallbacks": 0,
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        """执行 fn，相同 key 的并发调用共享同一个结果"""
+        if not settings.AI_SINGLE_FLIGHT_ENABLED:
+            return await fn()
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.counters["local_shared"] += 1
+            logger.info(f"合并进程内相同的 AI 请求: {key[:12]}")
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                # leader 的调用方提前结束，由等待者重新发起请求（其中一个成为新的 leader）
+                logger.info(f"合并的 AI 请求被取消，重新请求: {key[:12]}")
+                return await self.do(key, fn)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._do_distributed(key, fn)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # 只取消 leader 自己，等待者收到 _LeaderCancelled 后自行请求
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _do_distributed(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        """通过 Redis 锁在多个 worker 间合并请求"""
+        lock_key = f"{self.namespace}:lock:{key}"
+        result_key = f"{self.namespace}:result:{key}"
+        token = str(uuid.uuid4())
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            try:
+                redis = (await self.redis_client.initialize()).redis
+                acquired = await redis.set(lock_key, token, nx=True, px=self.lock_ttl_ms)
+            except Exception as e:
+                logger.warning(f"single-flight 无法访问 Redis，直接请求: {str(e)}")
+                self.counters["fallbacks"] += 1
+                return await fn()
+
+            if acquired:
+                self.counters["leaders"] += 1
+                try:
+                    result = await fn()
+                    await self._publish(redis, result_key, result)
+                    return result
+                finally:
+                    await self._release(redis, lock_key, token)
+
+            result = await self._wait_for_result(redis, lock_key, result_key, deadline)
+            if result is not None:
+                self.counters["remote_shared"] += 1
+                logger.info(f"复用其他 worker 的 AI 响应: {key[:12]}")
+                return result
+            if time.monotonic() >= deadline:
+                logger.warning(f"等待其他 worker 的 AI 响应超时，直接请求: {key[:12]}")
+                self.counters["fallbacks"] += 1
+                return await fn()
+            # leader 失败且未写入结果，重新竞争锁
+
+    async def _wait_for_result(
+        self, redis, lock_key: str, result_key: str, deadline: float
+    ) -> Optional[str]:
+        """轮询 leader 的结果，锁释放且无结果时返回 None"""
+        interval = self.poll_interval
+        while time.monotonic() < deadline:
+            try:
+                result = await redis.get(result_key)
+                if result is not None:
+                    return result.decode("utf-8") if isinstance(result, bytes) else result
+                if not await redis.exists(lock_key):
+                    return None
+            except Exception as e:
+                logger.warning(f"轮询 single-flight 结果失败: {str(e)}")
+                return None
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, 2.0)
+        return None
+
+    async def _publish(self, redis, result_key: str, result: str):
+        try:
+            await redis.set(result_key, result, px=self.result_ttl_ms)
+        except Exception as e:
+            logger.warning(f"写入 single-flight 结果失败: {str(e)}")
+
+    async def _release(self, redis, lock_key: str, token: str):
+        try:
+            await redis.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.warning(f"释放 single-flight 锁失败: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "inflight": len(self._inflight)}
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """获取全局共享的 single-flight 实例"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
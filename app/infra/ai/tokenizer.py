@@ -0,0 +1,118 @@
+import logging
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from app.infra.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+
+# 中日韩文字和全角符号，常见 BPE 编码下基本每个字符至少一个 token
+_CJK_PATTERN = re.compile(r"[　-〿㐀-䶿一-鿿豈-﫿＀-￯]")
+
+
+class BaseTokenizer(ABC):
+    """Tokenizer 基础接口"""
+
+    name: str = "base"
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """计算文本的 token 数量"""
+        pass
+
+
+class HeuristicTokenizer(BaseTokenizer):
+    """无依赖的估算 tokenizer：中日韩字符按 1 个 token，其余按 4 个字符 1 个 token"""
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        cjk = len(_CJK_PATTERN.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+
+class TiktokenTokenizer(BaseTokenizer):
+    """基于 tiktoken BPE 编码的精确 tokenizer"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.name = f"tiktoken:{encoding.name}"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+def _load_tiktoken(model: str, encoding_name: str) -> BaseTokenizer:
+    import tiktoken
+
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding(encoding_name)
+    return TiktokenTokenizer(encoding)
+
+
+_TOKENIZER_KINDS = ("auto", "tiktoken", "heuristic")
+
+
+@lru_cache()
+def get_tokenizer(kind: Optional[str] = None) -> BaseTokenizer:
+    """获取 tokenizer，编码器只加载一次
+
+    kind 为 auto 时优先使用 tiktoken，未安装或编码文件无法加载时退回估算实现；
+    未知的 kind 记录警告后按 auto 处理。
+    """
+    kind = (kind or settings.TOKENIZER).strip().lower()
+    if kind not in _TOKENIZER_KINDS:
+        logger.warning(f"未知的 TOKENIZER 配置 {kind!r}，可选值为 {', '.join(_TOKENIZER_KINDS)}，按 auto 处理")
+        kind = "auto"
+    if kind == "heuristic":
+        return HeuristicTokenizer()
+
+    try:
+        tokenizer = _load_tiktoken(settings.GPT_MODEL, settings.TOKENIZER_ENCODING)
+        logger.info(f"使用 tokenizer: {tokenizer.name}")
+        return tokenizer
+    except Exception as e:
+        if kind == "tiktoken":
+            raise
+        logger.warning(f"加载 tiktoken 失败，使用估算 tokenizer: {str(e)}")
+        return HeuristicTokenizer()
+
+
+def pack_to_budget(
+    items: Sequence[T], budget: int, cost: Callable[[T], int]
+) -> List[List[T]]:
+    """按 token 预算将条目装箱
+
+    采用 first-fit decreasing：大条目优先放置，每个条目放入第一个还放得下的箱子，
+    单个条目超过预算时独占一个箱子。箱内和箱间都保持条目的原始顺序。
+    """
+    sized = sorted(
+        ((cost(item), i, item) for i, item in enumerate(items)),
+        key=lambda entry: entry[0],
+        reverse=True,
+    )
+
+    bins: List[Tuple[int, List[Tuple[int, T]]]] = []
+    for tokens, index, item in sized:
+        for i, (used, entries) in enumerate(bins):
+            if used + tokens <= budget:
+                entries.append((index, item))
+                bins[i] = (used + tokens, entries)
+                break
+        else:
+            bins.append((tokens, [(index, item)]))
+
+    ordered = [sorted(entries, key=lambda entry: entry[0]) for _, entries in bins]
+    ordered.sort(key=lambda entries: entries[0][0])
+    return [[item for _, item in entries] for entries in ordered]
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from app.infra.cache.redis_client import RedisClient
+from app.infra.cache.response_cache import LRUCache
+from app.infra.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# hunk 头中的行号：@@ -12,5 +14,6 @@ 之后的函数上下文保留
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+def patch_fingerprint(patch: str) -> str:
+    """文件 patch 的指纹，去掉 hunk 头中的行号和行尾空白
+
+    变基、只改动其他文件的强制推送和跨分支 cherry-pick 后，同一改动的指纹不变。
+    """
+    lines = [_HUNK_HEADER.sub("@@", line).rstrip() for line in patch.splitlines()]
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+class FileReviewCache:
+    """单个文件的审查结果缓存
+
+    按 patch 指纹和 pipeline / 提示词版本保存该文件的审查意见，位置记录为相对 patch 的偏移，
+    命中时由调用方换算为新的行号。结果保存在进程内 LRU 和 Redis 中，批量查询只需一次往返。
+    """
+
+    def __init__(self, namespace: str = "review:file", redis_client: Optional[RedisClient] = None):
+        self.namespace = namespace
+        self.ttl = settings.FILE_REVIEW_CACHE_TTL
+        self.local = LRUCache(
+            max_entries=settings.FILE_REVIEW_CACHE_MAX_ENTRIES,
+            max_bytes=settings.FILE_REVIEW_CACHE_MAX_BYTES,
+            ttl=self.ttl,
+        )
+        self.redis_client = redis_client or RedisClient()
+        self.counters: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def key(self, owner: str, repo: str, version: str, patch: str) -> str:
+        return f"{self.namespace}:{owner}/{repo}:{version}:{patch_fingerprint(patch)}"
+
+    async def get_many(self, keys: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """批量获取缓存的审查意见，返回命中的键"""
+        found: Dict[str, str] = {}
+        remote = []
+        for key in keys:
+            raw = self.local.get(key)
+            if raw is None:
+                remote.append(key)
+            else:
+                found[key] = raw
+
+        if remote:
+            try:
+                redis = (await self.redis_client.initialize()).redis
+                for key, raw in zip(remote, await redis.mget(remote)):
+                    if raw is not None:
+                        raw = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+                        self.local.set(key, raw)
+                        found[key] = raw
+            except Exception as e:
+                logger.warning(f"读取文件审查缓存失败: {str(e)}")
+                self.counters["errors"] += 1
+
+        hits = sum(1 for key in keys if key in found)
+        self.counters["hits"] += hits
+        self.counters["misses"] += len(keys) - hits
+        return {key: json.loads(raw) for key, raw in found.items()}
+
+    async def set_many(self, entries: Dict[str, List[Dict[str, Any]]]):
+        """批量保存审查意见"""
+        if not entries:
+            return
+        pipe = None
+        try:
+            redis = (await self.redis_client.initialize()).redis
+            pipe = redis.pipeline(transaction=False)
+        except Exception as e:
+            logger.warning(f"写入文件审查缓存失败: {str(e)}")
+            self.counters["errors"] += 1
+
+        for key, findings in entries.items():
+            raw = json.dumps(findings, ensure_ascii=False)
+            self.local.set(key, raw)
+            if pipe is not None:
+                pipe.set(key, raw, ex=self.ttl)
+        self.counters["stores"] += len(entries)
+
+        if pipe is not None:
+            try:
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"写入文件审查缓存失败: {str(e)}")
+                self.counters["errors"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": self.counters["hits"] / lookups if lookups else 0.0,
+            "local_entries": len(self.local),
+            "local_bytes": self.local.size_bytes,
+        }
+
+
+_file_review_cache: Optional[FileReviewCache] = None
+
+
+def get_file_review_cache() -> FileReviewCache:
+    """获取全局共享的文件审查结果缓存"""
+    global _file_review_cache
+    if _file_review_cache is None:
+        _file_review_cache = FileReviewCache()
+    return _file_review_cache
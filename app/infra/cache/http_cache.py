@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+from app.infra.cache.redis_client import RedisClient
+from app.infra.cache.response_cache import LRUCache
+from app.infra.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 304 响应不带分页信息，需要随缓存一起保存
+_PRESERVED_HEADERS = ("Link", "X-Total-Pages", "X-Next-Page", "X-Total")
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    headers: Dict[str, str]
+    body: Any
+
+    def validators(self) -> Dict[str, str]:
+        """条件请求头"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ConditionalCache:
+    """Git API GET 响应的条件请求缓存：进程内 LRU + Redis 两级
+
+    保存响应体和 ETag / Last-Modified，下次请求带上验证器，
+    服务端返回 304 时直接使用缓存（GitHub 的 304 不计入 API 配额）。
+    """
+
+    def __init__(self, namespace: str = "git:http", redis_client: Optional[RedisClient] = None):
+        self.namespace = namespace
+        self.ttl = settings.GIT_HTTP_CACHE_TTL
+        self.local = LRUCache(
+            max_entries=settings.GIT_HTTP_CACHE_MAX_ENTRIES,
+            max_bytes=settings.GIT_HTTP_CACHE_MAX_BYTES,
+            ttl=self.ttl,
+        )
+        self.redis_client = redis_client or RedisClient()
+        self.counters: Dict[str, int] = {
+            "requests": 0,
+            "conditional": 0,
+            "not_modified": 0,
+            "stores": 0,
+            "errors": 0,
+        }
+
+    @staticmethod
+    def key(scope: str, url: str) -> str:
+        """按凭证和完整 URL 计算缓存键，不同 token 看到的数据互不共享"""
+        return hashlib.sha256(f"{scope}\n{url}".encode("utf-8")).hexdigest()
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """获取缓存条目，依次查询进程内和 Redis"""
+        self.counters["requests"] += 1
+        raw = self.local.get(key)
+        if raw is None:
+            try:
+                raw = await self.redis_client.get_cached_response(self._redis_key(key))
+            except Exception as e:
+                logger.warning(f"读取 Redis HTTP 缓存失败: {str(e)}")
+                self.counters["errors"] += 1
+            if raw is not None:
+                self.local.set(key, raw)
+        if raw is None:
+            return None
+
+        self.counters["conditional"] += 1
+        return CachedResponse(**json.loads(raw))
+
+    def record_not_modified(self):
+        self.counters["not_modified"] += 1
+
+    async def set(self, key: str, body: Any, headers: Mapping[str, str]):
+        """响应带有验证器时写入两级缓存"""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        raw = json.dumps(
+            {
+                "etag": etag,
+                "last_modified": last_modified,
+                "headers": {name: headers[name] for name in _PRESERVED_HEADERS if name in headers},
+                "body": body,
+            },
+            ensure_ascii=False,
+        )
+        self.local.set(key, raw)
+        self.counters["stores"] += 1
+        try:
+            await self.redis_client.set_cached_response(self._redis_key(key), raw, self.ttl)
+        except Exception as e:
+            logger.warning(f"写入 Redis HTTP 缓存失败: {str(e)}")
+            self.counters["errors"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """缓存命中统计，not_modified 即节省的 API 配额"""
+        requests = self.counters["requests"]
+        return {
+            **self.counters,
+            "hit_ratio": self.counters["not_modified"] / requests if requests else 0.0,
+            "local_entries": len(self.local),
+            "local_bytes": self.local.size_bytes,
+        }
+
+
+_conditional_cache: Optional[ConditionalCache] = None
+
+
+def get_conditional_cache() -> ConditionalCache:
+    """获取全局共享的 Git API 条件请求缓存"""
+    global _conditional_cache
+    if _conditional_cache is None:
+        _conditional_cache = ConditionalCache()
+    return _conditional_cache
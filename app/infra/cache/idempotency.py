@@ -0,0 +1,86 @@
+import hashlib
+import logging
+from typing import Dict, Mapping, Optional
+
+from app.infra.cache.redis_client import RedisClient
+from app.infra.cache.response_cache import LRUCache
+from app.infra.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 各平台投递 ID 请求头，按顺序使用第一个存在的；GitLab 重试时 Idempotency-Key 保持不变
+_DELIVERY_HEADERS = ("X-GitHub-Delivery", "Idempotency-Key", "X-Gitlab-Event-UUID")
+
+
+class DeliveryDeduplicator:
+    """webhook 投递去重
+
+    按投递 ID（没有时按请求体哈希）记录已处理的投递，进程内 LRU 命中时不访问 Redis，
+    否则通过一次 SET NX EX 原子地判断并记录。
+    """
+
+    def __init__(self, namespace: str = "webhook:delivery", redis_client: Optional[RedisClient] = None):
+        self.namespace = namespace
+        self.ttl = settings.WEBHOOK_DEDUPE_TTL
+        self.local = LRUCache(
+            max_entries=settings.WEBHOOK_DEDUPE_MAX_ENTRIES,
+            max_bytes=settings.WEBHOOK_DEDUPE_MAX_ENTRIES * 128,
+            ttl=self.ttl,
+        )
+        self.redis_client = redis_client or RedisClient()
+        self.counters: Dict[str, int] = {"deliveries": 0, "duplicates": 0, "local_hits": 0, "errors": 0}
+
+    def key(self, service: str, headers: Mapping[str, str], body: bytes) -> str:
+        for header in _DELIVERY_HEADERS:
+            delivery_id = headers.get(header)
+            if delivery_id:
+                return f"{self.namespace}:{service}:{delivery_id}"
+        return f"{self.namespace}:{service}:sha256:{hashlib.sha256(body).hexdigest()}"
+
+    async def is_duplicate(self, key: str) -> bool:
+        """判断投递是否已处理过，未处理过时同时记录"""
+        self.counters["deliveries"] += 1
+        if self.local.get(key) is not None:
+            self.counters["duplicates"] += 1
+            self.counters["local_hits"] += 1
+            return True
+
+        try:
+            redis = (await self.redis_client.initialize()).redis
+            created = await redis.set(key, "1", nx=True, ex=self.ttl)
+        except Exception as e:
+            # Redis 不可用时只依赖进程内记录，宁可重复处理也不丢弃投递
+            logger.warning(f"webhook 去重检查失败: {str(e)}")
+            self.counters["errors"] += 1
+            created = True
+
+        self.local.set(key, "1")
+        if not created:
+            self.counters["duplicates"] += 1
+            return True
+        return False
+
+    async def forget(self, key: str):
+        """处理失败时删除记录，允许平台重试"""
+        self.local.delete(key)
+        try:
+            redis = (await self.redis_client.initialize()).redis
+            await redis.delete(key)
+        except Exception as e:
+            logger.warning(f"删除 webhook 去重记录失败: {str(e)}")
+            self.counters["errors"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "local_entries": len(self.local)}
+
+
+_deduplicator: Optional[DeliveryDeduplicator] = None
+
+
+def get_delivery_deduplicator() -> DeliveryDeduplicator:
+    """获取全局共享的 webhook 投递去重器"""
+    global _deduplicator
+    if _deduplicator is None:
+        _deduplicator = DeliveryDeduplicator()
+    return _deduplicator
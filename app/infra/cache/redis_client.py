@@ -1,13 +1,69 @@
 import json
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 import aioredis
 import asyncio
+from aioredis.client import Pipeline
 
 from app.infra.config.settings import get_settings
 
 settings = get_settings()
 
+# 共享连接池上的 Redis 往返统计
+_redis_stats: Dict[str, int] = {"round_trips": 0, "commands": 0, "pipelines": 0}
+
+
+class InstrumentedPipeline(Pipeline):
+    """统计往返次数的 pipeline，一次 execute 计一次往返"""
+
+    async def execute(self, raise_on_error: bool = True):
+        if self.command_stack:
+            _redis_stats["round_trips"] += 1
+            _redis_stats["pipelines"] += 1
+            _redis_stats["commands"] += len(self.command_stack)
+        return await super().execute(raise_on_error)
+
+
+class InstrumentedRedis(aioredis.Redis):
+    """统计往返次数的 Redis 客户端"""
+
+    async def execute_command(self, *args, **options):
+        _redis_stats["round_trips"] += 1
+        _redis_stats["commands"] += 1
+        return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+_redis: Optional[InstrumentedRedis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """获取进程内共享连接池上的 Redis 客户端"""
+    global _redis
+    if _redis is None:
+        pool = aioredis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL, max_connections=settings.REDIS_MAX_CONNECTIONS
+        )
+        _redis = InstrumentedRedis(connection_pool=pool)
+    return _redis
+
+
+async def close_redis():
+    """关闭共享连接池"""
+    global _redis
+    if _redis is not None:
+        await _redis.close()
+        await _redis.connection_pool.disconnect()
+        _redis = None
+
+
+def redis_stats() -> Dict[str, Any]:
+    """共享连接池的往返次数和连接数"""
+    connections = len(getattr(_redis.connection_pool, "_connections", [])) if _redis is not None else 0
+    return {**_redis_stats, "connections": connections}
+
 
 class RedisClient:
     def __init__(self):
@@ -19,9 +75,13 @@ class RedisClient:
     async def initialize(self):
         """Initialize Redis connection asynchronously"""
         if self.redis is None:
-            self.redis = await aioredis.from_url(settings.REDIS_URL)
+            self.redis = get_redis()
         return self
 
+    async def close(self):
+        """释放对共享连接池的引用，连接池由 close_redis 关闭"""
+        self.redis = None
+
     async def set_chat_history(self, session_id: str, messages: List[Dict[str, str]]):
         """存储聊天历史"""
         if self.redis is None:
@@ -63,3 +123,53 @@ class RedisClient:
         key = f"mr:review_count:{owner}:{repo}:{mr_id}"
         count = await self.redis.get(key)
         return int(count) if count else 0
+
+    async def set_review_state(self, owner: str, repo: str, mr_id: str, head_sha: str, summary: str):
+        """记录 MR 上次审查的 head 和总结，供增量审查使用"""
+        if self.redis is None:
+            await self.initialize()
+        key = f"mr:review_state:{owner}:{repo}:{mr_id}"
+        await self.redis.set(key, json.dumps({"head_sha": head_sha, "summary": summary}), ex=self.review_ttl)
+
+    async def get_review_state(self, owner: str, repo: str, mr_id: str) -> Optional[Dict[str, str]]:
+        """获取 MR 上次审查的 head 和总结"""
+        if self.redis is None:
+            await self.initialize()
+        key = f"mr:review_state:{owner}:{repo}:{mr_id}"
+        data = await self.redis.get(key)
+        if data:
+            return json.loads(data)
+        return None
+
+    async def get_cached_response(self, key: str) -> Optional[str]:
+        """获取缓存的 AI 响应"""
+        if self.redis is None:
+            await self.initialize()
+        data = await self.redis.get(key)
+        return data.decode("utf-8") if isinstance(data, bytes) else data
+
+    async def set_cached_response(self, key: str, response: str, ttl: int):
+        """缓存 AI 响应"""
+        if self.redis is None:
+            await self.initialize()
+        await self.redis.set(key, response, ex=ttl)
+
+
+_redis_client: Optional[RedisClient] = None
+
+
+def get_redis_client() -> RedisClient:
+    """获取全局共享的 Redis 客户端"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = RedisClient()
+    return _redis_client
+
+
+async def close_redis_client():
+    """关闭共享的 Redis 客户端和连接池"""
+    global _redis_client
+    if _redis_client is not None:
+        await _redis_client.close()
+        _redis_client = None
+    await close_redis()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.infra.cache.redis_client import RedisClient
+from app.infra.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class LRUCache:
+    """进程内 LRU 缓存，按条目数和字节数淘汰，条目带过期时间"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_bytes = 0
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self.size_bytes += size
+        while len(self._data) > self.max_entries or self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+
+    def delete(self, key: str):
+        if key in self._data:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        _, value = self._data.pop(key)
+        self.size_bytes -= len(value.encode("utf-8"))
+
+
+class ResponseCache:
+    """按内容寻址的 AI 响应缓存：进程内 LRU + Redis 两级"""
+
+    def __init__(self, namespace: str = "ai:response", redis_client: Optional[RedisClient] = None):
+        self.namespace = namespace
+        self.ttl = settings.AI_RESPONSE_CACHE_TTL
+        self.local = LRUCache(
+            max_entries=settings.AI_RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=settings.AI_RESPONSE_CACHE_MAX_BYTES,
+            ttl=self.ttl,
+        )
+        self.redis_client = redis_client or RedisClient()
+        self.counters: Dict[str, int] = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "errors": 0,
+        }
+
+    @staticmethod
+    def fingerprint(model: str, temperature: float, messages: List[Dict[str, str]]) -> str:
+        """根据模型、温度和完整的归一化消息列表计算缓存键"""
+        normalized = [
+            {
+                "role": msg["role"],
+                "content": "\n".join(
+                    line.rstrip() for line in msg["content"].replace("\r\n", "\n").split("\n")
+                ).strip(),
+            }
+            for msg in messages
+        ]
+        payload = json.dumps(
+            {"model": model, "temperature": temperature, "messages": normalized},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[str]:
+        """获取缓存，依次查询进程内和 Redis"""
+        value = self.local.get(key)
+        if value is not None:
+            self.counters["local_hits"] += 1
+            return value
+
+        try:
+            value = await self.redis_client.get_cached_response(self._redis_key(key))
+        except Exception as e:
+            logger.warning(f"读取 Redis 响应缓存失败: {str(e)}")
+            self.counters["errors"] += 1
+            value = None
+
+        if value is None:
+            self.counters["misses"] += 1
+            return None
+
+        self.counters["redis_hits"] += 1
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str):
+        """写入两级缓存"""
+        self.local.set(key, value)
+        self.counters["stores"] += 1
+        try:
+            await self.redis_client.set_cached_response(self._redis_key(key), value, self.ttl)
+        except Exception as e:
+            logger.warning(f"写入 Redis 响应缓存失败: {str(e)}")
+            self.counters["errors"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """缓存命中统计"""
+        hits = self.counters["local_hits"] + self.counters["redis_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "local_entries": len(self.local),
+            "local_bytes": self.local.size_bytes,
+        }
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """获取全局共享的 AI 响应缓存"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,116 @@
+import logging
+from typing import Dict, Optional
+
+from app.infra.cache.redis_client import RedisClient
+from app.infra.cache.response_cache import LRUCache
+from app.infra.config.settings import get_settings
+from app.models.git import MergeRequest
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class SnapshotCache:
+    """MergeRequest 快照缓存，避免同一事件中重复下载 MR 和全部文件 diff
+
+    快照按 (owner, repo, mr_id, head_sha) 保存在进程内 LRU 和 Redis 中；
+    MR 当前的 head_sha 保存在 Redis 的指针键中，push webhook 删除指针即让所有 worker 失效。
+    """
+
+    def __init__(self, namespace: str = "git:snapshot", redis_client: Optional[RedisClient] = None):
+        self.namespace = namespace
+        self.ttl = settings.GIT_SNAPSHOT_TTL
+        self.local = LRUCache(
+            max_entries=settings.GIT_SNAPSHOT_MAX_ENTRIES,
+            max_bytes=settings.GIT_SNAPSHOT_MAX_BYTES,
+            ttl=self.ttl,
+        )
+        self.redis_client = redis_client or RedisClient()
+        self.counters: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "invalidations": 0,
+            "errors": 0,
+        }
+
+    def _head_key(self, owner: str, repo: str, mr_id: str) -> str:
+        return f"{self.namespace}:head:{owner}/{repo}/{mr_id}"
+
+    @staticmethod
+    def _snapshot_id(owner: str, repo: str, mr_id: str, head_sha: str) -> str:
+        return f"{owner}/{repo}/{mr_id}@{head_sha}"
+
+    async def get(self, owner: str, repo: str, mr_id: str) -> Optional[MergeRequest]:
+        """获取 MR 当前 head 对应的快照，每次返回新的对象"""
+        try:
+            redis = (await self.redis_client.initialize()).redis
+            head_sha = await redis.get(self._head_key(owner, repo, mr_id))
+            raw = None
+            if head_sha is not None:
+                head_sha = head_sha.decode("utf-8") if isinstance(head_sha, bytes) else head_sha
+                snapshot_id = self._snapshot_id(owner, repo, mr_id, head_sha)
+                raw = self.local.get(snapshot_id)
+                if raw is None:
+                    raw = await self.redis_client.get_cached_response(f"{self.namespace}:{snapshot_id}")
+                    if raw is not None:
+                        self.local.set(snapshot_id, raw)
+        except Exception as e:
+            logger.warning(f"读取 MR 快照缓存失败: {str(e)}")
+            self.counters["errors"] += 1
+            raw = None
+
+        if raw is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return MergeRequest.model_validate_json(raw)
+
+    async def set(self, mr: MergeRequest):
+        """保存快照并将 head 指针指向它"""
+        if not mr.head_sha:
+            return
+        snapshot_id = self._snapshot_id(mr.owner, mr.repo, mr.mr_id, mr.head_sha)
+        raw = mr.model_dump_json()
+        self.local.set(snapshot_id, raw)
+        self.counters["stores"] += 1
+        try:
+            redis = (await self.redis_client.initialize()).redis
+            pipe = redis.pipeline(transaction=False)
+            pipe.set(f"{self.namespace}:{snapshot_id}", raw, ex=self.ttl)
+            pipe.set(self._head_key(mr.owner, mr.repo, mr.mr_id), mr.head_sha, ex=self.ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"写入 MR 快照缓存失败: {str(e)}")
+            self.counters["errors"] += 1
+
+    async def invalidate(self, owner: str, repo: str, mr_id: str):
+        """MR 有新的推送或更新时删除 head 指针"""
+        self.counters["invalidations"] += 1
+        try:
+            redis = (await self.redis_client.initialize()).redis
+            await redis.delete(self._head_key(owner, repo, mr_id))
+            logger.info(f"MR 快照已失效: {owner}/{repo}#{mr_id}")
+        except Exception as e:
+            logger.warning(f"删除 MR 快照指针失败: {str(e)}")
+            self.counters["errors"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": self.counters["hits"] / lookups if lookups else 0.0,
+            "local_entries": len(self.local),
+            "local_bytes": self.local.size_bytes,
+        }
+
+
+_snapshot_cache: Optional[SnapshotCache] = None
+
+
+def get_snapshot_cache() -> SnapshotCache:
+    """获取全局共享的 MR 快照缓存"""
+    global _snapshot_cache
+    if _snapshot_cache is None:
+        _snapshot_cache = SnapshotCache()
+    return _snapshot_cache
@@ -22,6 +22,10 @@ class Settings(BaseSettings):
     GITHUB_WEBHOOK_SECRET: Optional[str] = None
     GITHUB_API_URL: str = "https://api.github.com"
     GITHUB_REPOS: str = ""  # 格式：owner1/repo1,owner2/repo2
+    GITHUB_REVIEW_MAX_COMMENTS: int = 50  # 单次提交审查的最大行内评论数，超出时拆分
+    GITHUB_USE_GRAPHQL: bool = False  # 使用 GraphQL 一次获取 PR、文件和 review 线程
+    GITHUB_GRAPHQL_URL: Optional[str] = None  # 默认根据 GITHUB_API_URL 推断
+    GITHUB_GRAPHQL_SNAPSHOT_TTL: int = 10  # GraphQL PR 快照复用时间（秒）
     
     # GitLab配置 (当 GIT_SERVICE == 'gitlab' 时使用)
     GITLAB_API_URL: str = "https://gitlab.com/api/v4"
@@ -29,13 +33,68 @@ class Settings(BaseSettings):
     GITLAB_WEBHOOK_SECRET: Optional[str] = None
     GITLAB_REPOS: str = ""  # 格式：owner1/repo1,owner2/repo2
 
+    # Git API 连接池配置
+    GIT_MAX_CONNECTIONS: int = 100  # 连接池最大连接数
+    GIT_MAX_CONNECTIONS_PER_HOST: int = 20  # 单个 Git 主机最大连接数
+    GIT_DNS_CACHE_TTL: int = 300  # DNS 缓存时间（秒）
+    GIT_KEEPALIVE_TIMEOUT: float = 30.0  # 空闲长连接保持时间（秒）
+    GIT_PAGINATION_CONCURRENCY: int = 8  # 分页接口并发请求的页数
+
+    # Git API 条件请求缓存（ETag / Last-Modified，304 不计入 GitHub 配额）
+    GIT_HTTP_CACHE_ENABLED: bool = True
+    GIT_HTTP_CACHE_TTL: int = 60 * 60 * 24  # 缓存条目保留时间（秒）
+    GIT_HTTP_CACHE_MAX_ENTRIES: int = 1024  # 进程内 LRU 最大条目数
+    GIT_HTTP_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 进程内 LRU 最大字节数
+
+    # MR 快照缓存（按 head SHA 复用 MergeRequest，push webhook 时失效）
+    GIT_SNAPSHOT_CACHE_ENABLED: bool = True
+    GIT_SNAPSHOT_TTL: int = 120  # 快照保留时间（秒）
+    GIT_SNAPSHOT_MAX_ENTRIES: int = 64  # 进程内 LRU 最大快照数
+    GIT_SNAPSHOT_MAX_BYTES: int = 64 * 1024 * 1024  # 进程内 LRU 最大字节数
+
     # AI 审查限制
     MAX_FILES_PER_MR: int = 20  # MR 最大文件数
     MAX_LINES_PER_FILE: int = 1000  # 单个文件最大行数
     MAX_BYTES_PER_FILE: int = 1024 * 102  # 单个文件最大字节数
 
+    # 分块审查配置（超出单个上下文窗口的 MR）
+    ENABLE_CHUNKED_REVIEW: bool = False  # 是否启用分块审查
+    REVIEW_CHUNK_MAX_TOKENS: int = 30000  # 每个分块的最大 token 数
+    REVIEW_CHUNK_CONCURRENCY: int = 4  # 分块并发审查数
+    MAX_FILES_PER_CHUNKED_MR: int = 300  # 分块审查模式下 MR 最大文件数
+
+    # 流式审查：模型生成过程中逐条发布评论
+    ENABLE_STREAMING_REVIEW: bool = False
+
+    # 批量发布：一次审查的评论和总结通过单个 "create review" 请求提交（GitHub）
+    ENABLE_BATCH_REVIEW: bool = True
+
+    # 提示词压缩：发送给模型前省略生成和依赖文件、只有空白变化或只重命名的文件，并裁剪上下文
+    ENABLE_DIFF_MINIFY: bool = True
+    DIFF_CONTEXT_LINES: int = 3  # 每处变更前后保留的上下文行数
+    # 省略的路径，逗号分隔的 glob：** 匹配任意层目录，不含 / 的模式匹配任意目录下的文件名
+    DIFF_MINIFY_EXCLUDE: str = (
+        "package-lock.json,yarn.lock,pnpm-lock.yaml,poetry.lock,Pipfile.lock,Cargo.lock,go.sum,"
+        "composer.lock,Gemfile.lock,*.min.js,*.min.css,*.map,*.pb.go,*_pb2.py,*_pb2_grpc.py,"
+        "*.generated.*,vendor/**,**/node_modules/**,third_party/**"
+    )
+
+    # 评论定位：发布前将 AI 评论吸附到 diff 中可评论的行，无法定位的并入总结
+    COMMENT_ANCHOR_MAX_DISTANCE: int = 10  # 吸附到最近可评论行的最大距离（行）
+
+    # 文件审查结果缓存：按 patch 指纹复用未变化文件的审查意见（变基、cherry-pick）
+    FILE_REVIEW_CACHE_ENABLED: bool = True
+    FILE_REVIEW_CACHE_TTL: int = 60 * 60 * 24 * 7  # 缓存保留时间（秒）
+    FILE_REVIEW_CACHE_MAX_ENTRIES: int = 4096  # 进程内 LRU 最大条目数
+    FILE_REVIEW_CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # 进程内 LRU 最大字节数
+
+    # 增量审查：新推送只审查上次审查之后的提交，上次的总结作为上下文
+    ENABLE_INCREMENTAL_REVIEW: bool = True
+    INCREMENTAL_SUMMARY_MAX_CHARS: int = 1500  # 作为上下文的上次总结最大字符数
+
     # 系统限制
-    MAX_AI_REQUESTS_PER_HOUR: int = 30  # 每小时最大 AI 请求次数
+    MAX_AI_REQUESTS_PER_HOUR: int = 30  # 每小时最大 AI 请求配额（按消耗单位计）
+    AI_REQUEST_TOKENS_PER_COST_UNIT: int = 10000  # 每多少 token 消耗 1 个 AI 请求配额单位
     MAX_COMMENT_REPLIES: int = 2  # 每个评论最大回复次数
     MAX_MR_REVIEWS_PER_HOUR: int = 5  # 每小时最大处理 MR 数
     RATE_LIMIT_EXPIRE: int = 3600  # 限制过期时间（秒）
@@ -49,6 +108,20 @@ class Settings(BaseSettings):
     GPT_LANGUAGE: str = "中文"
     GPT_TIMEOUT: int = 1200
     MAX_TOKENS: int = 10000000  # 每次请求的最大 token 数
+    TOKENIZER: str = "auto"  # token 计数方式: auto | tiktoken | heuristic
+    TOKENIZER_ENCODING: str = "cl100k_base"  # 模型无对应编码时使用的 tiktoken 编码
+    GPT_MAX_CONNECTIONS: int = 100  # AI HTTP 连接池最大连接数
+    GPT_MAX_KEEPALIVE_CONNECTIONS: int = 20  # AI HTTP 连接池最大空闲长连接数
+    GPT_KEEPALIVE_EXPIRY: float = 30.0  # 空闲长连接保持时间（秒）
+
+    # 多端点 AI 路由，JSON 数组：[{"url": "...", "keys": ["k1", "k2"], "weight": 1, "model": "可选"}]
+    # 为空时使用 GPT_API_URL 和 GPT_API_KEY
+    GPT_ENDPOINTS: str = ""
+    AI_ENDPOINT_EWMA_ALPHA: float = 0.3  # 延迟和错误率 EWMA 平滑系数
+    AI_ENDPOINT_ERROR_PENALTY: float = 4.0  # 错误率对路由得分的放大系数
+    AI_ENDPOINT_COOLDOWN: int = 30  # 端点 5xx 或连接失败后的冷却时间（秒）
+    AI_ENDPOINT_KEY_COOLDOWN: int = 60  # key 被限流且无 Retry-After 时的冷却时间（秒）
+    AI_ENDPOINT_MAX_ATTEMPTS: int = 3  # 单次请求最多尝试的端点/key 次数
 
     # 应用配置
     DEBUG: bool = False
@@ -57,16 +130,67 @@ class Settings(BaseSettings):
     # Redis配置
     REDIS_URL: str = "redis://localhost:6379"
     REDIS_CHAT_TTL: int = 3600
+    REDIS_MAX_CONNECTIONS: int = 50  # 进程内共享连接池的最大连接数，用尽时等待
+
+    # 审查任务队列（Redis Streams，由独立 worker 进程消费）
+    USE_JOB_QUEUE: bool = False  # 关闭时在 web 进程内用 BackgroundTasks 执行
+    JOB_QUEUE_STREAM: str = "review:jobs"
+    JOB_QUEUE_GROUP: str = "reviewers"
+    JOB_QUEUE_MAX_LEN: int = 10000  # stream 近似最大长度
+    JOB_MAX_ATTEMPTS: int = 5  # 超过后转入死信 stream
+    JOB_RETRY_BASE_DELAY: float = 5.0  # 重试退避基数（秒），按 2^n 增长
+    JOB_RETRY_MAX_DELAY: float = 300.0  # 重试退避上限（秒）
+    JOB_VISIBILITY_TIMEOUT: int = 300  # 未确认的任务空闲多久后可被其他 worker 接管（秒）
+    WORKER_CONCURRENCY: int = 4  # 每个 worker 进程同时执行的任务数
+
+    WORKER_PREFETCH: int = 16  # 每个 worker 最多预取的任务数，预取的任务按优先级和仓库公平调度
+
+    # 任务调度：评论回复 > 增量审查 > 全量审查，同一优先级内按仓库加权公平排队
+    SCHEDULER_CLASS_LIMITS: Dict[str, int] = {"reply": 4, "incremental": 3, "full": 2}  # 每类任务最大并发
+    SCHEDULER_REPO_WEIGHTS: Dict[str, float] = {}  # 仓库权重，如 {"owner/repo": 2}，默认 1
+    AI_REPLY_RESERVED_RATIO: float = 0.2  # 每小时 AI 配额中为评论回复预留的比例
+
+    # webhook 投递去重（平台重试时不重复处理）
+    WEBHOOK_DEDUPE_ENABLED: bool = True
+    WEBHOOK_DEDUPE_TTL: int = 60 * 60 * 24  # 投递记录保留时间（秒）
+    WEBHOOK_DEDUPE_MAX_ENTRIES: int = 10000  # 进程内 LRU 最大条目数
+
+    # 同一 MR 的 webhook 合并：静默期内的重复事件只触发一次审查，审查最新 head
+    MR_DEBOUNCE_SECONDS: float = 30.0  # 静默期（秒），0 表示不合并
+    MR_DEBOUNCE_MAX_WAIT: float = 300.0  # 持续有事件时最长等待（秒）
 
     # AI响应缓存配置
     USE_AI_DEBUG_CACHE: bool = False
     AI_CACHE_DIR: str = "app/infra/cache/mock_responses"
+    AI_RESPONSE_CACHE_ENABLED: bool = True  # 是否启用按内容寻址的响应缓存
+    AI_RESPONSE_CACHE_TTL: int = 60 * 60 * 24  # 响应缓存过期时间（秒）
+    AI_RESPONSE_CACHE_MAX_ENTRIES: int = 256  # 进程内 LRU 最大条目数
+    AI_RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 进程内 LRU 最大字节数
+
+    # 相同 AI 请求的并发合并（single-flight）
+    AI_SINGLE_FLIGHT_ENABLED: bool = True
+    AI_SINGLE_FLIGHT_LOCK_TTL: int = 1200  # leader 锁过期时间（秒），应覆盖一次 LLM 调用
+    AI_SINGLE_FLIGHT_WAIT_TIMEOUT: int = 1200  # follower 最长等待时间（秒）
+    AI_SINGLE_FLIGHT_RESULT_TTL: int = 60  # leader 结果保留时间（秒）
+    AI_SINGLE_FLIGHT_POLL_INTERVAL: float = 0.2  # follower 初始轮询间隔（秒）
 
 
     @property
     def github_repos(self) -> List[str]:
         return self.GITHUB_REPOS.split(",")
 
+    @property
+    def gpt_endpoints(self) -> List[Dict[str, Any]]:
+        """解析多端点 AI 配置，未配置时使用单个默认端点"""
+        if not self.GPT_ENDPOINTS.strip():
+            return [{"url": self.GPT_API_URL, "keys": [self.GPT_API_KEY], "weight": 1.0}]
+
+        endpoints = []
+        for endpoint in json.loads(self.GPT_ENDPOINTS):
+            keys = endpoint.get("keys") or [endpoint.get("key") or self.GPT_API_KEY]
+            endpoints.append({**endpoint, "url": endpoint.get("url") or self.GPT_API_URL, "keys": keys})
+        return endpoints
+
     @property
     def gitlab_repos(self) -> List[str]:
         """解析 GitLab 仓库配置字符串"""
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.infra.config.settings import get_settings
+from app.infra.git.base_webhook_handler import MergeRequestEvent
+from app.infra.job_queue import JobKind, JobQueue, get_job_queue
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# 登记 MR 事件：保存最新事件，到期时间推迟到 now + 静默期，但不超过首次事件 + 最长等待。
+# KEYS[1]: 到期 zset；KEYS[2]: 最新事件 hash；KEYS[3]: 首次事件时间 hash
+# ARGV: MR 键、事件、当前时间、静默期、最长等待
+# 返回 1 表示新事件，0 表示合并到已有事件
+_SUBMIT_SCRIPT = """
+local now = tonumber(ARGV[3])
+local first = tonumber(redis.call('HGET', KEYS[3], ARGV[1]))
+local created = 0
+if not first then
+    first = now
+    created = 1
+    redis.call('HSET', KEYS[3], ARGV[1], now)
+end
+local due = math.min(now + tonumber(ARGV[4]), first + tonumber(ARGV[5]))
+redis.call('ZADD', KEYS[1], due, ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+return created
+"""
+
+# 将静默期结束的 MR 作为审查任务投递到任务 stream。
+# KEYS[1-3] 同上，KEYS[4]: 任务 stream；ARGV: 当前时间、单次最多投递数、stream 最大长度
+# 返回投递的任务数
+_FLUSH_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    local payload = redis.call('HGET', KEYS[2], member)
+    if payload then
+        redis.call('XADD', KEYS[4], 'MAXLEN', '~', ARGV[3], '*',
+            'kind', 'review_mr', 'payload', payload, 'attempts', 0)
+    end
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('HDEL', KEYS[2], member)
+    redis.call('HDEL', KEYS[3], member)
+end
+return #due
+"""
+
+
+class _Pending:
+    def __init__(self, event: MergeRequestEvent, first_seen: float, due: float):
+        self.event = event
+        self.first_seen = first_seen
+        self.due = due
+
+
+class MergeRequestDebouncer:
+    """合并同一 MR 短时间内的多个 webhook 事件
+
+    每个 MR 在最后一次事件后等待静默期再触发一次审查，使用最新事件中的 head SHA。
+    启用任务队列时状态保存在 Redis 中，由 worker 投递到期的审查任务；否则在进程内计时。
+    """
+
+    def __init__(self, queue: Optional[JobQueue] = None, use_queue: Optional[bool] = None):
+        self.use_queue = settings.USE_JOB_QUEUE if use_queue is None else use_queue
+        self.queue = queue or (get_job_queue() if self.use_queue else None)
+        self._pending: Dict[str, _Pending] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.counters: Dict[str, int] = {"received": 0, "coalesced": 0, "flushed": 0}
+        if self.queue is not None:
+            stream = self.queue.stream
+            self._keys = [f"{stream}:debounce", f"{stream}:debounce:events", f"{stream}:debounce:first"]
+            self._submit = self.queue.redis.register_script(_SUBMIT_SCRIPT)
+            self._flush = self.queue.redis.register_script(_FLUSH_SCRIPT)
+
+    @staticmethod
+    def key(event: MergeRequestEvent) -> str:
+        return f"{event.owner}/{event.repo}/{event.mr_id}"
+
+    @staticmethod
+    def payload(event: MergeRequestEvent) -> Dict[str, Any]:
+        return {
+            "owner": event.owner,
+            "repo": event.repo,
+            "mr_id": event.mr_id,
+            "head_sha": event.head_sha,
+            "incremental": event.incremental,
+        }
+
+    async def submit(
+        self,
+        event: MergeRequestEvent,
+        runner: Optional[Callable[[MergeRequestEvent], Awaitable]] = None,
+    ) -> bool:
+        """登记 MR 事件，返回是否合并到了尚未执行的审查
+
+        Args:
+            event: MR 事件
+            runner: 未启用任务队列时，静默期结束后执行审查的回调
+        """
+        self.counters["received"] += 1
+        quiet = settings.MR_DEBOUNCE_SECONDS
+        if self.use_queue:
+            if quiet <= 0:
+                await self.queue.enqueue(JobKind.REVIEW_MR, self.payload(event))
+                return False
+            created = await self._submit(
+                keys=self._keys,
+                args=[self.key(event), json.dumps(self.payload(event)), time.time(), quiet, settings.MR_DEBOUNCE_MAX_WAIT],
+            )
+            coalesced = not int(created)
+        else:
+            coalesced = self._submit_local(event, runner, quiet)
+
+        if coalesced:
+            self.counters["coalesced"] += 1
+            logger.info(f"合并 MR 事件: {self.key(event)} @ {event.head_sha}")
+        return coalesced
+
+    def _submit_local(
+        self, event: MergeRequestEvent, runner: Callable[[MergeRequestEvent], Awaitable], quiet: float
+    ) -> bool:
+        key = self.key(event)
+        now = time.monotonic()
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.event = event
+            pending.due = min(now + quiet, pending.first_seen + settings.MR_DEBOUNCE_MAX_WAIT)
+            return True
+
+        self._pending[key] = _Pending(event, now, now + quiet)
+        task = asyncio.create_task(self._run_later(key, runner))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return False
+
+    async def _run_later(self, key: str, runner: Callable[[MergeRequestEvent], Awaitable]):
+        pending = self._pending[key]
+        while True:
+            delay = pending.due - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        del self._pending[key]
+        self.counters["flushed"] += 1
+        try:
+            await runner(pending.event)
+        except Exception as e:
+            logger.exception(f"执行 MR 审查失败: {key}: {e}")
+
+    async def flush_due(self, limit: int = 100) -> int:
+        """将静默期结束的 MR 投递为审查任务（仅任务队列模式）"""
+        if self.queue is None:
+            return 0
+        flushed = int(
+            await self._flush(
+                keys=self._keys + [self.queue.stream],
+                args=[time.time(), limit, settings.JOB_QUEUE_MAX_LEN],
+            )
+        )
+        self.counters["flushed"] += flushed
+        return flushed
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "pending_local": len(self._pending)}
+
+
+_debouncer: Optional[MergeRequestDebouncer] = None
+
+
+def get_debouncer() -> MergeRequestDebouncer:
+    """获取全局共享的 MR 事件合并器"""
+    global _debouncer
+    if _debouncer is None:
+        _debouncer = MergeRequestDebouncer()
+    return _debouncer
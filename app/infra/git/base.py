@@ -1,15 +1,214 @@
+import asyncio
+import hashlib
+import logging
+import re
 from abc import ABC, abstractmethod
-from typing import List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
 
+import aiohttp
 from fastapi import Request
 
+from app.infra.cache.http_cache import CachedResponse, get_conditional_cache
+from app.infra.config.settings import get_settings
 from app.models.comment import Comment
-from app.models.git import MergeRequest
+from app.models.git import FileDiff, MergeRequest
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 增量 diff 最多包含的文件数，达到时结果可能不完整（GitHub compare 接口最多返回 300 个文件）
+COMPARE_MAX_FILES = 300
+
+_LINK_LAST_PATTERN = re.compile(r'<([^>]+)>;\s*rel="last"')
+
+
+def _last_page(headers: Mapping[str, str]) -> Optional[int]:
+    """从分页响应头中读取总页数：GitLab 使用 X-Total-Pages，GitHub 使用 Link rel="last" """
+    total_pages = headers.get("X-Total-Pages")
+    if total_pages:
+        return int(total_pages)
+    match = _LINK_LAST_PATTERN.search(headers.get("Link", ""))
+    if match:
+        page = parse_qs(urlsplit(match.group(1)).query).get("page")
+        if page:
+            return int(page[0])
+    return None
+
+
+def _has_next_page(headers: Mapping[str, str]) -> bool:
+    return 'rel="next"' in headers.get("Link", "") or bool(headers.get("X-Next-Page"))
 
 
 class GitClientBase(ABC):
     """Git 客户端基础接口类"""
 
+    timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=10)
+    _session: Optional[aiohttp.ClientSession] = None
+    _session_loop: Optional[asyncio.AbstractEventLoop] = None
+    _pool_counters: Optional[Dict[str, int]] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享的 HTTP 会话，首次使用时创建
+
+        同一 Git 服务的所有请求复用连接池中的长连接和 DNS 缓存。
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            if self._pool_counters is None:
+                self._pool_counters = {
+                    "requests": 0,
+                    "connections_created": 0,
+                    "connections_reused": 0,
+                    "dns_cache_hits": 0,
+                    "dns_cache_misses": 0,
+                }
+            connector = aiohttp.TCPConnector(
+                limit=settings.GIT_MAX_CONNECTIONS,
+                limit_per_host=settings.GIT_MAX_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=settings.GIT_DNS_CACHE_TTL,
+                keepalive_timeout=settings.GIT_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                trace_configs=[self._trace_config()],
+            )
+            self._session_loop = loop
+        return self._session
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """统计新建连接、复用连接和 DNS 缓存命中"""
+        counters = self._pool_counters
+        trace_config = aiohttp.TraceConfig()
+
+        def count(name: str):
+            async def on_event(session, context, params):
+                counters[name] += 1
+
+            return on_event
+
+        trace_config.on_request_start.append(count("requests"))
+        trace_config.on_connection_create_end.append(count("connections_created"))
+        trace_config.on_connection_reuseconn.append(count("connections_reused"))
+        trace_config.on_dns_cache_hit.append(count("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(count("dns_cache_misses"))
+        return trace_config
+
+    async def warm_up(self):
+        """预先创建共享的 HTTP 会话"""
+        self._get_session()
+
+    async def close(self):
+        """关闭共享的 HTTP 会话"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    async def invalidate(self, owner: str, repo: str, mr_id: str):
+        """丢弃该 MR 的本地缓存，默认没有缓存"""
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """连接池统计"""
+        stats: Dict[str, Any] = dict(self._pool_counters or {})
+        session = self._session
+        if session is not None and not session.closed:
+            connector = session.connector
+            stats.update(
+                {
+                    "limit": connector.limit,
+                    "limit_per_host": connector.limit_per_host,
+                    "active": len(connector._acquired),
+                    "idle": sum(len(conns) for conns in connector._conns.values()),
+                }
+            )
+        return stats
+
+    @abstractmethod
+    async def _send(self, method: str, url: str, **kwargs) -> Tuple[Any, Mapping[str, str]]:
+        """发送 HTTP 请求，返回响应数据和响应头"""
+        pass
+
+    def _cache_scope(self) -> str:
+        """条件请求缓存的凭证范围，只保存 token 的摘要"""
+        return hashlib.sha256(str(getattr(self, "token", "")).encode("utf-8")).hexdigest()[:16]
+
+    async def _lookup_http_cache(
+        self, method: str, full_url: str, headers: Dict[str, str]
+    ) -> Tuple[Optional[str], Optional[CachedResponse]]:
+        """GET 请求查询条件请求缓存，命中时在请求头中加入 ETag / Last-Modified 验证器"""
+        if method != "GET" or not settings.GIT_HTTP_CACHE_ENABLED:
+            return None, None
+        cache = get_conditional_cache()
+        key = cache.key(self._cache_scope(), full_url)
+        cached = await cache.get(key)
+        if cached is not None:
+            headers.update(cached.validators())
+        return key, cached
+
+    @staticmethod
+    def _serve_not_modified(cached: CachedResponse) -> Tuple[Any, Mapping[str, str]]:
+        """服务端返回 304 时使用缓存的响应"""
+        get_conditional_cache().record_not_modified()
+        return cached.body, cached.headers
+
+    @staticmethod
+    async def _store_http_cache(key: Optional[str], body: Any, headers: Mapping[str, str]):
+        if key is not None:
+            await get_conditional_cache().set(key, body, headers)
+
+    async def _request(self, method: str, url: str, **kwargs) -> Any:
+        """发送 HTTP 请求，返回响应数据"""
+        data, _ = await self._send(method, url, **kwargs)
+        return data
+
+    @staticmethod
+    def _page_url(url: str, page: int, per_page: int) -> str:
+        separator = "&" if "?" in url else "?"
+        return f"{url}{separator}per_page={per_page}&page={page}"
+
+    async def _iter_pages(self, url: str, per_page: int = 100) -> AsyncIterator[List[Any]]:
+        """按页产出分页接口的数据
+
+        先请求第一页读取总页数，其余页在 GIT_PAGINATION_CONCURRENCY 限制下并发请求，
+        按页码顺序产出，调用方可以在后续页下载的同时处理已到达的页。
+        响应头没有总页数时退化为按 next 链接顺序翻页。
+        """
+        data, headers = await self._send("GET", self._page_url(url, 1, per_page))
+        yield data
+
+        last_page = _last_page(headers)
+        if last_page is None:
+            page = 1
+            while data and _has_next_page(headers):
+                page += 1
+                data, headers = await self._send("GET", self._page_url(url, page, per_page))
+                yield data
+            return
+
+        semaphore = asyncio.Semaphore(settings.GIT_PAGINATION_CONCURRENCY)
+
+        async def fetch(page: int) -> List[Any]:
+            async with semaphore:
+                page_data, _ = await self._send("GET", self._page_url(url, page, per_page))
+                return page_data
+
+        tasks = [asyncio.ensure_future(fetch(page)) for page in range(2, last_page + 1)]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _paginate(self, url: str, per_page: int = 100) -> List[Any]:
+        """获取分页接口的全部数据"""
+        items: List[Any] = []
+        async for page in self._iter_pages(url, per_page):
+            items.extend(page)
+        return items
+
     @abstractmethod
     async def get_merge_request(
         self, owner: str, repo: str, mr_id: str
@@ -18,11 +217,34 @@ class GitClientBase(ABC):
         pass
 
 
+    async def get_commit_diff(
+        self, owner: str, repo: str, base_sha: str, head_sha: str
+    ) -> Optional[List[FileDiff]]:
+        """获取两个提交之间的文件变更
+
+        base_sha 不是 head_sha 的祖先（如强制推送）或平台不支持时返回 None，调用方应退回全量审查。
+        """
+        return None
+
     @abstractmethod
     async def create_comment(self, owner: str, repo: str, comment: Comment, mr: MergeRequest):
         """创建评论"""
         pass
 
+    async def create_review(
+        self, owner: str, repo: str, mr: MergeRequest, comments: List[Comment]
+    ):
+        """批量发布一次审查的评论
+
+        默认逐条调用 create_comment，单条失败不影响其余评论；
+        支持批量接口的平台可覆盖为一次请求提交。
+        """
+        for comment in comments:
+            try:
+                await self.create_comment(owner, repo, comment, mr)
+            except Exception:
+                logger.exception(f"评论发布失败: {comment.comment_id}")
+
     @abstractmethod
     async def get_comment(
         self, owner: str, repo: str, mr: MergeRequest, comment_id: str
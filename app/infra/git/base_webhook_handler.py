@@ -4,10 +4,17 @@ from fastapi import Request
 from pydantic import BaseModel
 from enum import Enum
 
+from app.infra.cache.idempotency import get_delivery_deduplicator
+from app.infra.config.settings import get_settings
+
+settings = get_settings()
+
 class MergeRequestEvent(NamedTuple):
     owner: str
     repo: str
     mr_id: str
+    head_sha: Optional[str] = None
+    incremental: bool = False  # new commits pushed to an already opened MR
 
 class MergeRequestCommentEvent(NamedTuple):
     owner: str
@@ -20,6 +27,7 @@ class WebHookEventType(Enum):
     PING = "ping"
     MERGE_REQUEST = "merge_request"
     MERGE_REQUEST_COMMENT = "merge_request_comment"
+    DUPLICATE = "duplicate"
 
 class WebHookEvent(BaseModel):
     event_type: WebHookEventType
@@ -27,6 +35,19 @@ class WebHookEvent(BaseModel):
 
 class BaseWebhookHandler(ABC):
     """Base webhook handler for Git services"""
+
+    async def is_duplicate_delivery(self, request: Request, service: str) -> bool:
+        """Check delivery idempotency once the request is authenticated, before any work"""
+        if not settings.WEBHOOK_DEDUPE_ENABLED:
+            return False
+        deduplicator = get_delivery_deduplicator()
+        key = deduplicator.key(service, request.headers, await request.body())
+        request.state.delivery_key = key
+        return await deduplicator.is_duplicate(key)
+
+    async def invalidate_snapshot(self, owner: str, repo: str, mr_id: str):
+        """Drop cached MR snapshots after a push or update"""
+        await self.client.invalidate(owner, repo, mr_id)
     
     @abstractmethod
     async def handle_webhook(self, request: Request) -> Optional[WebHookEvent]:
@@ -36,7 +57,7 @@ class BaseWebhookHandler(ABC):
             Tuple[str, Optional[Any]]: (event_type, event_data)
             Event types:
             - "ping": Initial webhook setup test event
-            - "merge_request": MR/PR related events (only handles first open)
+            - "merge_request": MR/PR related events (first open and new pushes)
             - "merge_request_comment": MR/PR comment events (only handles replies)
         """
         pass 
\ No newline at end of file
@@ -0,0 +1,37 @@
+import logging
+from typing import Any, Optional
+
+from app.infra.cache.snapshot_cache import SnapshotCache, get_snapshot_cache
+from app.infra.git.base import GitClientBase
+from app.models.git import MergeRequest
+
+logger = logging.getLogger(__name__)
+
+
+class CachedGitClient:
+    """为 Git 客户端加上 MR 快照缓存，其余方法直接委托给原客户端"""
+
+    def __init__(self, client: GitClientBase, cache: Optional[SnapshotCache] = None):
+        self.client = client
+        self.cache = cache or get_snapshot_cache()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    async def get_merge_request(
+        self, owner: str, repo: str, mr_id: str
+    ) -> MergeRequest:
+        """获取合并请求信息，同一 head 的 MR 在 TTL 内只下载一次"""
+        mr = await self.cache.get(owner, repo, mr_id)
+        if mr is not None:
+            logger.info(f"使用 MR 快照缓存: {owner}/{repo}#{mr_id}@{mr.head_sha}")
+            return mr
+
+        mr = await self.client.get_merge_request(owner, repo, mr_id)
+        await self.cache.set(mr)
+        return mr
+
+    async def invalidate(self, owner: str, repo: str, mr_id: str):
+        """MR 有新推送时丢弃快照"""
+        await self.cache.invalidate(owner, repo, mr_id)
+        await self.client.invalidate(owner, repo, mr_id)
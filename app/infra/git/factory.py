@@ -3,7 +3,9 @@ from typing import Optional
 
 from app.infra.config.settings import get_settings
 from app.infra.git.base import GitClientBase
+from app.infra.git.cached_client import CachedGitClient
 from app.infra.git.github.client import GitHubClient
+from app.infra.git.github.graphql_client import GitHubGraphQLClient
 from app.infra.git.gitlab.client import GitLabClient
 
 settings = get_settings()
@@ -20,16 +22,26 @@ class GitClientFactory:
         """创建 Git 客户端实例"""
         service_type = settings.GIT_SERVICE.lower()
         if cls._instance is None:            
-            if service_type == "github":
+            if service_type == "github" and settings.GITHUB_USE_GRAPHQL:
+                cls._instance = GitHubGraphQLClient()
+            elif service_type == "github":
                 cls._instance = GitHubClient()
             elif service_type == "gitlab":
                 cls._instance = GitLabClient()
             else:
                 raise ValueError(f"Unsupported Git service type: {settings.GIT_SERVICE}")
+            if settings.GIT_SNAPSHOT_CACHE_ENABLED:
+                cls._instance = CachedGitClient(cls._instance)
                 
         return cls._instance
 
     @classmethod
     def get_client(cls) -> GitClientBase:
         """获取 Git 客户端实例（单例模式）"""
-        return cls.create_client() 
\ No newline at end of file
+        return cls.create_client()
+
+    @classmethod
+    async def close(cls):
+        """关闭 Git 客户端的共享连接池"""
+        if cls._instance is not None:
+            await cls._instance.close()
@@ -3,13 +3,13 @@ import hashlib
 import hmac
 import logging
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import aiohttp
 from fastapi import HTTPException, Request
 
 from app.infra.config.settings import get_settings
-from app.infra.git.base import GitClientBase
+from app.infra.git.base import COMPARE_MAX_FILES, GitClientBase
 from app.models.comment import Comment, CommentPosition, CommentType
 from app.models.git import ChangeType, FileDiff, MergeRequest, MergeRequestState
 
@@ -27,22 +27,26 @@ class GitHubClient(GitClientBase):
         self.webhook_secret = settings.GITHUB_WEBHOOK_SECRET
         self.timeout = aiohttp.ClientTimeout(total=5)  # 5秒超时
 
-    async def _request(self, method: str, url: str, **kwargs) -> Any:
-        """发送 HTTP 请求到 GitHub API"""
+    async def _send(self, method: str, url: str, **kwargs) -> Tuple[Any, Mapping[str, str]]:
+        """发送 HTTP 请求到 GitHub API，返回响应数据和响应头"""
         headers = {
             "Authorization": f"token {self.token}",
             "Accept": "application/vnd.github.v3+json",
         }
         logger.info(f"请求: {method} {url}")
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-            try:
-                async with session.request(
-                    method, f"{self.github_api_url}{url}", headers=headers, **kwargs
-                ) as response:
-                    response.raise_for_status()
-                    return await response.json()
-            except Exception as e:
-                logger.error(f"""
+        session = self._get_session()
+        try:
+            full_url = f"{self.github_api_url}{url}"
+            cache_key, cached = await self._lookup_http_cache(method, full_url, headers)
+            async with session.request(method, full_url, headers=headers, **kwargs) as response:
+                if response.status == 304 and cached is not None:
+                    return self._serve_not_modified(cached)
+                response.raise_for_status()
+                data = await response.json()
+                await self._store_http_cache(cache_key, data, response.headers)
+                return data, response.headers
+        except Exception as e:
+            logger.error(f"""
 GitHub API Request Error:
 URL: {self.github_api_url}{url}
 Method: {method}
@@ -50,7 +54,7 @@ Headers: {headers}
 Args: {kwargs}
 Error: {str(e)}
 """)
-                raise
+            raise
 
     async def get_merge_request(
         self, owner: str, repo: str, mr_id: str
@@ -58,30 +62,12 @@ Error: {str(e)}
         """获取合并请求信息"""
         try:
             logger.info(f"获取 PR 信息: {owner}/{repo}#{mr_id}")
-            pr_data = await self._request("GET", f"/repos/{owner}/{repo}/pulls/{mr_id}")
-
-            # 获取文件变更
-            files_data = await self._request(
-                "GET", f"/repos/{owner}/{repo}/pulls/{mr_id}/files"
+            # PR 信息和分页的文件变更并发获取
+            pr_data, file_diffs = await asyncio.gather(
+                self._request("GET", f"/repos/{owner}/{repo}/pulls/{mr_id}"),
+                self._list_file_diffs(owner, repo, mr_id),
             )
 
-            file_diffs = []
-            for file in files_data:
-                change_type = ChangeType.MODIFY
-                if file["status"] == "added":
-                    change_type = ChangeType.ADD
-                elif file["status"] == "removed":
-                    change_type = ChangeType.DELETE
-
-                file_diff = FileDiff(
-                    new_file_path=file["filename"],
-                    old_file_path=file["filename"],
-                    change_type=change_type,
-                    diff_content=file.get("patch", ""),
-                    line_changes={},
-                )
-                file_diffs.append(file_diff)
-
             state_map = {
                 "open": MergeRequestState.OPEN,
                 "closed": MergeRequestState.CLOSED,
@@ -110,6 +96,7 @@ Error: {str(e)}
                     reviewer["login"] for reviewer in pr_data["requested_reviewers"]
                 ],
                 comments_count=pr_data["comments"],
+                head_sha=pr_data["head"]["sha"],
             )
         except Exception as e:
             logger.exception(f"获取 PR 信息失败: {owner}/{repo}#{mr_id}")
@@ -119,14 +106,9 @@ Error: {str(e)}
     async def create_comment(self, owner: str, repo: str, comment: Comment, mr: MergeRequest):
         """创建评论"""
         try:
-            _ = mr
             logger.info(f"创建评论: {owner}/{repo}#{comment.mr_id}")
             if comment.comment_type == CommentType.FILE:
-                # 获取最新的 commit SHA
-                pr_data = await self._request(
-                    "GET", f"/repos/{owner}/{repo}/pulls/{comment.mr_id}"
-                )
-                commit_id = pr_data["head"]["sha"]
+                commit_id = await self._get_head_sha(owner, repo, mr)
 
                 # 创建文件评论
                 assert comment.position is not None, "File comment requires position"
@@ -158,6 +140,102 @@ Error: {str(e)}
             logger.exception(f"创建评论失败: {owner}/{repo}#{comment.mr_id}")
             raise
 
+    @staticmethod
+    def _to_file_diff(file: Dict[str, Any]) -> FileDiff:
+        change_type = ChangeType.MODIFY
+        if file["status"] == "added":
+            change_type = ChangeType.ADD
+        elif file["status"] == "removed":
+            change_type = ChangeType.DELETE
+
+        return FileDiff(
+            new_file_path=file["filename"],
+            old_file_path=file.get("previous_filename", file["filename"]),
+            change_type=change_type,
+            diff_content=file.get("patch", ""),
+            line_changes={},
+        )
+
+    async def _list_file_diffs(self, owner: str, repo: str, mr_id: str) -> List[FileDiff]:
+        """获取 PR 的全部文件变更，每页到达后立即转换"""
+        file_diffs = []
+        async for files_data in self._iter_pages(f"/repos/{owner}/{repo}/pulls/{mr_id}/files"):
+            file_diffs.extend(self._to_file_diff(file) for file in files_data)
+        return file_diffs
+
+    async def get_commit_diff(
+        self, owner: str, repo: str, base_sha: str, head_sha: str
+    ) -> Optional[List[FileDiff]]:
+        """通过 compare 接口获取两个提交之间的文件变更"""
+        logger.info(f"获取提交差异: {owner}/{repo} {base_sha[:8]}...{head_sha[:8]}")
+        data = await self._request("GET", f"/repos/{owner}/{repo}/compare/{base_sha}...{head_sha}")
+        if data.get("status") not in ("ahead", "identical"):
+            # 强制推送或变基后旧提交不在新 head 的历史中
+            logger.info(f"提交历史已改写 ({data.get('status')})，无法增量审查")
+            return None
+        files = data.get("files", [])
+        if len(files) >= COMPARE_MAX_FILES:
+            # compare 接口最多返回 300 个文件，结果不完整
+            return None
+        return [self._to_file_diff(file) for file in files]
+
+    async def _get_head_sha(self, owner: str, repo: str, mr: MergeRequest) -> str:
+        """获取 PR 最新的 commit SHA，优先使用 MR 中已有的值"""
+        if mr.head_sha:
+            return mr.head_sha
+        pr_data = await self._request("GET", f"/repos/{owner}/{repo}/pulls/{mr.mr_id}")
+        mr.head_sha = pr_data["head"]["sha"]
+        return mr.head_sha
+
+    async def create_review(
+        self, owner: str, repo: str, mr: MergeRequest, comments: List[Comment]
+    ):
+        """通过一次 "create review" 请求提交所有文件评论和总结
+
+        文件评论作为行内评论、其余评论合并为审查正文，全部固定到同一个 commit。
+        评论数超过 GITHUB_REVIEW_MAX_COMMENTS 时拆分为多个审查；
+        某个审查提交失败（如行号不在 diff 中）时，该批评论退回逐条发布。
+        """
+        file_comments = [c for c in comments if c.comment_type == CommentType.FILE]
+        other_comments = [c for c in comments if c.comment_type != CommentType.FILE]
+        replies = [c for c in other_comments if c.comment_type == CommentType.REPLY]
+        general = [c for c in other_comments if c.comment_type != CommentType.REPLY]
+
+        commit_id = await self._get_head_sha(owner, repo, mr)
+        body = "\n\n".join(c.content for c in general)
+        batch_size = settings.GITHUB_REVIEW_MAX_COMMENTS
+        batches = [
+            file_comments[i : i + batch_size] for i in range(0, len(file_comments), batch_size)
+        ] or [[]]
+
+        url = f"/repos/{owner}/{repo}/pulls/{mr.mr_id}/reviews"
+        for index, batch in enumerate(batches):
+            # 总结只随第一个审查提交
+            batch_body = body if index == 0 else ""
+            if not batch and not batch_body:
+                continue
+            payload: Dict[str, Any] = {"commit_id": commit_id, "event": "COMMENT", "body": batch_body}
+            if batch:
+                payload["comments"] = [
+                    {
+                        "path": c.position.new_file_path,
+                        "line": c.position.new_line_number,
+                        "side": "RIGHT",
+                        "body": c.content,
+                    }
+                    for c in batch
+                ]
+            try:
+                logger.info(f"提交审查: {owner}/{repo}#{mr.mr_id}, 行内评论 {len(batch)} 条")
+                await self._request("POST", url, json=payload)
+            except Exception as e:
+                logger.warning(f"批量提交审查失败，改为逐条发布: {str(e)}")
+                fallback = batch + (general if index == 0 else [])
+                await super().create_review(owner, repo, mr, fallback)
+
+        if replies:
+            await super().create_review(owner, repo, mr, replies)
+
     async def _convert_github_comment_to_model(
         self, owner: str, repo: str, mr: MergeRequest, comment_data: dict
     ) -> Comment:
@@ -206,14 +284,14 @@ Error: {str(e)}
     ) -> List[Comment]:
         """获取评论列表"""
         url = f"/repos/{owner}/{repo}/pulls/{mr.mr_id}/comments"
-        comments_data = await self._request("GET", url)
 
         comments = []
-        for comment_data in comments_data:
-            comment = await self._convert_github_comment_to_model(
-                owner, repo, mr, comment_data
-            )
-            comments.append(comment)
+        async for comments_data in self._iter_pages(url):
+            for comment_data in comments_data:
+                comment = await self._convert_github_comment_to_model(
+                    owner, repo, mr, comment_data
+                )
+                comments.append(comment)
         return comments
 
     async def get_comment(
@@ -0,0 +1,404 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.infra.config.settings import get_settings
+from app.infra.git.github.client import GitHubClient
+from app.models.comment import Comment, CommentPosition, CommentType
+from app.models.git import ChangeType, FileDiff, MergeRequest, MergeRequestState
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_REVIEW_COMMENT_FRAGMENT = """
+fragment ReviewComment on PullRequestReviewComment {
+  databaseId
+  body
+  createdAt
+  updatedAt
+  path
+  line
+  originalLine
+  author { login }
+  replyTo { databaseId }
+}
+"""
+
+_PULL_REQUEST_QUERY = """
+query PullRequestSnapshot(
+  $owner: String!, $repo: String!, $number: Int!,
+  $filesCursor: String, $threadsCursor: String,
+  $withFiles: Boolean!, $withThreads: Boolean!
+) {
+  repository(owner: $owner, name: $repo) {
+    pullRequest(number: $number) {
+      number
+      title
+      body
+      state
+      createdAt
+      updatedAt
+      headRefName
+      baseRefName
+      headRefOid
+      author { login }
+      labels(first: 100) { nodes { name } }
+      reviewRequests(first: 100) {
+        nodes { requestedReviewer { ... on User { login } } }
+      }
+      comments { totalCount }
+      files(first: 100, after: $filesCursor) @include(if: $withFiles) {
+        pageInfo { hasNextPage endCursor }
+        nodes { path changeType }
+      }
+      reviewThreads(first: 50, after: $threadsCursor) @include(if: $withThreads) {
+        pageInfo { hasNextPage endCursor }
+        nodes {
+          id
+          comments(first: 100) {
+            pageInfo { hasNextPage endCursor }
+            nodes { ...ReviewComment }
+          }
+        }
+      }
+    }
+  }
+}
+""" + _REVIEW_COMMENT_FRAGMENT
+
+# review 线程超过一页的评论
+_THREAD_COMMENTS_QUERY = """
+query ReviewThreadComments($id: ID!, $cursor: String) {
+  node(id: $id) {
+    ... on PullRequestReviewThread {
+      comments(first: 100, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { ...ReviewComment }
+      }
+    }
+  }
+}
+""" + _REVIEW_COMMENT_FRAGMENT
+
+_STATE_MAP = {
+    "OPEN": MergeRequestState.OPEN,
+    "CLOSED": MergeRequestState.CLOSED,
+    "MERGED": MergeRequestState.MERGED,
+}
+
+_CHANGE_TYPE_MAP = {
+    "ADDED": ChangeType.ADD,
+    "DELETED": ChangeType.DELETE,
+}
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+def parse_unified_diff(diff_text: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """将整个 PR 的 unified diff 按文件拆分
+
+    返回 (路径到 patch 的映射, 重命名文件的新路径到旧路径的映射)，patch 与 REST files 接口的 patch 字段格式相同。
+
+    路径取自 +++ 行（删除文件取 --- 行），二进制文件和只重命名的文件没有 hunk，patch 为空。
+    """
+    patches: Dict[str, str] = {}
+    renames: Dict[str, str] = {}
+    path: Optional[str] = None
+    old_path: Optional[str] = None
+    hunk_lines: List[str] = []
+
+    def flush():
+        if path is not None:
+            patches[path] = "\n".join(hunk_lines)
+            if old_path is not None:
+                renames[path] = old_path
+
+    for line in diff_text.split("\n"):
+        if line.startswith("diff --git "):
+            flush()
+            header = line[len("diff --git "):]
+            # 路径不含 " b/" 时可以从头部直接拆出，之后会被 +++ / --- 行修正
+            path = header.split(" b/", 1)[1] if " b/" in header else header
+            old_path = None
+            hunk_lines = []
+        elif not hunk_lines and line.startswith("rename from "):
+            old_path = line[len("rename from "):]
+        elif not hunk_lines and line.startswith("--- a/"):
+            path = line[len("--- a/"):]
+        elif not hunk_lines and line.startswith("+++ b/"):
+            path = line[len("+++ b/"):]
+        elif line.startswith("@@") or hunk_lines:
+            hunk_lines.append(line)
+    flush()
+
+    # 去掉 diff 末尾换行产生的空行
+    patches = {p: patch[:-1] if patch.endswith("\n") else patch for p, patch in patches.items()}
+    return patches, renames
+
+
+class GitHubGraphQLClient(GitHubClient):
+    """基于 GitHub GraphQL 的客户端
+
+    一次分页查询获取 PR 信息、变更文件和全部 review 线程；GraphQL 不提供 patch，
+    同时并发请求一次 .diff 并按文件拆分。结果作为快照短暂缓存，
+    同一事件中的 get_merge_request / list_comments / get_comment 共享一次上游请求。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.graphql_url = settings.GITHUB_GRAPHQL_URL or self._default_graphql_url()
+        self.snapshot_ttl = settings.GITHUB_GRAPHQL_SNAPSHOT_TTL
+        self._snapshots: Dict[Tuple[str, str, str], Tuple[float, MergeRequest, List[Comment]]] = {}
+        self._inflight: Dict[Tuple[str, str, str], "asyncio.Future"] = {}
+
+    def _default_graphql_url(self) -> str:
+        # GitHub Enterprise 的 REST 地址为 /api/v3，GraphQL 为 /api/graphql
+        api_url = self.github_api_url.rstrip("/")
+        if api_url.endswith("/api/v3"):
+            return api_url[: -len("/v3")] + "/graphql"
+        return f"{api_url}/graphql"
+
+    async def _graphql(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """执行 GraphQL 查询"""
+        headers = {"Authorization": f"bearer {self.token}"}
+        session = self._get_session()
+        async with session.post(
+            self.graphql_url, json={"query": query, "variables": variables}, headers=headers
+        ) as response:
+            response.raise_for_status()
+            result = await response.json()
+        if result.get("errors"):
+            raise RuntimeError(f"GitHub GraphQL 查询失败: {result['errors']}")
+        return result["data"]
+
+    async def _get_diff_patches(
+        self, owner: str, repo: str, mr_id: str
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """获取整个 PR 的 diff 并按文件拆分，同时返回重命名文件的旧路径"""
+        headers = {
+            "Authorization": f"token {self.token}",
+            "Accept": "application/vnd.github.v3.diff",
+        }
+        session = self._get_session()
+        async with session.get(
+            f"{self.github_api_url}/repos/{owner}/{repo}/pulls/{mr_id}", headers=headers
+        ) as response:
+            response.raise_for_status()
+            return parse_unified_diff(await response.text())
+
+    async def _query_pull_request(
+        self, owner: str, repo: str, mr_id: str
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """分页获取 PR 信息、全部文件和全部 review 线程"""
+        variables: Dict[str, Any] = {
+            "owner": owner,
+            "repo": repo,
+            "number": int(mr_id),
+            "filesCursor": None,
+            "threadsCursor": None,
+            "withFiles": True,
+            "withThreads": True,
+        }
+        pr_data: Dict[str, Any] = {}
+        files: List[Dict[str, Any]] = []
+        threads: List[Dict[str, Any]] = []
+        while variables["withFiles"] or variables["withThreads"]:
+            data = await self._graphql(_PULL_REQUEST_QUERY, variables)
+            pull_request = data["repository"]["pullRequest"]
+            pr_data = pr_data or pull_request
+
+            for name, items, cursor, flag in (
+                ("files", files, "filesCursor", "withFiles"),
+                ("reviewThreads", threads, "threadsCursor", "withThreads"),
+            ):
+                if not variables[flag]:
+                    continue
+                connection = pull_request[name]
+                items.extend(connection["nodes"])
+                page_info = connection["pageInfo"]
+                variables[flag] = page_info["hasNextPage"]
+                variables[cursor] = page_info["endCursor"]
+
+        await asyncio.gather(
+            *[
+                self._query_thread_comments(thread)
+                for thread in threads
+                if thread["comments"]["pageInfo"]["hasNextPage"]
+            ]
+        )
+        return pr_data, files, threads
+
+    async def _query_thread_comments(self, thread: Dict[str, Any]):
+        """获取 review 线程第一页之后的评论，追加到线程中"""
+        connection = thread["comments"]
+        while connection["pageInfo"]["hasNextPage"]:
+            data = await self._graphql(
+                _THREAD_COMMENTS_QUERY, {"id": thread["id"], "cursor": connection["pageInfo"]["endCursor"]}
+            )
+            page = data["node"]["comments"]
+            thread["comments"]["nodes"].extend(page["nodes"])
+            connection = page
+
+    async def _fetch_snapshot(
+        self, owner: str, repo: str, mr_id: str
+    ) -> Tuple[MergeRequest, List[Comment]]:
+        logger.info(f"通过 GraphQL 获取 PR 快照: {owner}/{repo}#{mr_id}")
+        (pr_data, files, threads), diff = await asyncio.gather(
+            self._query_pull_request(owner, repo, mr_id),
+            self._get_diff_patches_or_none(owner, repo, mr_id),
+        )
+        if diff is None:
+            # diff 过大时 GitHub 拒绝返回，退回 REST files 接口
+            file_diffs = await self._list_file_diffs(owner, repo, mr_id)
+        else:
+            # GraphQL 的变更文件没有旧路径，重命名信息取自 diff
+            patches, renames = diff
+            file_diffs = [
+                FileDiff(
+                    new_file_path=file["path"],
+                    old_file_path=renames.get(file["path"], file["path"]),
+                    change_type=_CHANGE_TYPE_MAP.get(file["changeType"], ChangeType.MODIFY),
+                    diff_content=patches.get(file["path"], ""),
+                    line_changes={},
+                )
+                for file in files
+            ]
+
+        mr = MergeRequest(
+            mr_id=str(pr_data["number"]),
+            owner=owner,
+            repo=repo,
+            title=pr_data["title"],
+            author=(pr_data.get("author") or {}).get("login", "ghost"),
+            state=_STATE_MAP.get(pr_data["state"], MergeRequestState.OPEN),
+            description=pr_data["body"] or "",
+            source_branch=pr_data["headRefName"],
+            target_branch=pr_data["baseRefName"],
+            created_at=_parse_datetime(pr_data["createdAt"]),
+            updated_at=_parse_datetime(pr_data["updatedAt"]),
+            file_diffs=file_diffs,
+            labels=[label["name"] for label in pr_data["labels"]["nodes"]],
+            reviewers=[
+                request["requestedReviewer"]["login"]
+                for request in pr_data["reviewRequests"]["nodes"]
+                if request.get("requestedReviewer") and request["requestedReviewer"].get("login")
+            ],
+            comments_count=pr_data["comments"]["totalCount"],
+            head_sha=pr_data["headRefOid"],
+        )
+        comments = [
+            self._convert_graphql_comment_to_model(mr, comment_data)
+            for thread in threads
+            for comment_data in thread["comments"]["nodes"]
+        ]
+        return mr, comments
+
+    async def _get_diff_patches_or_none(
+        self, owner: str, repo: str, mr_id: str
+    ) -> Optional[Tuple[Dict[str, str], Dict[str, str]]]:
+        try:
+            return await self._get_diff_patches(owner, repo, mr_id)
+        except Exception as e:
+            logger.warning(f"获取 PR diff 失败，改用 files 接口: {str(e)}")
+            return None
+
+    @staticmethod
+    def _convert_graphql_comment_to_model(mr: MergeRequest, comment_data: dict) -> Comment:
+        """将 GraphQL review 评论转换为 Comment 模型，规则与 REST 转换一致"""
+        position = None
+        line_no = comment_data.get("line") or comment_data.get("originalLine")
+        if comment_data.get("path") and line_no:
+            position = CommentPosition(new_file_path=comment_data["path"], new_line_number=line_no)
+
+        reply_to = (comment_data.get("replyTo") or {}).get("databaseId")
+        comment_type = CommentType.GENERAL
+        if position:
+            comment_type = CommentType.FILE
+        elif reply_to:
+            comment_type = CommentType.REPLY
+
+        return Comment(
+            comment_id=str(comment_data["databaseId"]),
+            author=(comment_data.get("author") or {}).get("login", "ghost"),
+            content=comment_data["body"],
+            created_at=_parse_datetime(comment_data["createdAt"]),
+            updated_at=_parse_datetime(comment_data.get("updatedAt")),
+            comment_type=comment_type,
+            mr_id=str(mr.mr_id),
+            position=position,
+            reply_to=str(reply_to) if reply_to else None,
+        )
+
+    async def _get_snapshot(
+        self, owner: str, repo: str, mr_id: str
+    ) -> Tuple[MergeRequest, List[Comment]]:
+        """获取 PR 快照，TTL 内复用，并发请求共享同一次查询"""
+        key = (owner, repo, str(mr_id))
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and snapshot[0] > time.monotonic():
+            return snapshot[1], snapshot[2]
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_snapshot(owner, repo, str(mr_id)))
+            self._inflight[key] = future
+            try:
+                mr, comments = await future
+            finally:
+                del self._inflight[key]
+            self._snapshots[key] = (time.monotonic() + self.snapshot_ttl, mr, comments)
+            return mr, comments
+        return await asyncio.shield(future)
+
+    async def invalidate(self, owner: str, repo: str, mr_id: str):
+        """丢弃 PR 快照"""
+        self._snapshots.pop((owner, repo, str(mr_id)), None)
+
+    async def get_merge_request(
+        self, owner: str, repo: str, mr_id: str
+    ) -> MergeRequest:
+        """获取合并请求信息"""
+        try:
+            mr, _ = await self._get_snapshot(owner, repo, mr_id)
+            # 调用方会修改 MR（如过滤文件），返回副本
+            return mr.model_copy(deep=True)
+        except Exception:
+            logger.exception(f"获取 PR 信息失败: {owner}/{repo}#{mr_id}")
+            raise
+
+    async def list_comments(
+        self, owner: str, repo: str, mr: MergeRequest
+    ) -> List[Comment]:
+        """获取评论列表"""
+        _, comments = await self._get_snapshot(owner, repo, mr.mr_id)
+        return [comment.model_copy(deep=True) for comment in comments]
+
+    async def get_comment(
+        self, owner: str, repo: str, mr: MergeRequest, comment_id: str
+    ) -> Comment:
+        """获取评论详情，快照中没有时退回 REST 接口"""
+        _, comments = await self._get_snapshot(owner, repo, mr.mr_id)
+        for comment in comments:
+            if comment.comment_id == str(comment_id):
+                return comment.model_copy(deep=True)
+        return await super().get_comment(owner, repo, mr, comment_id)
+
+    async def create_comment(self, owner: str, repo: str, comment: Comment, mr: MergeRequest):
+        """创建评论，之后的读取重新获取快照"""
+        try:
+            await super().create_comment(owner, repo, comment, mr)
+        finally:
+            await self.invalidate(owner, repo, mr.mr_id)
+
+    async def create_review(
+        self, owner: str, repo: str, mr: MergeRequest, comments: List[Comment]
+    ):
+        """批量发布评论，之后的读取重新获取快照"""
+        try:
+            await super().create_review(owner, repo, mr, comments)
+        finally:
+            await self.invalidate(owner, repo, mr.mr_id)
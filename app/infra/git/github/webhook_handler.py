@@ -24,7 +24,7 @@ class GitHubWebhookHandler(BaseWebhookHandler):
             Tuple[str, Optional[Any]]: (事件类型, 事件数据)
             事件类型可以是：
             - "ping": 首次配置 webhook 时的测试事件
-            - "pull_request": PR 相关事件（仅处理首次打开）
+            - "pull_request": PR 相关事件（处理首次打开和新推送）
             - "pull_request_review_comment": PR 评论事件（仅处理回复）
         """
         # 验证 webhook 签名
@@ -36,6 +36,11 @@ class GitHubWebhookHandler(BaseWebhookHandler):
         if not event_type:
             raise HTTPException(status_code=400, detail="Missing event type")
 
+        # 平台重试的投递直接忽略
+        if await self.is_duplicate_delivery(request, "github"):
+            logger.info(f"忽略重复投递: {request.headers.get('X-GitHub-Delivery')}")
+            return WebHookEvent(event_type=WebHookEventType.DUPLICATE, event_data=None)
+
         # 获取请求数据
         payload = await request.json()
 
@@ -62,16 +67,23 @@ class GitHubWebhookHandler(BaseWebhookHandler):
             return WebHookEvent(event_type=WebHookEventType.PING, event_data=None)
 
         elif event_type == "pull_request":
-            # 只处理 PR 首次打开的事件
+            # 处理 PR 首次打开和新推送的事件，新推送或更新时让 MR 快照失效
             action = payload.get("action")
-            if action != "opened":
+            pr_number = str(payload["pull_request"]["number"])
+            if action in ("synchronize", "edited", "reopened", "closed"):
+                await self.invalidate_snapshot(owner, repo, pr_number)
+            incremental = action == "synchronize" and settings.ENABLE_INCREMENTAL_REVIEW
+            if action != "opened" and not incremental:
                 logger.info(f"忽略 PR 事件: {action}")
                 return None
 
-            pr_number = str(payload["pull_request"]["number"])
-            logger.info(f"处理 PR 打开事件: {owner}/{repo}#{pr_number}")
+            if incremental:
+                logger.info(f"处理 PR 推送事件: {owner}/{repo}#{pr_number}")
+            else:
+                logger.info(f"处理 PR 打开事件: {owner}/{repo}#{pr_number}")
 
-            return WebHookEvent(event_type=WebHookEventType.MERGE_REQUEST, event_data=MergeRequestEvent(owner=owner, repo=repo, mr_id=pr_number))
+            head_sha = payload["pull_request"].get("head", {}).get("sha")
+            return WebHookEvent(event_type=WebHookEventType.MERGE_REQUEST, event_data=MergeRequestEvent(owner=owner, repo=repo, mr_id=pr_number, head_sha=head_sha, incremental=incremental))
 
         elif event_type == "pull_request_review_comment":
             # 只处理评论回复
@@ -1,13 +1,13 @@
 import asyncio
 import logging
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import aiohttp
 from fastapi import HTTPException, Request
 
 from app.infra.config.settings import get_settings
-from app.infra.git.base import GitClientBase
+from app.infra.git.base import COMPARE_MAX_FILES, GitClientBase
 from app.models.comment import Comment, CommentPosition, CommentType
 from app.models.git import ChangeType, FileDiff, MergeRequest, MergeRequestState
 from async_lru import alru_cache
@@ -25,20 +25,26 @@ class GitLabClient(GitClientBase):
         self.webhook_secret = settings.GITLAB_WEBHOOK_SECRET
         self.timeout = aiohttp.ClientTimeout(total=10)  # 5秒超时
 
-    async def _request(self, method: str, url: str, **kwargs) -> Any:
-        """发送 HTTP 请求到 GitLab API"""
+    async def _send(self, method: str, url: str, **kwargs) -> Tuple[Any, Mapping[str, str]]:
+        """发送 HTTP 请求到 GitLab API，返回响应数据和响应头"""
         headers = {
             "PRIVATE-TOKEN": self.token,
             "Content-Type": "application/json",
         }
         logger.info(f"请求: {method} {url}")
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.request(
-                    method, f"{self.base_url}{url}", headers=headers, **kwargs, ssl=False
-                ) as response:
-                    response.raise_for_status()
-                    return await response.json()
+            session = self._get_session()
+            full_url = f"{self.base_url}{url}"
+            cache_key, cached = await self._lookup_http_cache(method, full_url, headers)
+            async with session.request(
+                method, full_url, headers=headers, **kwargs, ssl=False
+            ) as response:
+                if response.status == 304 and cached is not None:
+                    return self._serve_not_modified(cached)
+                response.raise_for_status()
+                data = await response.json()
+                await self._store_http_cache(cache_key, data, response.headers)
+                return data, response.headers
         except Exception as e:
                 logger.error(f"""
 GitHub API Request Error:
@@ -70,22 +76,7 @@ Error: {str(e)}
                 f"/projects/{encoded_project_path}/merge_requests/{mr_id}/changes?access_raw_diffs=true"
             )
 
-            file_diffs = []
-            for change in changes_data.get("changes", []):
-                change_type = ChangeType.MODIFY
-                if change.get("new_file"):
-                    change_type = ChangeType.ADD
-                elif change.get("deleted_file"):
-                    change_type = ChangeType.DELETE
-
-                file_diff = FileDiff(
-                    new_file_path=change["new_path"],
-                    old_file_path=change.get("old_path"),
-                    change_type=change_type,
-                    diff_content=change.get("diff", ""),
-                    line_changes={},
-                )
-                file_diffs.append(file_diff)
+            file_diffs = [self._to_file_diff(change) for change in changes_data.get("changes", [])]
 
             state_map = {
                 "opened": MergeRequestState.OPEN,
@@ -113,11 +104,53 @@ Error: {str(e)}
                 ],
                 comments_count=mr_data.get("user_notes_count", 0),
                 project_id=mr_data["project_id"],
+                head_sha=mr_data.get("sha"),
             )
         except Exception as e:
             logger.exception(f"获取 MR 信息失败: {owner}/{repo}!{mr_id}")
             raise
     
+    @staticmethod
+    def _to_file_diff(change: Dict[str, Any]) -> FileDiff:
+        change_type = ChangeType.MODIFY
+        if change.get("new_file"):
+            change_type = ChangeType.ADD
+        elif change.get("deleted_file"):
+            change_type = ChangeType.DELETE
+
+        return FileDiff(
+            new_file_path=change["new_path"],
+            old_file_path=change.get("old_path"),
+            change_type=change_type,
+            diff_content=change.get("diff", ""),
+            line_changes={},
+        )
+
+    async def get_commit_diff(
+        self, owner: str, repo: str, base_sha: str, head_sha: str
+    ) -> Optional[List[FileDiff]]:
+        """通过 repository/compare 接口获取两个提交之间的文件变更"""
+        encoded_project_path = f"{owner}/{repo}".replace("/", "%2F")
+        logger.info(f"获取提交差异: {owner}/{repo} {base_sha[:8]}...{head_sha[:8]}")
+        merge_base = await self._request(
+            "GET",
+            f"/projects/{encoded_project_path}/repository/merge_base?refs[]={base_sha}&refs[]={head_sha}",
+        )
+        if merge_base.get("id") != base_sha:
+            # 强制推送或变基后旧提交不在新 head 的历史中
+            logger.info(f"提交历史已改写，{base_sha[:8]} 不是 {head_sha[:8]} 的祖先，无法增量审查")
+            return None
+        # straight=true 直接比较两个提交，而不是从合并基点比较
+        data = await self._request(
+            "GET",
+            f"/projects/{encoded_project_path}/repository/compare?from={base_sha}&to={head_sha}&straight=true",
+        )
+        diffs = data.get("diffs", [])
+        if data.get("compare_timeout") or len(diffs) >= COMPARE_MAX_FILES:
+            # 比较超时或文件过多，结果不完整
+            return None
+        return [self._to_file_diff(change) for change in diffs]
+
     @alru_cache(maxsize=100)
     async def _get_latest_mr_version(self, project_id: str, mr_id: str):
         mr_data = await self._request(
@@ -153,6 +186,9 @@ Error: {str(e)}
                     }
                 if comment.position.old_file_path:
                     comment_body["position"]["old_path"] = comment.position.old_file_path
+                if comment.position.old_line_number:
+                    # 未修改的行必须同时给出 old_line
+                    comment_body["position"]["old_line"] = comment.position.old_line_number
                 
                 try:
                     # Try to create file comment first
@@ -235,17 +271,15 @@ Content: {comment.content}"""
         encoded_project_path = project_path.replace("/", "%2F")
         
         # GitLab 中需要同时获取评论和讨论
-        notes_data = await self._request(
-            "GET",
-            f"/projects/{encoded_project_path}/merge_requests/{mr.mr_id}/notes"
-        )
-
         comments = []
-        for note_data in notes_data:
-            comment = await self._convert_gitlab_comment_to_model(
-                owner, repo, mr, note_data
-            )
-            comments.append(comment)
+        async for notes_data in self._iter_pages(
+            f"/projects/{encoded_project_path}/merge_requests/{mr.mr_id}/notes"
+        ):
+            for note_data in notes_data:
+                comment = await self._convert_gitlab_comment_to_model(
+                    owner, repo, mr, note_data
+                )
+                comments.append(comment)
         return comments
 
     async def get_comment(
@@ -5,7 +5,7 @@ from fastapi import HTTPException, Request
 
 from app.infra.config.settings import get_settings
 from app.models.const import BOT_PREFIX
-from .client import GitLabClient
+from app.infra.git.factory import GitClientFactory
 from app.infra.git.base_webhook_handler import BaseWebhookHandler, MergeRequestEvent, MergeRequestCommentEvent, WebHookEvent, WebHookEventType
 
 logger = logging.getLogger(__name__)
@@ -15,7 +15,7 @@ class GitLabWebhookHandler(BaseWebhookHandler):
     """GitLab Webhook Handler"""
 
     def __init__(self):
-        self.client = GitLabClient()
+        self.client = GitClientFactory.get_client()
 
     async def handle_webhook(self, request: Request) -> Optional[WebHookEvent]:
         """Handle GitLab webhook request"""
@@ -29,6 +29,11 @@ class GitLabWebhookHandler(BaseWebhookHandler):
         if not event_type:
             raise HTTPException(status_code=400, detail="Missing event type")
 
+        # Retried deliveries are ignored
+        if await self.is_duplicate_delivery(request, "gitlab"):
+            logger.info(f"Ignoring duplicate delivery: {request.headers.get('X-Gitlab-Event-UUID')}")
+            return WebHookEvent(event_type=WebHookEventType.DUPLICATE, event_data=None)
+
         # Get request data
         payload = await request.json()
 
@@ -58,10 +63,20 @@ class GitLabWebhookHandler(BaseWebhookHandler):
         elif event_type == "Merge Request Hook":
             mr_state = payload.get("object_attributes", {}).get("state")
             mr_draft = payload.get("object_attributes", {}).get("draft")
+            mr_id = str(payload["object_attributes"]["iid"])
+            action = payload["object_attributes"].get("action")
+            if action != "open":
+                # Pushes and edits change the MR, drop cached snapshots
+                await self.invalidate_snapshot(owner, repo, mr_id)
             if mr_state == 'opened' and not mr_draft:
-                mr_id = str(payload["object_attributes"]["iid"])
-                logger.info(f"Handling MR open event: {owner}/{repo}!{mr_id}")
-                return WebHookEvent(event_type=WebHookEventType.MERGE_REQUEST, event_data=MergeRequestEvent(owner=owner, repo=repo, mr_id=mr_id))
+                # Update hooks carry oldrev only when new commits were pushed
+                incremental = action == "update" and settings.ENABLE_INCREMENTAL_REVIEW
+                if incremental and not payload["object_attributes"].get("oldrev"):
+                    logger.info(f"Ignoring MR update without new commits: {owner}/{repo}!{mr_id}")
+                    return None
+                logger.info(f"Handling MR {'push' if incremental else 'open'} event: {owner}/{repo}!{mr_id}")
+                head_sha = (payload["object_attributes"].get("last_commit") or {}).get("id")
+                return WebHookEvent(event_type=WebHookEventType.MERGE_REQUEST, event_data=MergeRequestEvent(owner=owner, repo=repo, mr_id=mr_id, head_sha=head_sha, incremental=incremental))
             return None
 
         elif event_type == "Note Hook":
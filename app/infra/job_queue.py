@@ -0,0 +1,220 @@
+import json
+import logging
+import time
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+import aioredis
+from pydantic import BaseModel
+
+from app.infra.cache.redis_client import get_redis
+from app.infra.config.settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# 将到期的重试任务移回任务 stream，移动和删除在一个脚本内完成，多个 worker 不会重复投递。
+# KEYS[1]: 重试 zset；KEYS[2]: 任务 stream；ARGV: 当前时间、单次最多移动数、stream 最大长度
+# 返回移动的任务数
+_PROMOTE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    local job = cjson.decode(member)
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*',
+        'kind', job.kind, 'payload', job.payload, 'attempts', job.attempts)
+    redis.call('ZREM', KEYS[1], member)
+end
+return #due
+"""
+
+
+class JobKind(Enum):
+    REVIEW_MR = "review_mr"
+    HANDLE_COMMENT = "handle_comment"
+
+
+class Job(BaseModel):
+    job_id: str = ""
+    kind: JobKind
+    payload: Dict[str, Any]
+    attempts: int = 0
+
+    def fields(self) -> Dict[str, str]:
+        return {
+            "kind": self.kind.value,
+            "payload": json.dumps(self.payload),
+            "attempts": str(self.attempts),
+        }
+
+    @classmethod
+    def from_entry(cls, job_id: Any, fields: Any) -> "Job":
+        """解析 stream 条目，兼容字典和原始 [k, v, k, v] 两种返回格式"""
+        if not isinstance(fields, dict):
+            fields = dict(zip(fields[::2], fields[1::2]))
+        fields = {_decode(k): _decode(v) for k, v in fields.items()}
+        return cls(
+            job_id=_decode(job_id),
+            kind=JobKind(fields["kind"]),
+            payload=json.loads(fields["payload"]),
+            attempts=int(fields.get("attempts", 0)),
+        )
+
+
+def _decode(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+class JobQueue:
+    """基于 Redis Streams 消费组的持久化任务队列
+
+    任务处理成功后 XACK；失败时按指数退避放入重试 zset，超过最大次数转入死信 stream；
+    worker 崩溃后未确认的任务在 JOB_VISIBILITY_TIMEOUT 后由其他 worker 通过 XAUTOCLAIM 接管。
+    """
+
+    def __init__(
+        self,
+        stream: Optional[str] = None,
+        group: Optional[str] = None,
+        redis: Optional[aioredis.Redis] = None,
+    ):
+        self.stream = stream or settings.JOB_QUEUE_STREAM
+        self.group = group or settings.JOB_QUEUE_GROUP
+        self.retry_key = f"{self.stream}:retry"
+        self.dead_key = f"{self.stream}:dead"
+        self.redis = redis or get_redis()
+        self._promote = self.redis.register_script(_PROMOTE_SCRIPT)
+        self._group_ready = False
+
+    async def ensure_group(self):
+        """创建消费组（stream 不存在时一并创建）"""
+        if self._group_ready:
+            return
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def enqueue(self, kind: JobKind, payload: Dict[str, Any]) -> str:
+        """投递任务，返回任务 ID"""
+        job_id = await self.redis.xadd(
+            self.stream,
+            Job(kind=kind, payload=payload).fields(),
+            maxlen=settings.JOB_QUEUE_MAX_LEN,
+            approximate=True,
+        )
+        job_id = _decode(job_id)
+        logger.info(f"任务已入队: {kind.value} {payload} ({job_id})")
+        return job_id
+
+    async def read(self, consumer: str, count: int, block_ms: int = 1000) -> List[Job]:
+        """读取分配给当前消费者的新任务"""
+        await self.ensure_group()
+        response = await self.redis.xreadgroup(
+            self.group, consumer, {self.stream: ">"}, count=count, block=block_ms
+        )
+        jobs = []
+        for _, entries in response or []:
+            for job_id, fields in entries:
+                jobs.append(Job.from_entry(job_id, fields))
+        return jobs
+
+    async def claim_stale(self, consumer: str, count: int) -> List[Job]:
+        """接管其他 worker 超时未确认的任务"""
+        await self.ensure_group()
+        min_idle_ms = settings.JOB_VISIBILITY_TIMEOUT * 1000
+        response = await self.redis.execute_command(
+            "XAUTOCLAIM", self.stream, self.group, consumer, min_idle_ms, "0-0", "COUNT", count
+        )
+        jobs = []
+        for entry in response[1]:
+            # 已被删除的条目返回空字段
+            if entry and entry[1]:
+                jobs.append(Job.from_entry(entry[0], entry[1]))
+        if jobs:
+            logger.warning(f"接管超时任务: {[job.job_id for job in jobs]}")
+        return jobs
+
+    async def heartbeat(self, consumer: str, job_ids: List[str]):
+        """刷新执行中任务的空闲时间，避免长时间审查被其他 worker 接管"""
+        if job_ids:
+            await self.redis.xclaim(self.stream, self.group, consumer, 0, job_ids, justid=True)
+
+    async def ack(self, job: Job):
+        """确认任务完成并从 stream 删除"""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.xack(self.stream, self.group, job.job_id)
+        pipe.xdel(self.stream, job.job_id)
+        await pipe.execute()
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(
+            settings.JOB_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)),
+            settings.JOB_RETRY_MAX_DELAY,
+        )
+
+    async def fail(self, job: Job, error: str):
+        """任务失败：延迟重试，超过最大次数转入死信 stream"""
+        attempts = job.attempts + 1
+        pipe = self.redis.pipeline(transaction=True)
+        if attempts >= settings.JOB_MAX_ATTEMPTS:
+            logger.error(f"任务 {job.job_id} 失败 {attempts} 次，转入死信队列: {error}")
+            self._dead_letter(pipe, job, attempts, error)
+        else:
+            delay = self.retry_delay(attempts)
+            logger.warning(f"任务 {job.job_id} 第 {attempts} 次失败，{delay:.0f} 秒后重试: {error}")
+            member = json.dumps(job.model_copy(update={"attempts": attempts}).fields())
+            pipe.zadd(self.retry_key, {member: time.time() + delay})
+        pipe.xack(self.stream, self.group, job.job_id)
+        pipe.xdel(self.stream, job.job_id)
+        await pipe.execute()
+
+    async def dead_letter(self, job: Job, error: str):
+        """重试不会成功的任务直接转入死信 stream"""
+        logger.error(f"任务 {job.job_id} 无法重试，转入死信队列: {error}")
+        pipe = self.redis.pipeline(transaction=True)
+        self._dead_letter(pipe, job, job.attempts + 1, error)
+        pipe.xack(self.stream, self.group, job.job_id)
+        pipe.xdel(self.stream, job.job_id)
+        await pipe.execute()
+
+    def _dead_letter(self, pipe, job: Job, attempts: int, error: str):
+        fields = job.model_copy(update={"attempts": attempts}).fields()
+        fields.update({"error": error, "job_id": job.job_id})
+        pipe.xadd(self.dead_key, fields, maxlen=settings.JOB_QUEUE_MAX_LEN, approximate=True)
+
+    async def promote_due(self, limit: int = 100) -> int:
+        """将到期的重试任务重新投递"""
+        return int(
+            await self._promote(
+                keys=[self.retry_key, self.stream],
+                args=[time.time(), limit, settings.JOB_QUEUE_MAX_LEN],
+            )
+        )
+
+    async def stats(self) -> Dict[str, int]:
+        await self.ensure_group()
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.xlen(self.stream)
+        pipe.xpending(self.stream, self.group)
+        pipe.zcard(self.retry_key)
+        pipe.xlen(self.dead_key)
+        length, pending, retrying, dead = await pipe.execute()
+        return {
+            "queued": int(length) - int(pending["pending"]),
+            "pending": int(pending["pending"]),
+            "retrying": int(retrying),
+            "dead": int(dead),
+        }
+
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """获取全局共享的任务队列"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
@@ -1,47 +1,135 @@
 import logging
+from enum import Enum
+from typing import Optional, Tuple
 
 import aioredis
 
+from app.infra.cache.redis_client import get_redis
 from app.infra.config.settings import get_settings
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# 令牌桶：容量为 max_count，在 RATE_LIMIT_EXPIRE 秒内匀速补满。
+# 读取、补充、扣减在一个脚本内原子完成，时间取自 Redis 服务器，避免多进程时钟漂移。
+# 预留额度只对本次请求生效：剩余令牌扣除本次消耗后不得低于预留额度，留给高优先级请求。
+# take(桶键, 容量, 补充速率（每秒）, 本次消耗, 过期时间（秒）, 预留额度) 返回 是否允许, 剩余令牌
+_TOKEN_BUCKET_FUNCTION = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+
+local function take(key, capacity, rate, cost, ttl, reserve)
+    local now = redis.call('TIME')
+    local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+
+    -- 旧版固定窗口计数器是字符串键，直接替换为令牌桶
+    if redis.call('TYPE', key).ok == 'string' then
+        redis.call('DEL', key)
+    end
+
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1])
+    local ts = tonumber(bucket[2])
+    if tokens == nil or ts == nil then
+        tokens = capacity
+        ts = now_ms
+    end
+
+    tokens = math.min(capacity, tokens + math.max(0, now_ms - ts) * rate / 1000)
+
+    local allowed = 0
+    if cost + reserve <= tokens then
+        tokens = tokens - cost
+        allowed = 1
+    end
+
+    if cost > 0 then
+        redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now_ms)
+        redis.call('EXPIRE', key, ttl)
+    end
+    return allowed, tokens
+end
+"""
+
+# KEYS[1]: 桶键；ARGV: 容量、补充速率（每秒）、本次消耗、过期时间（秒）、预留额度
+# 返回 {是否允许, 剩余令牌}
+_TOKEN_BUCKET_SCRIPT = _TOKEN_BUCKET_FUNCTION + """
+local allowed, tokens = take(KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]),
+    tonumber(ARGV[4]), tonumber(ARGV[5] or '0'))
+return {allowed, tostring(tokens)}
+"""
+
+# 一次审查开始前的全部计数检查和更新：单个 MR 审查次数上限、每小时 MR 审查配额、审查次数加一。
+# 任一检查不通过时不修改任何计数。
+# KEYS[1]: MR 审查次数键；KEYS[2]: 每小时审查配额桶键
+# ARGV: 单个 MR 最大审查次数、是否检查单个 MR 上限、每小时配额、补充速率、桶过期时间、审查次数过期时间
+# 返回 {状态, 当前审查次数}，状态 1 允许，0 达到单个 MR 上限，-1 达到每小时配额
+_BEGIN_REVIEW_SCRIPT = _TOKEN_BUCKET_FUNCTION + """
+local count = tonumber(redis.call('GET', KEYS[1]) or '0')
+if ARGV[2] == '1' and count >= tonumber(ARGV[1]) then
+    return {0, count}
+end
+local allowed = take(KEYS[2], tonumber(ARGV[3]), tonumber(ARGV[4]), 1, tonumber(ARGV[5]), 0)
+if allowed == 0 then
+    return {-1, count}
+end
+count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[6])
+end
+return {1, count}
+"""
+
+
+class ReviewAdmission(Enum):
+    ALLOWED = 1
+    MR_LIMIT = 0
+    HOURLY_LIMIT = -1
+
 
 class RateLimiter:
-    """速率限制器"""
+    """速率限制器
 
-    def __init__(self):
-        self.redis = aioredis.from_url(settings.REDIS_URL)
-        self.settings = get_settings()
+    基于 Redis 令牌桶，每次检查只需一次往返，并发时不会超额放行。
+    """
 
-    async def check_and_increment(self, key: str, max_count: int) -> bool:
+    def __init__(self, redis: Optional[aioredis.Redis] = None):
+        self.redis = redis or get_redis()
+        self.settings = get_settings()
+        self._script = self.redis.register_script(_TOKEN_BUCKET_SCRIPT)
+        self._begin_review = self.redis.register_script(_BEGIN_REVIEW_SCRIPT)
+        self.review_ttl = 60 * 60 * 24 * 7  # 与 RedisClient 中审查次数的过期时间一致
+
+    async def _take(self, key: str, max_count: int, cost: float, reserve: float = 0) -> Tuple[bool, float]:
+        window = self.settings.RATE_LIMIT_EXPIRE
+        allowed, tokens = await self._script(
+            keys=[key], args=[max_count, max_count / window, cost, window, reserve]
+        )
+        return bool(allowed), float(tokens)
+
+    async def check_and_increment(
+        self, key: str, max_count: int, cost: float = 1, reserve: float = 0
+    ) -> bool:
         """
-        检查并增加计数
+        检查并扣减配额
 
         Args:
             key: Redis 键名
-            max_count: 最大允许次数
+            max_count: 每个 RATE_LIMIT_EXPIRE 周期内允许的总消耗
+            cost: 本次消耗，超过可用容量时按可用容量计算
+            reserve: 为高优先级请求预留、本次不可使用的额度
 
         Returns:
             bool: 是否允许继续执行
         """
+        reserve = min(reserve, max_count - 1)
+        cost = min(cost, max_count - reserve)
         try:
-            # 获取当前计数
-            count = await self.redis.get(key)
-            if count is None:
-                # 如果键不存在，创建并设置过期时间
-                await self.redis.set(key, 1, ex=self.settings.RATE_LIMIT_EXPIRE)
-                return True
-
-            count = int(count)
-            if count >= max_count:
-                logger.warning(f"达到速率限制: {key}, 当前: {count}, 最大: {max_count}")
-                return False
-
-            # 增加计数
-            await self.redis.incr(key)
-            return True
+            allowed, tokens = await self._take(key, max_count, cost, reserve)
+            if not allowed:
+                logger.warning(f"达到速率限制: {key}, 剩余: {tokens:.2f}, 本次消耗: {cost}, 最大: {max_count}")
+            return allowed
 
         except Exception as e:
             logger.exception(f"检查速率限制失败: {str(e)}")
@@ -50,18 +138,53 @@ class RateLimiter:
     async def get_remaining(self, key: str, max_count: int) -> int:
         """获取剩余可用次数"""
         try:
-            count = await self.redis.get(key)
-            if count is None:
-                return max_count
-            return max(0, max_count - int(count))
+            _, tokens = await self._take(key, max_count, 0)
+            return int(tokens)
         except Exception as e:
             logger.exception(f"获取剩余次数失败: {str(e)}")
             return 0
 
+    async def begin_review(
+        self, owner: str, repo: str, mr_id: str, check_limit: bool = True
+    ) -> ReviewAdmission:
+        """审查开始前一次往返完成全部计数检查，并预先记一次审查
+
+        Args:
+            check_limit: 是否检查单个 MR 的最大审查次数
+        """
+        window = self.settings.RATE_LIMIT_EXPIRE
+        max_per_hour = self.settings.MAX_MR_REVIEWS_PER_HOUR
+        status, count = await self._begin_review(
+            keys=[self.get_mr_review_count_key(owner, repo, mr_id), self.get_mr_reviews_key()],
+            args=[
+                self.settings.MAX_MR_REVIEWS,
+                int(check_limit),
+                max_per_hour,
+                max_per_hour / window,
+                window,
+                self.review_ttl,
+            ],
+        )
+        admission = ReviewAdmission(int(status))
+        if admission != ReviewAdmission.ALLOWED:
+            logger.warning(f"MR 审查被限制: {owner}/{repo}#{mr_id}, {admission.name}, 已审查 {count} 次")
+        return admission
+
+    async def cancel_review(self, owner: str, repo: str, mr_id: str):
+        """审查失败时撤销 begin_review 记的审查次数"""
+        try:
+            await self.redis.decr(self.get_mr_review_count_key(owner, repo, mr_id))
+        except Exception as e:
+            logger.warning(f"撤销审查次数失败: {str(e)}")
+
     def get_ai_requests_key(self) -> str:
         """获取 AI 请求限制的键名"""
         return "rate_limit:ai_requests"
 
+    def get_mr_review_count_key(self, owner: str, repo: str, mr_id: str) -> str:
+        """获取单个 MR 审查次数的键名（与 RedisClient 共用）"""
+        return f"mr:review_count:{owner}:{repo}:{mr_id}"
+
     def get_mr_reviews_key(self) -> str:
         """获取 MR 审查限制的键名"""
         return "rate_limit:mr_reviews"
@@ -69,3 +192,20 @@ class RateLimiter:
     def get_comment_replies_key(self, comment_id: str) -> str:
         """获取评论回复限制的键名"""
         return f"rate_limit:comment_replies:{comment_id}"
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取全局共享的速率限制器"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
+
+
+async def close_rate_limiter():
+    """释放共享速率限制器，连接池由 close_redis 关闭"""
+    global _rate_limiter
+    _rate_limiter = None
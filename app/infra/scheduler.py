@@ -0,0 +1,196 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from app.infra.config.settings import get_settings
+from app.infra.job_queue import Job, JobKind
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class JobClass(Enum):
+    """任务优先级，定义顺序即调度顺序"""
+    REPLY = "reply"
+    INCREMENTAL = "incremental"
+    FULL = "full"
+
+
+# 当前任务的优先级，供 AI 客户端决定是否使用为评论回复预留的配额
+current_job_class: ContextVar[Optional[JobClass]] = ContextVar("current_job_class", default=None)
+
+
+def classify(kind: JobKind, payload: Dict[str, Any]) -> JobClass:
+    if kind == JobKind.HANDLE_COMMENT:
+        return JobClass.REPLY
+    if payload.get("incremental"):
+        return JobClass.INCREMENTAL
+    return JobClass.FULL
+
+
+def classify_job(job: Job) -> JobClass:
+    return classify(job.kind, job.payload)
+
+
+class _Entry:
+    __slots__ = ("repo", "start", "enqueued_at", "future")
+
+    def __init__(self, repo: str, start: float, future: asyncio.Future):
+        self.repo = repo
+        self.start = start
+        self.enqueued_at = time.monotonic()
+        self.future = future
+
+
+class _ClassQueue:
+    """单个优先级内按仓库加权公平排队（start-time fair queuing）
+
+    每个任务的虚拟开始时间为 max(当前虚拟时间, 同仓库上一个任务的虚拟结束时间)，
+    结束时间 = 开始时间 + 1 / 权重。按虚拟开始时间出队，繁忙的仓库只会排到自己的队尾。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+        self.completed = 0
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+        self.heap: List[Tuple[float, int, _Entry]] = []
+        self.waits: Deque[float] = deque(maxlen=1000)
+
+    def push(self, entry: _Entry, seq: int):
+        heapq.heappush(self.heap, (entry.start, seq, entry))
+
+    def pop(self) -> Optional[_Entry]:
+        while self.heap:
+            _, _, entry = heapq.heappop(self.heap)
+            if not entry.future.done():
+                self.virtual_time = max(self.virtual_time, entry.start)
+                return entry
+        return None
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, entry in self.heap if not entry.future.done())
+
+
+class ReviewScheduler:
+    """审查任务调度器
+
+    评论回复优先于增量审查，增量审查优先于全量审查；每类任务有独立的并发上限，
+    保证长时间的全量审查不会占满所有执行槽。同一类任务内按仓库加权公平排队。
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        class_limits: Optional[Dict[str, int]] = None,
+        repo_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.concurrency = concurrency or settings.WORKER_CONCURRENCY
+        limits = class_limits if class_limits is not None else settings.SCHEDULER_CLASS_LIMITS
+        self.repo_weights = repo_weights if repo_weights is not None else settings.SCHEDULER_REPO_WEIGHTS
+        self.classes: Dict[JobClass, _ClassQueue] = {
+            job_class: _ClassQueue(limits.get(job_class.value, self.concurrency))
+            for job_class in JobClass
+        }
+        self.running = 0
+        self._seq = itertools.count()
+
+    def _weight(self, repo: str) -> float:
+        return max(float(self.repo_weights.get(repo, 1.0)), 1e-6)
+
+    def _enqueue(self, job_class: JobClass, repo: str) -> _Entry:
+        queue = self.classes[job_class]
+        start = max(queue.virtual_time, queue.last_finish.get(repo, 0.0))
+        queue.last_finish[repo] = start + 1 / self._weight(repo)
+        entry = _Entry(repo, start, asyncio.get_running_loop().create_future())
+        queue.push(entry, next(self._seq))
+        self._dispatch()
+        return entry
+
+    def _dispatch(self):
+        for job_class in JobClass:
+            queue = self.classes[job_class]
+            while self.running < self.concurrency and queue.running < queue.limit:
+                entry = queue.pop()
+                if entry is None:
+                    break
+                self.running += 1
+                queue.running += 1
+                entry.future.set_result(None)
+            # 空闲仓库的虚拟时间已落后，不再需要记录
+            if not queue.heap:
+                queue.last_finish = {
+                    repo: finish for repo, finish in queue.last_finish.items() if finish > queue.virtual_time
+                }
+
+    def _release(self, job_class: JobClass):
+        queue = self.classes[job_class]
+        self.running -= 1
+        queue.running -= 1
+        queue.completed += 1
+        self._dispatch()
+
+    async def run(self, job_class: JobClass, repo: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """等待执行槽后运行任务
+
+        Args:
+            job_class: 任务优先级
+            repo: 仓库标识（owner/repo），用于公平排队
+            fn: 任务函数
+        """
+        entry = self._enqueue(job_class, repo)
+        try:
+            await entry.future
+        except asyncio.CancelledError:
+            # 已经分配到执行槽时归还
+            if entry.future.done() and not entry.future.cancelled():
+                self._release(job_class)
+            raise
+
+        wait = time.monotonic() - entry.enqueued_at
+        self.classes[job_class].waits.append(wait)
+        if wait > 1:
+            logger.info(f"{job_class.value} 任务排队 {wait:.1f} 秒: {repo}")
+
+        token = current_job_class.set(job_class)
+        try:
+            return await fn()
+        finally:
+            current_job_class.reset(token)
+            self._release(job_class)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for job_class, queue in self.classes.items():
+            waits = sorted(queue.waits)
+            result[job_class.value] = {
+                "queued": queue.queued,
+                "running": queue.running,
+                "completed": queue.completed,
+                "limit": queue.limit,
+                "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                "wait_max": waits[-1] if waits else 0.0,
+            }
+        return result
+
+
+_scheduler: Optional[ReviewScheduler] = None
+
+
+def get_scheduler() -> ReviewScheduler:
+    """获取进程内共享的任务调度器"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReviewScheduler()
+    return _scheduler
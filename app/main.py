@@ -1,9 +1,12 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.endpoints import review, webhook
+from app.api.endpoints import metrics, review, webhook
 from app.infra.config.settings import get_settings
 from app.infra.config.logging import setup_logging
+from app.services.container import get_container
 
 # 获取配置
 settings = get_settings()
@@ -11,11 +14,23 @@ settings = get_settings()
 # 设置日志
 setup_logging(debug=settings.DEBUG)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时创建并预热共享服务和连接池，关闭时释放"""
+    container = get_container()
+    await container.startup()
+    app.state.container = container
+    yield
+    await container.shutdown()
+
+
 app = FastAPI(
     title="AI Code Reviewer",
     description="AI 驱动的代码审查助手",
     version="1.0.0",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # 配置 CORS
@@ -32,6 +47,7 @@ app.include_router(
     webhook.router, prefix=f"{settings.API_V1_STR}", tags=["webhook"]
 )
 app.include_router(review.router, prefix=f"{settings.API_V1_STR}", tags=["review"])
+app.include_router(metrics.router, prefix=f"{settings.API_V1_STR}", tags=["metrics"])
 
 
 @app.get("/health")
@@ -1,19 +1,20 @@
 import logging
+import time
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import List, Optional, Set, Tuple
 
 from pydantic import BaseModel
 
 from app.infra.config.settings import get_settings
 from app.infra.git.factory import GitClientFactory
 from app.infra.git.base import GitClientBase
-from app.infra.rate_limiter import RateLimiter
+from app.infra.rate_limiter import ReviewAdmission, get_rate_limiter
 from app.models.const import BOT_PREFIX
 
 from .comment import Comment, CommentType
 from .comment_handler import CommentHandler
 from .git import MergeRequest
-from .pipeline import CodeReviewPipeline
+from .pipeline import CodeReviewPipeline, CommentCallback
 from .review import ReviewResult
 from .size_checker import SizeChecker
 
@@ -35,14 +36,21 @@ class Bot(BaseModel):
         self.pipelines = [CodeReviewPipeline()]
 
     async def _handle_review_mr(
-        self, mr: MergeRequest
+        self,
+        mr: MergeRequest,
+        on_comment: Optional[CommentCallback] = None,
+        admission: Optional[ReviewAdmission] = None,
     ) -> Tuple[ReviewResult, List[Comment]]:
         settings = get_settings()
-        rate_limiter = RateLimiter()
-        # 检查 MR 处理次数限制
-        if not await rate_limiter.check_and_increment(
-            rate_limiter.get_mr_reviews_key(), settings.MAX_MR_REVIEWS_PER_HOUR
-        ):
+        # 检查 MR 处理次数限制，调用方已通过 begin_review 检查时直接使用其结果
+        if admission is None:
+            rate_limiter = get_rate_limiter()
+            allowed = await rate_limiter.check_and_increment(
+                rate_limiter.get_mr_reviews_key(), settings.MAX_MR_REVIEWS_PER_HOUR
+            )
+        else:
+            allowed = admission == ReviewAdmission.ALLOWED
+        if not allowed:
             return (
                 ReviewResult(
                     mr_id=mr.mr_id,
@@ -56,6 +64,10 @@ class Bot(BaseModel):
         all_comments = []
         summaries = []
         failed_pipelines = []
+        if mr.base_review_sha:
+            summaries.append(
+                f"🔁 增量审查：仅包含 {mr.base_review_sha[:8]}..{(mr.head_sha or '')[:8]} 之间新推送的变更"
+            )
 
         # 检查 MR 大小
         size_checker = SizeChecker(self.name)
@@ -68,7 +80,7 @@ class Bot(BaseModel):
         if large_files:
             for file_diff in large_files:
                 comment = size_checker.create_large_file_comment(
-                    mr, file_diff, file_diff.diff_content.count("\n") + 1
+                    mr, file_diff, file_diff.line_count
                 )
                 all_comments.append(comment)
             summaries.append(size_checker.create_large_files_summary(large_files))
@@ -82,7 +94,7 @@ class Bot(BaseModel):
                 continue
             try:
                 logger.info(f"执行 pipeline: {pipeline.name} for MR #{mr.mr_id}")
-                result = await pipeline.review(mr)
+                result = await pipeline.review(mr, on_comment=on_comment)
                 all_comments.extend(result.comments)
                 if result.summary:
                     summaries.append(f"[{pipeline.name}] {result.summary}")
@@ -120,10 +132,37 @@ class Bot(BaseModel):
             all_comments,
         )
 
-    async def review_mr(self, mr: MergeRequest) -> ReviewResult:
-        """执行 MR 审查"""
+    async def review_mr(
+        self, mr: MergeRequest, admission: Optional[ReviewAdmission] = None
+    ) -> ReviewResult:
+        """执行 MR 审查
+
+        Args:
+            admission: RateLimiter.begin_review 的结果，为空时自行检查每小时配额
+        """
         git_client = GitClientFactory.get_client()
-        result, all_comments = await self._handle_review_mr(mr)
+        settings = get_settings()
+
+        # 流式审查时评论生成后立即发布，记录已发布的评论避免重复
+        posted: Set[int] = set()
+        on_comment: Optional[CommentCallback] = None
+        if settings.ENABLE_STREAMING_REVIEW:
+            started_at = time.monotonic()
+
+            async def post_streamed(comment: Comment):
+                if not posted:
+                    logger.info(
+                        f"MR #{mr.mr_id} 首条评论耗时: {time.monotonic() - started_at:.1f}s"
+                    )
+                posted.add(id(comment))
+                try:
+                    await self._post_comment(git_client, mr, comment)
+                except Exception:
+                    logger.exception(f"评论发布失败: {comment.model_dump_json()}")
+
+            on_comment = post_streamed
+
+        result, all_comments = await self._handle_review_mr(mr, on_comment, admission)
         if result.summary:
             summary_comment = Comment(
                 comment_id=f"summary_{datetime.utcnow().timestamp()}",
@@ -135,11 +174,15 @@ class Bot(BaseModel):
             )
             all_comments.append(summary_comment)
 
-        for comment in all_comments:
-            try:
-                await self._post_comment(git_client, mr, comment)
-            except Exception as e:
-                logger.exception(f"评论发布失败: {comment.model_dump_json()}")
+        pending = [comment for comment in all_comments if id(comment) not in posted]
+        if settings.ENABLE_BATCH_REVIEW:
+            await self._post_review(git_client, mr, pending)
+        else:
+            for comment in pending:
+                try:
+                    await self._post_comment(git_client, mr, comment)
+                except Exception as e:
+                    logger.exception(f"评论发布失败: {comment.model_dump_json()}")
         return result
 
     async def handle_comment(
@@ -152,6 +195,21 @@ class Bot(BaseModel):
         await self._post_comment(git_client, mr, comment)
         return comment
 
+    @staticmethod
+    async def _post_review(
+        git_client: GitClientBase, mr: MergeRequest, comments: List[Comment]
+    ):
+        """将一次审查的评论批量发布到 Git 平台"""
+        if not comments:
+            return
+        for comment in comments:
+            comment.content = f"{BOT_PREFIX} {comment.content}"
+        try:
+            await git_client.create_review(mr.owner, mr.repo, mr, comments)
+            logger.info(f"审查发布成功: MR #{mr.mr_id}, 评论 {len(comments)} 条")
+        except Exception:
+            logger.exception(f"审查发布失败: MR #{mr.mr_id}")
+
     @staticmethod
     async def _post_comment(
         git_client: GitClientBase, mr: MergeRequest, comment: Comment
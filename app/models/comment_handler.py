@@ -2,10 +2,10 @@ import logging
 from datetime import datetime
 from typing import Optional, Tuple
 
-from app.infra.ai.client import AIClient, Message
+from app.infra.ai.client import Message, get_ai_client
 from app.infra.config.settings import get_settings
-from app.infra.rate_limiter import RateLimiter
-from app.services.discussion_service import DiscussionService
+from app.infra.rate_limiter import get_rate_limiter
+from app.services.discussion_service import get_discussion_service
 
 from .comment import Comment, CommentType, Discussion
 from .git import FileDiff, MergeRequest
@@ -18,16 +18,16 @@ class CommentHandler:
 
     def __init__(self, bot_name: str):
         self.bot_name = bot_name
-        self.discussion_service = DiscussionService()
+        self.discussion_service = get_discussion_service()
         self.settings = get_settings()
 
     async def handle_comment(
         self, mr: MergeRequest, comment: Comment
     ) -> Tuple[Comment, bool]:
         """处理评论回复"""
-        rate_limiter = RateLimiter()
+        rate_limiter = get_rate_limiter()
         logger.info(f"处理评论: {comment.comment_id}")
-        ai_client = AIClient()
+        ai_client = get_ai_client()
 
         # 检查回复次数限制
         key = rate_limiter.get_comment_replies_key(comment.comment_id)
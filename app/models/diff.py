@@ -0,0 +1,206 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from enum import IntEnum
+from typing import Optional, Tuple
+
+_HUNK_HEADER = re.compile(r"@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+
+class LineOp(IntEnum):
+    CONTEXT = 0
+    ADD = 1
+    DELETE = 2
+
+
+class DiffIndex:
+    """unified diff 的紧凑行索引
+
+    解析一次 patch，将 hunk 中的每一行记录在定长数组中（操作码、旧行号、新行号、在原始文本中的偏移），
+    不复制行内容。新侧行号有序保存，按新行号查找行和 hunk 都是 O(log n)。
+    """
+
+    __slots__ = (
+        "text",
+        "line_count",
+        "ops",
+        "old_lines",
+        "new_lines",
+        "offsets",
+        "new_side",
+        "new_side_index",
+        "hunk_starts",
+        "hunk_old_starts",
+        "hunk_new_starts",
+        "hunk_new_ends",
+        "additions",
+        "deletions",
+    )
+
+    def __init__(self, text: str):
+        self.text = text
+        self.line_count = 0  # patch 总行数，与 text.count("\n") + 1 一致
+        self.ops = array("b")
+        self.old_lines = array("i")  # 新增行为 0
+        self.new_lines = array("i")  # 删除行为 0
+        self.offsets = array("i")  # 行首在 text 中的偏移
+        self.new_side = array("i")  # 新侧（上下文和新增）行号，递增
+        self.new_side_index = array("i")  # new_side 对应的行序号
+        self.hunk_starts = array("i")  # 每个 hunk 第一行的行序号
+        self.hunk_old_starts = array("i")  # 每个 hunk 旧侧起始行号
+        self.hunk_new_starts = array("i")  # 每个 hunk 新侧范围 [start, end)
+        self.hunk_new_ends = array("i")
+        self.additions = 0
+        self.deletions = 0
+        self._parse()
+
+    def _parse(self):
+        ops, old_lines, new_lines, offsets = self.ops, self.old_lines, self.new_lines, self.offsets
+        new_side, new_side_index = self.new_side, self.new_side_index
+        hunk_starts, hunk_new_starts, hunk_new_ends = self.hunk_starts, self.hunk_new_starts, self.hunk_new_ends
+        hunk_old_starts = self.hunk_old_starts
+        add_op, delete_op, context_op = LineOp.ADD.value, LineOp.DELETE.value, LineOp.CONTEXT.value
+        match_header = _HUNK_HEADER.match
+        lines = self.text.split("\n")
+        self.line_count = len(lines)
+        last = len(lines) - 1
+        old = new = 0
+        count = 0
+        in_hunk = False
+        pos = 0
+        # 局部绑定 append，解析 10 万行 diff 时省去属性查找
+        add_op_code, add_new_side, add_side_index = ops.append, new_side.append, new_side_index.append
+        add_old, add_new, add_offset = old_lines.append, new_lines.append, offsets.append
+        for number, line in enumerate(lines):
+            first = line[:1]
+            if first == "+" and in_hunk:
+                add_new_side(new)
+                add_side_index(count)
+                add_op_code(add_op)
+                add_old(0)
+                add_new(new)
+                add_offset(pos)
+                new += 1
+                count += 1
+            elif first == "-" and in_hunk:
+                add_op_code(delete_op)
+                add_old(old)
+                add_new(0)
+                add_offset(pos)
+                old += 1
+                count += 1
+            elif (first == " " or (not line and number < last)) and in_hunk:
+                # 部分平台会去掉空上下文行的前导空格
+                add_new_side(new)
+                add_side_index(count)
+                add_op_code(context_op)
+                add_old(old)
+                add_new(new)
+                add_offset(pos)
+                old += 1
+                new += 1
+                count += 1
+            elif first == "@" and match_header(line):
+                if in_hunk:
+                    hunk_new_ends.append(new)
+                match = match_header(line)
+                old, new = int(match.group(1)), int(match.group(2))
+                in_hunk = True
+                hunk_starts.append(count)
+                hunk_old_starts.append(old)
+                hunk_new_starts.append(new)
+            elif first != "\\" and in_hunk:
+                # 多文件 diff 的文件头等非 hunk 内容
+                hunk_new_ends.append(new)
+                in_hunk = False
+            pos += len(line) + 1
+        if in_hunk:
+            hunk_new_ends.append(new)
+        self.additions = ops.count(add_op)
+        self.deletions = len(ops) - len(new_side)
+
+    def __len__(self) -> int:
+        """hunk 中的行数"""
+        return len(self.ops)
+
+    def line(self, index: int) -> str:
+        """第 index 行的内容（不含操作符）"""
+        start = self.offsets[index] + 1
+        end = self.text.find("\n", start)
+        return self.text[start : end if end >= 0 else len(self.text)]
+
+    def find_new_line(self, new_line: int) -> int:
+        """新侧行号对应的行序号，不在 diff 中时返回 -1"""
+        i = bisect_left(self.new_side, new_line)
+        if i < len(self.new_side) and self.new_side[i] == new_line:
+            return self.new_side_index[i]
+        return -1
+
+    def contains_new_line(self, new_line: int) -> bool:
+        """新侧行号是否出现在 diff 中（可以评论的行）"""
+        return self.find_new_line(new_line) >= 0
+
+    def old_line_for_new(self, new_line: int) -> Optional[int]:
+        """上下文行对应的旧侧行号，新增行或不在 diff 中时返回 None"""
+        index = self.find_new_line(new_line)
+        if index < 0 or self.ops[index] != LineOp.CONTEXT:
+            return None
+        return self.old_lines[index]
+
+    def is_added(self, new_line: int) -> bool:
+        index = self.find_new_line(new_line)
+        return index >= 0 and self.ops[index] == LineOp.ADD
+
+    def hunk_for_new_line(self, new_line: int) -> int:
+        """新侧行号所在的 hunk 序号，不在任何 hunk 范围内时返回 -1"""
+        i = bisect_right(self.hunk_new_starts, new_line) - 1
+        if i >= 0 and new_line < self.hunk_new_ends[i]:
+            return i
+        return -1
+
+    def hunk_new_range(self, hunk: int) -> Tuple[int, int]:
+        """hunk 新侧的行号范围 [start, end)"""
+        return self.hunk_new_starts[hunk], self.hunk_new_ends[hunk]
+
+    def hunk_lines(self, hunk: int) -> Tuple[int, int]:
+        """hunk 的行序号范围 [start, end)"""
+        end = self.hunk_starts[hunk + 1] if hunk + 1 < len(self.hunk_starts) else len(self.ops)
+        return self.hunk_starts[hunk], end
+
+    def hunk_section(self, hunk: int) -> str:
+        """hunk 头 @@ 之后的函数上下文，hunk 为空时返回空字符串"""
+        start, end = self.hunk_lines(hunk)
+        if start == end:
+            return ""
+        header_end = self.offsets[start] - 1
+        header = self.text[self.text.rfind("\n", 0, header_end) + 1 : header_end]
+        match = _HUNK_HEADER.match(header)
+        return header[match.end() :].strip() if match else ""
+
+    def nearest_new_line(self, new_line: int) -> Optional[int]:
+        """diff 中距离给定行号最近的新侧行号"""
+        if not self.new_side:
+            return None
+        i = bisect_left(self.new_side, new_line)
+        if i == 0:
+            return self.new_side[0]
+        if i == len(self.new_side):
+            return self.new_side[-1]
+        before, after = self.new_side[i - 1], self.new_side[i]
+        return before if new_line - before <= after - new_line else after
+
+    def nbytes(self) -> int:
+        """索引数组占用的字节数（不含原始文本）"""
+        arrays = (
+            self.ops,
+            self.old_lines,
+            self.new_lines,
+            self.offsets,
+            self.new_side,
+            self.new_side_index,
+            self.hunk_starts,
+            self.hunk_old_starts,
+            self.hunk_new_starts,
+            self.hunk_new_ends,
+        )
+        return sum(a.itemsize * len(a) for a in arrays)
@@ -1,8 +1,11 @@
 from datetime import datetime
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+
+from app.infra.ai.tokenizer import BaseTokenizer, get_tokenizer
+from app.models.diff import DiffIndex
 
 
 class ChangeType(str, Enum):
@@ -16,8 +19,29 @@ class FileDiff(BaseModel):
     change_type: ChangeType
     diff_content: str
     old_file_path: Optional[str] = None
-    line_changes: Dict[int, str] = {}  # 行号到变更内容的映射
+    line_changes: Dict[int, str] = {}  # 行号到变更内容的映射（未填充，行级信息使用 index()）
+    _token_count_cache: Dict[Tuple[str, int], int] = PrivateAttr(default_factory=dict)
+    _index: Optional[DiffIndex] = PrivateAttr(default=None)
+
+    def index(self) -> DiffIndex:
+        """diff 的行索引，diff_content 不变时只解析一次"""
+        if self._index is None or self._index.text is not self.diff_content:
+            self._index = DiffIndex(self.diff_content)
+        return self._index
+
+    @property
+    def line_count(self) -> int:
+        return self.index().line_count
 
+    def token_count(self, tokenizer: Optional[BaseTokenizer] = None) -> int:
+        """计算 diff 内容的 token 数，按 tokenizer 和内容缓存"""
+        tokenizer = tokenizer or get_tokenizer()
+        key = (tokenizer.name, hash(self.diff_content))
+        count = self._token_count_cache.get(key)
+        if count is None:
+            count = tokenizer.count(self.diff_content)
+            self._token_count_cache[key] = count
+        return count
 
 
 class MergeRequestState(str, Enum):
@@ -44,3 +68,8 @@ class MergeRequest(BaseModel):
     reviewers: List[str] = []
     comments_count: int = 0
     project_id: Optional[int] = None
+    head_sha: Optional[str] = None  # 源分支最新提交，评论固定到该提交
+    base_review_sha: Optional[str] = None  # 增量审查时上次审查的 head，file_diffs 只包含之后的变更
+    previous_summary: Optional[str] = None  # 增量审查时上次审查的总结
+    anchor_file_diffs: Optional[List[FileDiff]] = None  # 增量审查时 MR 的完整变更，评论按此定位
+    omitted_files_note: Optional[str] = None  # 提示词压缩时未展示的文件说明
@@ -1,4 +1,11 @@
-from .base import AIReviewComment, AIReviewResponse, PipelineResult, ReviewPipeline
+from .base import (
+    AIReviewComment,
+    AIReviewResponse,
+    CommentCallback,
+    IncrementalReviewParser,
+    PipelineResult,
+    ReviewPipeline,
+)
 from .code_review import CodeReviewPipeline
 
 __all__ = [
@@ -6,5 +13,7 @@ __all__ = [
     "PipelineResult",
     "AIReviewResponse",
     "AIReviewComment",
+    "CommentCallback",
+    "IncrementalReviewParser",
     "CodeReviewPipeline"
 ]
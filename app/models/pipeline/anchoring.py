@@ -0,0 +1,185 @@
+import re
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.infra.config.settings import get_settings
+from app.models.diff import DiffIndex
+from app.models.git import FileDiff, MergeRequest
+
+from .base import AIReviewComment
+
+settings = get_settings()
+
+
+def anchor_findings(file_diff: FileDiff, comments: List[AIReviewComment]) -> List[Dict[str, Any]]:
+    """将评论的行号换算为相对 patch 的位置 (第几个新侧行, 偏移)，不随 hunk 平移变化"""
+    lines = file_diff.index().new_side
+    findings = []
+    for comment in comments:
+        line = comment.new_line_number or 1
+        index = max(bisect_right(lines, line) - 1, 0) if lines else -1
+        offset = line - lines[index] if lines else line
+        findings.append({"content": comment.content, "type": comment.type, "anchor": [index, offset]})
+    return findings
+
+
+def restore_findings(file_diff: FileDiff, findings: List[Dict[str, Any]]) -> List[AIReviewComment]:
+    """按新 patch 的行号还原缓存的评论"""
+    lines = file_diff.index().new_side
+    comments = []
+    for finding in findings:
+        index, offset = finding["anchor"]
+        if 0 <= index < len(lines):
+            line = lines[index] + offset
+        else:
+            line = offset
+        comments.append(
+            AIReviewComment(
+                new_file_path=file_diff.new_file_path,
+                old_file_path=file_diff.old_file_path,
+                new_line_number=max(line, 1),
+                content=finding["content"],
+                type=finding["type"],
+            )
+        )
+    return comments
+
+
+_CODE_BLOCK = re.compile(r"```[^\n]*\n(.*?)```", re.S)
+_INLINE_CODE = re.compile(r"`([^`\n]+)`")
+# 模糊匹配的最低相似度
+_MATCH_THRESHOLD = 0.6
+# 模糊匹配的查找范围（吸附距离的倍数）
+_MATCH_WINDOW = 5
+
+# 评论定位统计
+_anchor_stats: Dict[str, int] = {"kept": 0, "snapped": 0, "matched": 0, "folded": 0}
+
+
+def anchor_stats() -> Dict[str, int]:
+    return dict(_anchor_stats)
+
+
+def quoted_code(content: str) -> List[str]:
+    """评论中引用的代码行（代码块和行内代码）"""
+    snippets = []
+    for block in _CODE_BLOCK.findall(content):
+        snippets.extend(line.strip() for line in block.splitlines())
+    snippets.extend(span.strip() for span in _INLINE_CODE.findall(_CODE_BLOCK.sub("", content)))
+    return [snippet for snippet in snippets if len(snippet) >= 4]
+
+
+def _normalize_path(path: str) -> str:
+    path = path.strip().lstrip("/")
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path[2:] if path.startswith("./") else path
+
+
+class FileResolver:
+    """按模型给出的路径查找 diff 中的文件，兼容 a/ b/ ./ 前缀、开头的 / 和路径后缀"""
+
+    def __init__(self, file_diffs: List[FileDiff]):
+        self.files: Dict[str, FileDiff] = {}
+        for file_diff in file_diffs:
+            self.files.setdefault(_normalize_path(file_diff.new_file_path), file_diff)
+            if file_diff.old_file_path:
+                self.files.setdefault(_normalize_path(file_diff.old_file_path), file_diff)
+
+    def candidates(self, path: str) -> List[FileDiff]:
+        """路径可能指向的文件，精确匹配优先，否则为所有后缀匹配的文件"""
+        path = _normalize_path(path)
+        if not path:
+            return []
+        file_diff = self.files.get(path)
+        if file_diff is not None:
+            return [file_diff]
+        matches = {id(f): f for p, f in self.files.items() if p.endswith("/" + path)}
+        return list(matches.values())
+
+    def find(self, path: str) -> Optional[FileDiff]:
+        """唯一匹配的文件，模型只给出路径后缀且有多个文件匹配时返回 None"""
+        candidates = self.candidates(path)
+        return candidates[0] if len(candidates) == 1 else None
+
+
+class CommentAnchorer:
+    """发布前校验 AI 评论的位置
+
+    行号在 diff 中时保留；否则评论引用了代码时按相似度匹配附近 diff 中的行，
+    没有匹配时吸附到 COMMENT_ANCHOR_MAX_DISTANCE 行以内最近的可评论行。
+    文件不在 diff 中或附近没有可评论行时返回 None，由调用方并入总结。
+    增量审查时按 MR 的完整 diff 定位，而不是只包含新提交的 diff。
+    """
+
+    def __init__(self, mr: MergeRequest, max_distance: Optional[int] = None):
+        file_diffs = mr.file_diffs if mr.anchor_file_diffs is None else mr.anchor_file_diffs
+        self.resolver = FileResolver(file_diffs)
+        self.max_distance = settings.COMMENT_ANCHOR_MAX_DISTANCE if max_distance is None else max_distance
+
+    def _match_quoted(self, index: DiffIndex, snippets: List[str], line: int) -> Optional[int]:
+        """引用代码相似度最高的新侧行
+
+        只在原行号前后 _MATCH_WINDOW 倍吸附距离内查找，相似度按距离衰减，
+        避免评论中的建议代码匹配到文件中较远的相似行。
+        """
+        window = max(self.max_distance, 1) * _MATCH_WINDOW
+        best: Optional[Tuple[float, int, int]] = None
+        lo = bisect_left(index.new_side, line - window)
+        hi = bisect_right(index.new_side, line + window)
+        for position in range(lo, hi):
+            new_line = index.new_side[position]
+            text = index.line(index.new_side_index[position]).strip()
+            if not text:
+                continue
+            for snippet in snippets:
+                matcher = SequenceMatcher(None, snippet, text, autojunk=False)
+                if matcher.real_quick_ratio() < _MATCH_THRESHOLD or matcher.quick_ratio() < _MATCH_THRESHOLD:
+                    continue
+                similarity = matcher.ratio()
+                if similarity < _MATCH_THRESHOLD:
+                    continue
+                distance = abs(new_line - line)
+                score = similarity * (1 - distance / (2 * window))
+                candidate = (score, -distance, new_line)
+                if best is None or candidate > best:
+                    best = candidate
+        return best[2] if best else None
+
+    def anchor(self, ai_comment: AIReviewComment) -> Optional[AIReviewComment]:
+        """返回定位到可评论行的评论，无法定位时返回 None"""
+        file_diff = self.resolver.find(ai_comment.new_file_path)
+        index = file_diff.index() if file_diff is not None else None
+        if index is None or not index.new_side:
+            _anchor_stats["folded"] += 1
+            return None
+
+        line = ai_comment.new_line_number or 1
+        target = line if index.contains_new_line(line) else None
+        if target is None:
+            # 行号无效时才按引用的代码修正位置
+            snippets = quoted_code(ai_comment.content)
+            if snippets:
+                target = self._match_quoted(index, snippets, line)
+        if target is None:
+            nearest = index.nearest_new_line(line)
+            if abs(nearest - line) > self.max_distance:
+                _anchor_stats["folded"] += 1
+                return None
+            target = nearest
+            _anchor_stats["snapped"] += 1
+        elif target != line:
+            _anchor_stats["matched"] += 1
+        else:
+            _anchor_stats["kept"] += 1
+
+        return ai_comment.model_copy(
+            update={
+                "new_file_path": file_diff.new_file_path,
+                "old_file_path": file_diff.old_file_path,
+                "new_line_number": target,
+                # 上下文行需要同时给出旧侧行号，否则 GitLab 拒绝该位置
+                "old_line_number": index.old_line_for_new(target),
+            }
+        )
@@ -1,9 +1,9 @@
 import json
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 from app.models.comment import Comment, CommentPosition, CommentType
 from app.models.git import MergeRequest
@@ -17,6 +17,7 @@ class AIReviewComment(BaseModel):
     new_file_path: str
     old_file_path: Optional[str] = None
     new_line_number: Optional[int] = 1
+    old_line_number: Optional[int] = None  # 定位到上下文行时的旧侧行号
     content: str
     type: str = "suggestion"  # suggestion, issue, praise
 
@@ -43,6 +44,18 @@ class AIReviewResponse(BaseModel):
 
     summary: str = ""
     comments: List[AIReviewComment] = []
+    _parse_failed: bool = PrivateAttr(default=False)
+
+    @property
+    def parse_failed(self) -> bool:
+        """模型输出无法解析，结果不可信"""
+        return self._parse_failed
+
+    @classmethod
+    def failed(cls, summary: str) -> "AIReviewResponse":
+        response = cls(summary=summary, comments=[])
+        response._parse_failed = True
+        return response
 
     @classmethod
     def parse_raw_response(cls, response: str) -> "AIReviewResponse":
@@ -56,7 +69,76 @@ class AIReviewResponse(BaseModel):
             return cls(**data)
         except Exception as e:
             logger.exception(f"解析AI响应失败: {response[:200]}...")
-            return cls(summary="解析审查响应失败", comments=[])
+            return cls.failed("解析审查响应失败")
+
+
+class IncrementalReviewParser:
+    """增量解析流式返回的审查 JSON
+
+    逐段喂入模型输出，"comments" 数组中的每个对象闭合时立即解析为 AIReviewComment，
+    不必等待整个响应生成完毕。
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._comment_start = -1
+        self._done = False
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, delta: str) -> List[AIReviewComment]:
+        """喂入一段输出，返回本段中闭合的评论"""
+        self._text += delta
+        comments = []
+        text = self._text
+        while self._pos < len(text) and not self._done:
+            char = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                # 最外层 JSON 之前的文本不做字符串跟踪
+                self._in_string = bool(self._stack)
+            elif char == "{" or (char == "[" and self._stack):
+                if char == "{" and self._stack == ["{", "["]:
+                    self._comment_start = self._pos
+                self._stack.append(char)
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if char == "}" and self._stack == ["{", "["] and self._comment_start >= 0:
+                    comment = self._parse_comment(text[self._comment_start : self._pos + 1])
+                    if comment:
+                        comments.append(comment)
+                    self._comment_start = -1
+                elif not self._stack:
+                    self._done = True
+            self._pos += 1
+        return comments
+
+    @staticmethod
+    def _parse_comment(json_str: str) -> Optional[AIReviewComment]:
+        try:
+            return AIReviewComment(**json.loads(json_str))
+        except Exception:
+            logger.warning(f"跳过无法解析的流式评论: {json_str[:200]}")
+            return None
+
+    def finish(self) -> AIReviewResponse:
+        """流结束后解析完整响应，获取总结"""
+        return AIReviewResponse.parse_raw_response(self._text)
+
+
+CommentCallback = Callable[[Comment], Awaitable[None]]
 
 
 class PipelineResult(BaseModel):
@@ -72,6 +154,7 @@ class ReviewPipeline(BaseModel):
     name: str
     description: str
     enabled: bool = True
+    version: str = "1"  # 审查逻辑变化时递增，使文件审查结果缓存失效
 
     class Config:
         arbitrary_types_allowed = True
@@ -131,6 +214,7 @@ class ReviewPipeline(BaseModel):
             new_file_path=ai_comment.new_file_path,
             old_file_path=ai_comment.old_file_path,
             new_line_number=ai_comment.new_line_number or 1,
+            old_line_number=ai_comment.old_line_number,
         )
 
         return Comment(
@@ -143,6 +227,12 @@ class ReviewPipeline(BaseModel):
             position=position,
         )
 
-    async def review(self, mr: MergeRequest) -> PipelineResult:
-        """执行审查流程"""
+    async def review(
+        self, mr: MergeRequest, on_comment: Optional[CommentCallback] = None
+    ) -> PipelineResult:
+        """执行审查流程
+
+        on_comment 不为空时，支持流式的 pipeline 会在评论生成后立即回调，
+        回调过的评论仍会包含在返回结果中。
+        """
         raise NotImplementedError()
@@ -0,0 +1,51 @@
+import re
+from typing import List, Optional, Tuple
+
+from app.infra.ai.tokenizer import BaseTokenizer, get_tokenizer, pack_to_budget
+from app.models.git import FileDiff
+
+from .base import AIReviewComment
+
+# ```diff 代码块围栏和分隔空行的 token 开销
+_FENCE_TOKENS = 8
+
+
+def format_file_diff(file_diff: FileDiff) -> str:
+    """将文件变更格式化为提示词片段"""
+    return (
+        f"file_old_path: {file_diff.old_file_path}\n"
+        f"file_new_path: {file_diff.new_file_path}\n"
+        f"```diff\n{file_diff.diff_content}\n```"
+    )
+
+
+def pack_file_diffs(
+    file_diffs: List[FileDiff], max_tokens: int, tokenizer: Optional[BaseTokenizer] = None
+) -> List[List[FileDiff]]:
+    """按 token 预算将文件变更装箱为多个分块"""
+    tokenizer = tokenizer or get_tokenizer()
+
+    def cost(file_diff: FileDiff) -> int:
+        header = f"file_old_path: {file_diff.old_file_path}\nfile_new_path: {file_diff.new_file_path}\n"
+        return file_diff.token_count(tokenizer) + tokenizer.count(header) + _FENCE_TOKENS
+
+    return pack_to_budget(file_diffs, max_tokens, cost)
+
+
+def comment_dedupe_key(ai_comment: AIReviewComment) -> Tuple[str, int, str]:
+    """评论去重键：文件、行号和归一化后的内容"""
+    content = re.sub(r"\s+", " ", ai_comment.content).strip().lower()
+    return (ai_comment.new_file_path, ai_comment.new_line_number or 1, content)
+
+
+def dedupe_comments(comments: List[AIReviewComment]) -> List[AIReviewComment]:
+    """合并各分块的评论并去重，保持首次出现的顺序"""
+    seen = set()
+    result = []
+    for ai_comment in comments:
+        key = comment_dedupe_key(ai_comment)
+        if key in seen:
+            continue
+        seen.add(key)
+        result.append(ai_comment)
+    return result
@@ -1,16 +1,33 @@
+import asyncio
+import hashlib
 import logging
+from collections import defaultdict
 from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
-from app.infra.ai.client import AIClient, Message
+from app.infra.ai.client import AIClient, Message, get_ai_client
+from app.infra.cache.file_review_cache import get_file_review_cache
 from app.infra.config.settings import get_settings
 from app.models.comment import Comment, CommentType
-from app.models.git import MergeRequest
+from app.models.git import FileDiff, MergeRequest
 
-from .base import AIReviewResponse, PipelineResult, ReviewPipeline
+from .base import (
+    AIReviewComment,
+    AIReviewResponse,
+    CommentCallback,
+    IncrementalReviewParser,
+    PipelineResult,
+    ReviewPipeline,
+)
+from .anchoring import CommentAnchorer, FileResolver, anchor_findings, restore_findings
+from .chunking import comment_dedupe_key, dedupe_comments, format_file_diff, pack_file_diffs
+from .minify import DiffMinifier, format_omitted
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+AICommentCallback = Callable[[AIReviewComment], Awaitable[None]]
+
 
 class CodeReviewPipeline(ReviewPipeline):
     """Comprehensive code review pipeline that handles both logic and static analysis"""
@@ -69,21 +86,21 @@ class CodeReviewPipeline(ReviewPipeline):
                 "3. Key suggestions"
             )
 
-    async def review(self, mr: MergeRequest) -> PipelineResult:
-        ai_client = AIClient()
-        session_id = ai_client.generate_session_id()
+    @staticmethod
+    def _previous_summary(mr: MergeRequest) -> str:
+        """截断上次审查的总结，作为增量审查的紧凑上下文"""
+        summary = (mr.previous_summary or "").strip()
+        limit = settings.INCREMENTAL_SUMMARY_MAX_CHARS
+        return summary if len(summary) <= limit else summary[:limit] + "..."
+
+    def _build_review_prompt(
+        self, mr: MergeRequest, file_diffs: List[FileDiff], part: Optional[Tuple[int, int]] = None
+    ) -> Message:
+        """构建审查提示词，part 为 (当前分块序号, 分块总数)"""
         templates = self.get_prompt_template(settings.GPT_LANGUAGE)
 
         # Build prompt with all file changes
-        files_content = []
-        for file_diff in mr.file_diffs:
-            files_content.append(
-                f"file_old_path: {file_diff.old_file_path}\n"
-                f"file_new_path: {file_diff.new_file_path}\n"
-                f"```diff\n{file_diff.diff_content}\n```"
-            )
-
-        all_diffs = "\n\n".join(files_content)
+        all_diffs = "\n\n".join(format_file_diff(file_diff) for file_diff in file_diffs)
 
         # Build business context
         if settings.GPT_LANGUAGE == "中文":
@@ -91,36 +108,320 @@ class CodeReviewPipeline(ReviewPipeline):
                 f"PR信息:\n"
                 f"标题: {mr.title}\n"
                 f"描述: {mr.description}\n"
-                f"变更:\n{all_diffs}"
             )
+            if mr.base_review_sha:
+                business_context += (
+                    f"(增量审查：以下只包含上次审查之后新推送的提交，只评论这些变更)\n"
+                    f"上次审查总结: {self._previous_summary(mr)}\n"
+                )
+            if part:
+                business_context += f"(变更较大，已分块审查，当前为第 {part[0]}/{part[1]} 块)\n"
+            if mr.omitted_files_note:
+                business_context += f"{mr.omitted_files_note}\n"
+            business_context += f"变更:\n{all_diffs}"
         else:
             business_context = (
                 f"PR information:\n"
                 f"Title: {mr.title}\n"
                 f"Description: {mr.description}\n"
-                f"Changes:\n{all_diffs}"
             )
+            if mr.base_review_sha:
+                business_context += (
+                    f"(Incremental review: only commits pushed since the last review are shown, comment on these changes only)\n"
+                    f"Previous review summary: {self._previous_summary(mr)}\n"
+                )
+            if part:
+                business_context += f"(Large change reviewed in chunks, this is chunk {part[0]}/{part[1]})\n"
+            if mr.omitted_files_note:
+                business_context += f"{mr.omitted_files_note}\n"
+            business_context += f"Changes:\n{all_diffs}"
 
-        system_prompt = Message("system", self._get_system_prompt())
-        prompt = Message(
+        return Message(
             "user",
             f"{templates['review_request']}\n{business_context}",
         )
 
+    async def _review_files(
+        self,
+        ai_client: AIClient,
+        mr: MergeRequest,
+        file_diffs: List[FileDiff],
+        part: Optional[Tuple[int, int]] = None,
+        on_comment: Optional[AICommentCallback] = None,
+    ) -> AIReviewResponse:
+        """审查一组文件变更，on_comment 不为空时流式解析并逐条回调评论"""
+        session_id = ai_client.generate_session_id()
+        system_prompt = Message("system", self._get_system_prompt())
+        prompt = self._build_review_prompt(mr, file_diffs, part)
+
+        if on_comment is not None:
+            parser = IncrementalReviewParser()
+            async for delta in ai_client.chat_stream(
+                [system_prompt, prompt], session_id=session_id
+            ):
+                for ai_comment in parser.feed(delta):
+                    await on_comment(ai_comment)
+            ai_review = parser.finish()
+            await self._save_file_results(mr, file_diffs, ai_review)
+            return ai_review
+
         response = await ai_client.chat([system_prompt, prompt], session_id=session_id)
         try:
             ai_review = AIReviewResponse.parse_raw_response(response)
+            await self._save_file_results(mr, file_diffs, ai_review)
+            return ai_review
         except Exception:
             logger.exception(f"Failed to parse AI response: {response[:200]}...")
-            ai_review = AIReviewResponse(
-                summary="Failed to parse review response", comments=[]
+            return AIReviewResponse.failed("Failed to parse review response")
+
+    async def _review_chunked(
+        self,
+        ai_client: AIClient,
+        mr: MergeRequest,
+        on_comment: Optional[AICommentCallback] = None,
+    ) -> AIReviewResponse:
+        """Map-reduce 分块审查：并发审查各分块，再合并评论和总结"""
+        overhead = ai_client._count_tokens(
+            self._get_system_prompt() + self._build_review_prompt(mr, []).content
+        )
+        budget = max(settings.REVIEW_CHUNK_MAX_TOKENS - overhead, 1)
+        chunks = pack_file_diffs(mr.file_diffs, budget, ai_client.tokenizer)
+        if len(chunks) <= 1:
+            return await self._review_files(ai_client, mr, mr.file_diffs, on_comment=on_comment)
+
+        logger.info(f"MR #{mr.mr_id} 分为 {len(chunks)} 块并发审查")
+        semaphore = asyncio.Semaphore(settings.REVIEW_CHUNK_CONCURRENCY)
+
+        async def review_chunk(index: int, chunk: List[FileDiff]) -> AIReviewResponse:
+            async with semaphore:
+                return await self._review_files(
+                    ai_client, mr, chunk, part=(index + 1, len(chunks)), on_comment=on_comment
+                )
+
+        results = await asyncio.gather(
+            *[review_chunk(i, chunk) for i, chunk in enumerate(chunks)],
+            return_exceptions=True,
+        )
+
+        responses = []
+        failed = 0
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"分块审查失败: {result}")
+                failed += 1
+                continue
+            responses.append(result)
+        if not responses:
+            raise RuntimeError(f"所有 {len(chunks)} 个分块审查均失败: {results[0]}")
+
+        comments = dedupe_comments([c for r in responses for c in r.comments])
+        summary = await self._reduce_summaries(ai_client, mr, [r.summary for r in responses])
+        if failed:
+            summary += f"\n\n⚠️ {failed}/{len(chunks)} 个分块审查失败，结果可能不完整。"
+        return AIReviewResponse(summary=summary, comments=comments)
+
+    async def _reduce_summaries(
+        self, ai_client: AIClient, mr: MergeRequest, summaries: List[str]
+    ) -> str:
+        """将各分块的总结合并为一份总结"""
+        summaries = [summary for summary in summaries if summary]
+        if len(summaries) <= 1:
+            return summaries[0] if summaries else ""
+
+        parts = "\n\n".join(f"[{i + 1}] {summary}" for i, summary in enumerate(summaries))
+        if settings.GPT_LANGUAGE == "中文":
+            system_prompt = Message(
+                "system",
+                "你是代码审查助手。将同一个 PR 的多个分块审查总结合并为一份简短总结，"
+                "去掉重复内容，包含业务目的、实现评估和主要建议。直接输出总结文本。",
+            )
+            prompt = Message("user", f"PR标题: {mr.title}\n分块总结:\n{parts}")
+        else:
+            system_prompt = Message(
+                "system",
+                "You are a code review assistant. Merge the chunk review summaries of one PR "
+                "into a single brief summary without duplicates, covering business goal, "
+                "implementation review and key suggestions. Output the summary text only.",
             )
+            prompt = Message("user", f"PR title: {mr.title}\nChunk summaries:\n{parts}")
 
-        comments = []
+        try:
+            return await ai_client.chat([system_prompt, prompt])
+        except Exception:
+            logger.exception("合并分块总结失败，使用拼接的总结")
+            return "\n\n".join(summaries)
+
+    def prompt_version(self) -> str:
+        """pipeline、提示词和模型的版本，任一变化时文件审查结果缓存失效"""
+        templates = self.get_prompt_template(settings.GPT_LANGUAGE)
+        source = "\n".join(
+            [self.name, self.version, settings.GPT_MODEL, self._get_system_prompt(), templates["review_request"]]
+        )
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+    async def _load_file_results(
+        self, mr: MergeRequest
+    ) -> Tuple[List[FileDiff], List[AIReviewComment]]:
+        """查询文件审查结果缓存，返回需要审查的文件和命中文件的审查意见（已换算到新行号）"""
+        if not settings.FILE_REVIEW_CACHE_ENABLED:
+            return mr.file_diffs, []
+        cache = get_file_review_cache()
+        version = self.prompt_version()
+        keys = {
+            id(file_diff): cache.key(mr.owner, mr.repo, version, file_diff.diff_content)
+            for file_diff in mr.file_diffs
+            if file_diff.diff_content
+        }
+        found = await cache.get_many(list(keys.values()))
+
+        pending = []
+        cached: List[AIReviewComment] = []
+        for file_diff in mr.file_diffs:
+            findings = found.get(keys.get(id(file_diff), ""))
+            if findings is None:
+                pending.append(file_diff)
+            else:
+                cached.extend(restore_findings(file_diff, findings))
+        return pending, cached
+
+    async def _save_file_results(
+        self, mr: MergeRequest, file_diffs: List[FileDiff], ai_review: AIReviewResponse
+    ):
+        """按文件保存一次成功审查的意见"""
+        if not settings.FILE_REVIEW_CACHE_ENABLED or ai_review.parse_failed:
+            return
+        # 路径与评论定位使用相同的归一化规则
+        resolver = FileResolver(file_diffs)
+        by_file: Dict[int, List[AIReviewComment]] = defaultdict(list)
+        unresolved = set()
         for ai_comment in ai_review.comments:
-            if ai_comment.type == "praise":
+            candidates = resolver.candidates(ai_comment.new_file_path)
+            if len(candidates) == 1:
+                by_file[id(candidates[0])].append(ai_comment)
+            else:
+                # 无法确定所属文件的意见：不缓存可能的文件，避免之后命中时丢失这条意见
+                unresolved.update(id(f) for f in candidates or file_diffs)
+        if unresolved:
+            logger.info(f"MR #{mr.mr_id} 有 {len(unresolved)} 个文件的审查意见路径无法确定，不缓存这些文件")
+
+        cache = get_file_review_cache()
+        version = self.prompt_version()
+        await cache.set_many(
+            {
+                cache.key(mr.owner, mr.repo, version, file_diff.diff_content): anchor_findings(
+                    file_diff, by_file.get(id(file_diff), [])
+                )
+                for file_diff in file_diffs
+                if file_diff.diff_content and id(file_diff) not in unresolved
+            }
+        )
+
+    def _cached_summary(self, cached_files: int, total_files: int) -> str:
+        if settings.GPT_LANGUAGE == "中文":
+            if cached_files == total_files:
+                return "所有文件的变更此前都已审查过，沿用之前的审查意见。"
+            return f"{cached_files} 个文件的变更此前已审查过，沿用之前的审查意见。"
+        if cached_files == total_files:
+            return "All file changes were reviewed before, previous findings are reused."
+        return f"{cached_files} file(s) were reviewed before, previous findings are reused."
+
+    def _minify(self, mr: MergeRequest) -> MergeRequest:
+        """压缩发送给模型的 diff，返回只用于构建提示词的 MR 副本"""
+        if not settings.ENABLE_DIFF_MINIFY:
+            return mr
+        file_diffs, report = DiffMinifier().minify(mr)
+        if report.tokens_before:
+            logger.info(
+                f"MR #{mr.mr_id} 提示词压缩: {report.tokens_before} -> {report.tokens_after} tokens，"
+                f"节省 {report.tokens_saved} ({report.tokens_saved / report.tokens_before:.0%})，"
+                f"省略 {len(report.omitted)} 个文件，去掉 {report.hunks_collapsed} 个空白 hunk、"
+                f"{report.context_trimmed} 行上下文"
+            )
+        return mr.model_copy(
+            update={"file_diffs": file_diffs, "omitted_files_note": format_omitted(report.omitted) or None}
+        )
+
+    async def review(
+        self, mr: MergeRequest, on_comment: Optional[CommentCallback] = None
+    ) -> PipelineResult:
+        ai_client = get_ai_client()
+        # 评论定位使用原始 diff，提示词和文件缓存使用压缩后的 diff
+        anchorer = CommentAnchorer(mr)
+        review_mr = self._minify(mr)
+        # 已流式回调的评论，按去重键记录，保证最终结果复用同一对象
+        streamed: Dict[Tuple[str, int, str], Comment] = {}
+
+        async def emit(ai_comment: AIReviewComment):
+            key = comment_dedupe_key(ai_comment)
+            if ai_comment.type == "praise" or key in streamed:
+                return
+            anchored = anchorer.anchor(ai_comment)
+            if anchored is None:
+                # 无法定位的评论在审查结束后并入总结
+                return
+            comment = self._from_ai_comment(self.name, anchored, mr.mr_id)
+            streamed[key] = comment
+            await on_comment(comment)
+
+        stream_callback = emit if on_comment and settings.ENABLE_STREAMING_REVIEW else None
+
+        # 只有指纹变化的文件发送给模型
+        file_diffs, cached_comments = await self._load_file_results(review_mr)
+        cached_files = len(review_mr.file_diffs) - len(file_diffs)
+        if stream_callback:
+            for ai_comment in cached_comments:
+                await stream_callback(ai_comment)
+
+        if not file_diffs and cached_files:
+            ai_review = AIReviewResponse(summary="", comments=[])
+        else:
+            pending_mr = review_mr if not cached_files else review_mr.model_copy(update={"file_diffs": file_diffs})
+            if settings.ENABLE_CHUNKED_REVIEW:
+                ai_review = await self._review_chunked(ai_client, pending_mr, stream_callback)
+            else:
+                ai_review = await self._review_files(
+                    ai_client, pending_mr, pending_mr.file_diffs, on_comment=stream_callback
+                )
+        summary = ai_review.summary
+        if cached_files:
+            logger.info(f"MR #{mr.mr_id} {cached_files}/{len(review_mr.file_diffs)} 个文件命中审查结果缓存")
+            note = self._cached_summary(cached_files, len(review_mr.file_diffs))
+            summary = f"{summary}\n\n{note}" if summary else note
+
+        comments = []
+        unanchored = []
+        seen = set()
+        for ai_comment in cached_comments + ai_review.comments:
+            key = comment_dedupe_key(ai_comment)
+            if ai_comment.type == "praise" or key in seen:
                 continue
-            comment = self._from_ai_comment(self.name, ai_comment, mr.mr_id)
+            seen.add(key)
+            comment = streamed.get(key)
+            if comment is None:
+                anchored = anchorer.anchor(ai_comment)
+                if anchored is None:
+                    unanchored.append(ai_comment)
+                    continue
+                # 吸附后可能与已有评论落在同一行
+                anchored_key = comment_dedupe_key(anchored)
+                if anchored_key != key and anchored_key in seen:
+                    continue
+                seen.add(anchored_key)
+                comment = self._from_ai_comment(self.name, anchored, mr.mr_id)
             comments.append(comment)
 
-        return PipelineResult(comments=comments, summary=ai_review.summary) 
\ No newline at end of file
+        if unanchored:
+            logger.info(f"MR #{mr.mr_id} {len(unanchored)} 条评论无法定位到 diff，并入总结")
+            summary = f"{summary}\n\n{self._unanchored_summary(unanchored)}" if summary else self._unanchored_summary(unanchored)
+        return PipelineResult(comments=comments, summary=summary)
+
+    @staticmethod
+    def _unanchored_summary(ai_comments: List[AIReviewComment]) -> str:
+        """无法定位到 diff 行的评论"""
+        if settings.GPT_LANGUAGE == "中文":
+            lines = ["以下意见无法定位到变更中的行："]
+            lines += [f"- `{c.new_file_path}` 第 {c.new_line_number or 1} 行: {c.content}" for c in ai_comments]
+        else:
+            lines = ["The following findings could not be anchored to a changed line:"]
+            lines += [f"- `{c.new_file_path}` line {c.new_line_number or 1}: {c.content}" for c in ai_comments]
+        return "\n".join(lines)
@@ -0,0 +1,282 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from pydantic import BaseModel
+
+from app.infra.ai.tokenizer import BaseTokenizer, get_tokenizer
+from app.infra.config.settings import get_settings
+from app.models.diff import DiffIndex, LineOp
+from app.models.git import ChangeType, FileDiff, MergeRequest
+
+from .chunking import format_file_diff
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 缩进有语义的文件，只忽略行尾和行内的空白变化
+_INDENT_SENSITIVE = re.compile(r"(\.(py|pyi|yml|yaml|mk|coffee|sass|pug|haml)|(^|/)Makefile)$")
+_OPS = {LineOp.CONTEXT: " ", LineOp.ADD: "+", LineOp.DELETE: "-"}
+
+# 提示词压缩统计
+_minify_stats: Dict[str, int] = {
+    "mrs": 0,
+    "excluded": 0,
+    "whitespace": 0,
+    "renamed": 0,
+    "binary": 0,
+    "hunks_collapsed": 0,
+    "context_trimmed": 0,
+    "tokens_before": 0,
+    "tokens_after": 0,
+}
+
+
+def minify_stats() -> Dict[str, float]:
+    before = _minify_stats["tokens_before"]
+    saved = before - _minify_stats["tokens_after"]
+    return {**_minify_stats, "tokens_saved": saved, "saved_ratio": saved / before if before else 0.0}
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """glob 转正则：** 匹配任意层目录，* 和 ? 不跨目录；不含 / 的模式匹配任意目录下的文件名"""
+    pattern = pattern.strip().lstrip("/")
+    if "/" not in pattern:
+        pattern = "**/" + pattern
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+
+@lru_cache(maxsize=16)
+def compile_globs(patterns: str) -> Optional[Pattern]:
+    """将逗号分隔的 glob 列表编译为一个正则，没有规则时返回 None"""
+    regexes = [_glob_to_regex(p) for p in patterns.split(",") if p.strip()]
+    if not regexes:
+        return None
+    return re.compile("^(?:" + "|".join(regexes) + ")$")
+
+
+class OmittedFile(BaseModel):
+    """未发送给模型的文件变更"""
+
+    path: str
+    reason: str  # excluded | whitespace | renamed | binary
+    old_path: Optional[str] = None
+    additions: int = 0
+    deletions: int = 0
+
+
+class MinifyReport(BaseModel):
+    """一次 MR 提示词压缩的结果"""
+
+    omitted: List[OmittedFile] = []
+    hunks_collapsed: int = 0
+    context_trimmed: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+_OMITTED_REASONS = {
+    "中文": {
+        "excluded": "生成或依赖文件，已省略",
+        "whitespace": "只有空白变化",
+        "renamed": "只重命名，内容未变",
+        "binary": "二进制文件或没有文本 diff",
+    },
+    "en": {
+        "excluded": "generated or vendored, omitted",
+        "whitespace": "whitespace-only changes",
+        "renamed": "renamed without content changes",
+        "binary": "binary or no textual diff",
+    },
+}
+# 省略说明最多列出的文件数
+_MAX_OMITTED_LINES = 50
+
+
+def format_omitted(omitted: List[OmittedFile]) -> str:
+    """未发送给模型的文件说明，作为提示词的一部分"""
+    if not omitted:
+        return ""
+    chinese = settings.GPT_LANGUAGE == "中文"
+    reasons = _OMITTED_REASONS["中文" if chinese else "en"]
+    lines = ["以下文件变更未展示:" if chinese else "Changes not shown:"]
+    for item in omitted[:_MAX_OMITTED_LINES]:
+        path = f"{item.old_path} -> {item.path}" if item.reason == "renamed" else item.path
+        counts = f" (+{item.additions} -{item.deletions})" if item.additions or item.deletions else ""
+        lines.append(f"- {path}{counts}: {reasons[item.reason]}")
+    if len(omitted) > _MAX_OMITTED_LINES:
+        rest = len(omitted) - _MAX_OMITTED_LINES
+        lines.append(f"- 其他 {rest} 个文件" if chinese else f"- {rest} more file(s)")
+    return "\n".join(lines)
+
+
+class DiffMinifier:
+    """发送给模型前压缩 diff
+
+    - 路径匹配排除规则的文件（锁文件、生成代码、第三方依赖）只保留一行说明；
+    - 只有空白变化的 hunk 去掉，整个文件只有空白变化或只是重命名时只保留一行说明；
+    - 每处变更前后只保留 context_lines 行上下文，重新生成 hunk 头，行号与原 diff 一致。
+
+    评论定位和发布仍使用原始 diff。
+    """
+
+    def __init__(self, exclude: Optional[str] = None, context_lines: Optional[int] = None):
+        self.exclude = compile_globs(settings.DIFF_MINIFY_EXCLUDE if exclude is None else exclude)
+        self.context_lines = settings.DIFF_CONTEXT_LINES if context_lines is None else context_lines
+
+    def is_excluded(self, path: str) -> bool:
+        return self.exclude is not None and self.exclude.match(path) is not None
+
+    @staticmethod
+    def _normalize(line: str, indent_sensitive: bool) -> str:
+        if indent_sensitive:
+            stripped = line.lstrip()
+            return line[: len(line) - len(stripped)] + " ".join(stripped.split())
+        return "".join(line.split())
+
+    def _whitespace_only(self, index: DiffIndex, start: int, end: int, indent_sensitive: bool) -> bool:
+        """hunk 中删除和新增的行去掉空白后（忽略空行）是否相同"""
+        removed, added = [], []
+        for i in range(start, end):
+            op = index.ops[i]
+            if op == LineOp.CONTEXT:
+                continue
+            line = self._normalize(index.line(i), indent_sensitive)
+            if line.strip():
+                (added if op == LineOp.ADD else removed).append(line)
+        return removed == added
+
+    def _trim_hunk(self, index: DiffIndex, hunk: int) -> Tuple[List[str], int]:
+        """按上下文预算重写 hunk，返回新的 diff 行和去掉的上下文行数"""
+        start, end = index.hunk_lines(hunk)
+        ops = index.ops
+        context = self.context_lines
+        keep = [False] * (end - start)
+        for i in range(start, end):
+            if ops[i] != LineOp.CONTEXT:
+                for j in range(max(i - context, start), min(i + context + 1, end)):
+                    keep[j - start] = True
+
+        section = index.hunk_section(hunk)
+        lines: List[str] = []
+        old, new = index.hunk_old_starts[hunk], index.hunk_new_starts[hunk]
+        run: List[str] = []
+        run_old = run_new = old_len = new_len = 0
+        trimmed = 0
+        # 新增或删除整个文件的 hunk 原样保留对应一侧的起始行号（0）
+        has_old = any(ops[i] != LineOp.ADD for i in range(start, end))
+        has_new = any(ops[i] != LineOp.DELETE for i in range(start, end))
+
+        def flush():
+            if run:
+                # 与 git 一致：长度为 0 的一侧起始行号为前一行
+                old_start = run_old if old_len or not has_old else run_old - 1
+                new_start = run_new if new_len or not has_new else run_new - 1
+                header = f"@@ -{old_start},{old_len} +{new_start},{new_len} @@"
+                lines.append(f"{header} {section}" if section else header)
+                lines.extend(run)
+
+        for i in range(start, end):
+            op = ops[i]
+            if keep[i - start]:
+                if not run:
+                    run_old, run_new, old_len, new_len = old, new, 0, 0
+                run.append(_OPS[op] + index.line(i))
+                if op != LineOp.ADD:
+                    old_len += 1
+                if op != LineOp.DELETE:
+                    new_len += 1
+            else:
+                trimmed += 1
+                flush()
+                run = []
+            if op != LineOp.ADD:
+                old += 1
+            if op != LineOp.DELETE:
+                new += 1
+        flush()
+        return lines, trimmed
+
+    def minify_file(self, file_diff: FileDiff) -> Tuple[Optional[FileDiff], Optional[OmittedFile], int, int]:
+        """压缩单个文件，返回 (压缩后的文件, 省略说明, 去掉的空白 hunk 数, 去掉的上下文行数)"""
+        path = file_diff.new_file_path
+        index = file_diff.index()
+        omitted = dict(path=path, old_path=file_diff.old_file_path, additions=index.additions, deletions=index.deletions)
+
+        if self.is_excluded(path) or (file_diff.old_file_path and self.is_excluded(file_diff.old_file_path)):
+            return None, OmittedFile(reason="excluded", **omitted), 0, 0
+        if not index.hunk_starts:
+            if file_diff.old_file_path and file_diff.old_file_path != path and file_diff.change_type == ChangeType.MODIFY:
+                return None, OmittedFile(reason="renamed", **omitted), 0, 0
+            if not file_diff.diff_content.strip():
+                return None, OmittedFile(reason="binary", **omitted), 0, 0
+            return file_diff, None, 0, 0
+
+        indent_sensitive = _INDENT_SENSITIVE.search(path) is not None
+        lines: List[str] = []
+        collapsed = trimmed = 0
+        for hunk in range(len(index.hunk_starts)):
+            start, end = index.hunk_lines(hunk)
+            if self._whitespace_only(index, start, end, indent_sensitive):
+                collapsed += 1
+                continue
+            hunk_lines, hunk_trimmed = self._trim_hunk(index, hunk)
+            lines.extend(hunk_lines)
+            trimmed += hunk_trimmed
+
+        if not lines:
+            return None, OmittedFile(reason="whitespace", **omitted), collapsed, 0
+        if not collapsed and not trimmed:
+            return file_diff, None, 0, 0
+        return file_diff.model_copy(update={"diff_content": "\n".join(lines)}), None, collapsed, trimmed
+
+    def minify(self, mr: MergeRequest, tokenizer: Optional[BaseTokenizer] = None) -> Tuple[List[FileDiff], MinifyReport]:
+        """压缩 MR 的全部文件变更，返回需要发送给模型的文件和压缩报告"""
+        tokenizer = tokenizer or get_tokenizer()
+        report = MinifyReport()
+        file_diffs = []
+        for file_diff in mr.file_diffs:
+            report.tokens_before += tokenizer.count(format_file_diff(file_diff))
+            minified, omitted, collapsed, trimmed = self.minify_file(file_diff)
+            report.hunks_collapsed += collapsed
+            report.context_trimmed += trimmed
+            if omitted is not None:
+                report.omitted.append(omitted)
+            if minified is not None:
+                file_diffs.append(minified)
+                report.tokens_after += tokenizer.count(format_file_diff(minified))
+
+        report.tokens_after += tokenizer.count(format_omitted(report.omitted))
+
+        _minify_stats["mrs"] += 1
+        for omitted in report.omitted:
+            _minify_stats[omitted.reason] += 1
+        _minify_stats["hunks_collapsed"] += report.hunks_collapsed
+        _minify_stats["context_trimmed"] += report.context_trimmed
+        _minify_stats["tokens_before"] += report.tokens_before
+        _minify_stats["tokens_after"] += report.tokens_after
+        return file_diffs, report
+
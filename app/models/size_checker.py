@@ -20,13 +20,19 @@ class SizeChecker:
 
     def check_mr_size(self, mr: MergeRequest) -> Optional[ReviewResult]:
         """检查 MR 大小，如果太大返回 ReviewResult"""
-        if len(mr.file_diffs) > self.settings.MAX_FILES_PER_MR:
+        # 分块审查模式下大 MR 会被拆分审查，允许更多文件
+        max_files = (
+            self.settings.MAX_FILES_PER_CHUNKED_MR
+            if self.settings.ENABLE_CHUNKED_REVIEW
+            else self.settings.MAX_FILES_PER_MR
+        )
+        if len(mr.file_diffs) > max_files:
             logger.warning(
-                f"MR 文件数量过多: {len(mr.file_diffs)} > {self.settings.MAX_FILES_PER_MR}"
+                f"MR 文件数量过多: {len(mr.file_diffs)} > {max_files}"
             )
             return ReviewResult(
                 mr_id=mr.mr_id,
-                summary=f"⚠️ 此 MR 包含 {len(mr.file_diffs)} 个文件，超过了最大限制 {self.settings.MAX_FILES_PER_MR} 个。\n建议将大型 MR 拆分为多个小型 MR，以便更好地进行代码审查。",
+                summary=f"⚠️ 此 MR 包含 {len(mr.file_diffs)} 个文件，超过了最大限制 {max_files} 个。\n建议将大型 MR 拆分为多个小型 MR，以便更好地进行代码审查。",
                 overall_status="commented",
                 review_date=datetime.utcnow(),
             )
@@ -41,7 +47,7 @@ class SizeChecker:
 
         for file_diff in mr.file_diffs:
             if file_diff.diff_content:
-                lines = file_diff.diff_content.count("\n") + 1
+                lines = file_diff.line_count
                 if lines > self.settings.MAX_LINES_PER_FILE or len(file_diff.diff_content) > self.settings.MAX_BYTES_PER_FILE:
                     large_files.append(file_diff)
                 else:
@@ -60,7 +66,8 @@ class SizeChecker:
             created_at=datetime.utcnow(),
             comment_type=CommentType.FILE,
             mr_id=mr.mr_id,
-            position=CommentPosition(new_file_path=file_diff.new_file_path, old_file_path=file_diff.old_file_path, new_line_number=1),
+            # 固定到 diff 中第一个可评论的行，避免发布失败
+            position=CommentPosition(new_file_path=file_diff.new_file_path, old_file_path=file_diff.old_file_path, new_line_number=file_diff.index().nearest_new_line(1) or 1),
         )
 
     def create_large_files_summary(self, large_files: List[FileDiff]) -> str:
@@ -69,6 +76,6 @@ class SizeChecker:
             f"以下文件超过了最大行数限制 ({self.settings.MAX_LINES_PER_FILE} 行)：\n"
         )
         for file_diff in large_files:
-            summary += f"- {file_diff.new_file_path}: {len(file_diff.diff_content)} 行\n"
+            summary += f"- {file_diff.new_file_path}: {file_diff.line_count} 行\n"
         summary += "\n建议将大文件拆分为多个小文件，以提高代码的可维护性。"
         return summary
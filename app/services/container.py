@@ -0,0 +1,59 @@
+import logging
+from typing import Optional
+
+from app.infra.ai.client import AIClient, close_http_client, get_ai_client, get_http_client
+from app.infra.ai.tokenizer import get_tokenizer
+from app.infra.cache.redis_client import RedisClient, close_redis_client, get_redis_client
+from app.infra.git.base import GitClientBase
+from app.infra.git.factory import GitClientFactory
+from app.infra.rate_limiter import RateLimiter, close_rate_limiter, get_rate_limiter
+from app.services.discussion_service import DiscussionService, get_discussion_service
+from app.services.reviewer_service import ReviewerService, get_reviewer_service
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """应用生命周期内共享的服务和连接池
+
+    web 进程和 worker 启动时创建并预热，所有请求和任务复用同一组实例，关闭时统一释放连接。
+    """
+
+    def __init__(self):
+        self.redis_client: RedisClient = get_redis_client()
+        self.rate_limiter: RateLimiter = get_rate_limiter()
+        self.ai_client: AIClient = get_ai_client()
+        self.git_client: GitClientBase = GitClientFactory.get_client()
+        self.discussion_service: DiscussionService = get_discussion_service()
+        self.reviewer_service: ReviewerService = get_reviewer_service()
+
+    async def startup(self):
+        """预热：加载 tokenizer，建立 Redis 连接，创建 HTTP 连接池"""
+        get_tokenizer()
+        get_http_client()
+        await self.git_client.warm_up()
+        try:
+            await (await self.redis_client.initialize()).redis.ping()
+        except Exception as e:
+            # Redis 暂不可用时不阻止启动，首次使用时重连
+            logger.warning(f"预热 Redis 连接失败: {str(e)}")
+        logger.info("共享服务和连接池已就绪")
+
+    async def shutdown(self):
+        """释放所有共享连接池"""
+        await close_http_client()
+        await GitClientFactory.close()
+        await close_rate_limiter()
+        await close_redis_client()
+        logger.info("共享连接池已关闭")
+
+
+_container: Optional[ServiceContainer] = None
+
+
+def get_container() -> ServiceContainer:
+    """获取全局服务容器"""
+    global _container
+    if _container is None:
+        _container = ServiceContainer()
+    return _container
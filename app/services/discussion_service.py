@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from app.infra.git.factory import GitClientFactory
 from app.models.comment import Comment, CommentType, Discussion
@@ -86,3 +86,14 @@ class DiscussionService:
         discussions.sort(key=lambda x: x.created_at)
 
         return discussions
+
+
+_discussion_service: Optional[DiscussionService] = None
+
+
+def get_discussion_service() -> DiscussionService:
+    """获取全局共享的讨论服务"""
+    global _discussion_service
+    if _discussion_service is None:
+        _discussion_service = DiscussionService()
+    return _discussion_service
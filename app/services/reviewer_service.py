@@ -1,12 +1,21 @@
+import logging
+from datetime import datetime
 from typing import Optional
 
 from app.infra.git.factory import GitClientFactory
 from app.models.bot import Bot
 from app.models.comment import Comment
-from app.models.git import MergeRequest
+from app.models.git import MergeRequest, MergeRequestState
 from app.models.review import ReviewResult
-from app.infra.cache.redis_client import RedisClient
+from app.infra.cache.redis_client import get_redis_client
 from app.infra.config.settings import get_settings
+from app.infra.rate_limiter import ReviewAdmission, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class ReviewSkipped(RuntimeError):
+    """MR 不需要再审查（达到审查次数限制或已关闭），重试也不会成功"""
 
 
 class ReviewerService:
@@ -15,25 +24,110 @@ class ReviewerService:
             bot_id="1", name="AI Code Reviewer", status="active", current_reviews=[]
         )
         self.git_client = GitClientFactory.get_client()
-        self.redis_client = RedisClient()
+        self.redis_client = get_redis_client()
+        self.rate_limiter = get_rate_limiter()
         self.settings = get_settings()
 
-    async def review_mr(self, owner: str, repo: str, mr_id: str, check_limit: bool = True) -> ReviewResult:
-        # 检查审查次数
-        if check_limit:
-            review_count = await self.redis_client.get_mr_review_count(owner, repo, mr_id)
-            if review_count >= self.settings.MAX_MR_REVIEWS:
-                raise RuntimeError(f"MR {owner}/{repo}#{mr_id} has reached the maximum review limit of {self.settings.MAX_MR_REVIEWS}")
+    async def review_mr(
+        self,
+        owner: str,
+        repo: str,
+        mr_id: str,
+        check_limit: bool = True,
+        head_sha: Optional[str] = None,
+        incremental: bool = False,
+    ) -> ReviewResult:
+        """审查 MR
+
+        Args:
+            check_limit: 是否检查单个 MR 的审查次数限制，增量审查不检查，退回全量审查时检查
+            head_sha: 触发审查的推送对应的 head，快照落后时重新获取
+            incremental: 只审查上次审查之后新推送的提交，没有上次审查记录时退回全量审查
+        """
+        incremental = incremental and self.settings.ENABLE_INCREMENTAL_REVIEW
+        # 一次往返完成审查次数、每小时配额检查并记一次审查
+        admission = await self.rate_limiter.begin_review(owner, repo, mr_id, check_limit and not incremental)
+        if admission == ReviewAdmission.MR_LIMIT:
+            raise ReviewSkipped(f"MR {owner}/{repo}#{mr_id} has reached the maximum review limit of {self.settings.MAX_MR_REVIEWS}")
 
         # 获取 MR 信息并执行审查
-        mr = await self.git_client.get_merge_request(owner, repo, mr_id)
-        result = await self.bot.review_mr(mr)
-        
-        # 增加审查次数
-        await self.redis_client.increment_mr_review_count(owner, repo, mr_id)
-        
+        try:
+            mr = await self.git_client.get_merge_request(owner, repo, mr_id)
+            if head_sha and mr.head_sha and mr.head_sha != head_sha:
+                # 快照早于触发本次审查的推送，丢弃后重新获取最新 head
+                await self.git_client.invalidate(owner, repo, mr_id)
+                mr = await self.git_client.get_merge_request(owner, repo, mr_id)
+            if mr.state == MergeRequestState.CLOSED:
+                raise ReviewSkipped(f"MR {owner}/{repo}#{mr_id} is closed")
+            if incremental and admission == ReviewAdmission.ALLOWED:
+                mr = await self._incremental_mr(mr)
+                if mr is None:
+                    await self.rate_limiter.cancel_review(owner, repo, mr_id)
+                    return ReviewResult(
+                        mr_id=mr_id, summary="", overall_status="commented", review_date=datetime.utcnow()
+                    )
+                if check_limit and not mr.base_review_sha:
+                    # 无法增量审查时按全量审查计入审查次数限制（本次已由 begin_review 计入）
+                    count = await self.redis_client.get_mr_review_count(owner, repo, mr_id)
+                    if count > self.settings.MAX_MR_REVIEWS:
+                        raise ReviewSkipped(
+                            f"MR {owner}/{repo}#{mr_id} has reached the maximum review limit of {self.settings.MAX_MR_REVIEWS}"
+                        )
+            result = await self.bot.review_mr(mr, admission=admission)
+        except Exception:
+            # 审查失败不计入审查次数
+            if admission == ReviewAdmission.ALLOWED:
+                await self.rate_limiter.cancel_review(owner, repo, mr_id)
+            raise
+
+        await self._save_review_state(mr, result)
         return result
 
+    async def _incremental_mr(self, mr: MergeRequest) -> Optional[MergeRequest]:
+        """将 MR 的变更替换为上次审查之后的新提交
+
+        没有上次审查记录、head 未变化或提交历史被改写时返回原 MR 做全量审查；
+        没有需要审查的新变更时返回 None。
+        """
+        state = await self.redis_client.get_review_state(mr.owner, mr.repo, mr.mr_id)
+        if not state or not mr.head_sha or state["head_sha"] == mr.head_sha:
+            return mr
+
+        file_diffs = await self.git_client.get_commit_diff(mr.owner, mr.repo, state["head_sha"], mr.head_sha)
+        if file_diffs is None:
+            logger.info(f"MR {mr.owner}/{mr.repo}#{mr.mr_id} 无法增量审查，改为全量审查")
+            return mr
+
+        # 从目标分支合并进来的文件不属于本 MR 的变更
+        mr_files = {file_diff.new_file_path for file_diff in mr.file_diffs}
+        file_diffs = [file_diff for file_diff in file_diffs if file_diff.new_file_path in mr_files]
+        if not file_diffs:
+            logger.info(f"MR {mr.owner}/{mr.repo}#{mr.mr_id} 自 {state['head_sha'][:8]} 以来没有新的变更")
+            return None
+
+        logger.info(
+            f"增量审查 MR {mr.owner}/{mr.repo}#{mr.mr_id}: {state['head_sha'][:8]}..{mr.head_sha[:8]}, "
+            f"{len(file_diffs)}/{len(mr.file_diffs)} 个文件"
+        )
+        return mr.model_copy(
+            update={
+                "file_diffs": file_diffs,
+                "base_review_sha": state["head_sha"],
+                "previous_summary": state.get("summary"),
+                # 评论只能发布在 MR 的 diff 中，定位仍使用完整变更
+                "anchor_file_diffs": mr.file_diffs,
+            }
+        )
+
+    async def _save_review_state(self, mr: MergeRequest, result: ReviewResult):
+        """记录本次审查的 head 和总结，作为下次增量审查的起点"""
+        if not mr.head_sha or result.overall_status == "error":
+            return
+        try:
+            await self.redis_client.set_review_state(mr.owner, mr.repo, mr.mr_id, mr.head_sha, result.summary)
+        except Exception as e:
+            logger.warning(f"保存审查状态失败: {str(e)}")
+
     async def handle_comment(
         self, owner: str, repo: str, mr_id: str, comment_id: str
     ) -> Comment:
@@ -52,4 +146,17 @@ class ReviewerService:
         # 获取 MR 信息
         mr = await self.git_client.get_merge_request(owner, repo, mr_id)
         # 重新执行审查
-        return await self.bot.review_mr(mr)
+        result = await self.bot.review_mr(mr)
+        await self._save_review_state(mr, result)
+        return result
+
+
+_reviewer_service: Optional[ReviewerService] = None
+
+
+def get_reviewer_service() -> ReviewerService:
+    """获取全局共享的审查服务，也用作 FastAPI 依赖"""
+    global _reviewer_service
+    if _reviewer_service is None:
+        _reviewer_service = ReviewerService()
+    return _reviewer_service
@@ -0,0 +1,156 @@
+"""审查任务 worker
+
+从 Redis Streams 任务队列读取审查和评论回复任务并执行，可在多台机器上启动多个实例。
+
+用法: python -m app.worker
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict, Optional
+
+import aiohttp
+
+from app.infra.config.logging import setup_logging
+from app.infra.config.settings import get_settings
+from app.infra.debouncer import MergeRequestDebouncer
+from app.infra.job_queue import Job, JobKind, JobQueue, get_job_queue
+from app.infra.scheduler import ReviewScheduler, classify_job
+from app.services.container import get_container
+from app.services.reviewer_service import ReviewerService, ReviewSkipped, get_reviewer_service
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# MR 或评论已不存在，重试不会成功
+_PERMANENT_STATUSES = (404, 410)
+
+
+class ReviewWorker:
+    """任务队列消费者
+
+    每个进程预取至多 WORKER_PREFETCH 个任务，由调度器按优先级和仓库公平性分配 concurrency 个执行槽。
+    """
+
+    def __init__(
+        self,
+        queue: Optional[JobQueue] = None,
+        reviewer_service: Optional[ReviewerService] = None,
+        debouncer: Optional[MergeRequestDebouncer] = None,
+        scheduler: Optional[ReviewScheduler] = None,
+        concurrency: Optional[int] = None,
+        consumer: Optional[str] = None,
+        block_ms: int = 1000,
+    ):
+        self.queue = queue or get_job_queue()
+        self.reviewer_service = reviewer_service or get_reviewer_service()
+        self.debouncer = debouncer or MergeRequestDebouncer(queue=self.queue, use_queue=True)
+        self.concurrency = concurrency or settings.WORKER_CONCURRENCY
+        self.prefetch = max(settings.WORKER_PREFETCH, self.concurrency)
+        self.scheduler = scheduler or ReviewScheduler(concurrency=self.concurrency)
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.block_ms = block_ms
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._running = False
+        self._last_heartbeat = 0.0
+
+    async def run_job(self, job: Job):
+        if job.kind == JobKind.REVIEW_MR:
+            await self.reviewer_service.review_mr(**job.payload)
+        elif job.kind == JobKind.HANDLE_COMMENT:
+            await self.reviewer_service.handle_comment(**job.payload)
+
+    async def _execute(self, job: Job):
+        repo = f"{job.payload.get('owner')}/{job.payload.get('repo')}"
+        try:
+            await self.scheduler.run(classify_job(job), repo, lambda: self._run_logged(job))
+        except ReviewSkipped as e:
+            logger.info(f"任务 {job.job_id} 跳过: {e}")
+            await self.queue.ack(job)
+        except aiohttp.ClientResponseError as e:
+            logger.exception(f"任务 {job.job_id} 执行失败: {e}")
+            if e.status in _PERMANENT_STATUSES:
+                await self.queue.dead_letter(job, f"{type(e).__name__}: {e}")
+            else:
+                await self.queue.fail(job, f"{type(e).__name__}: {e}")
+        except Exception as e:
+            logger.exception(f"任务 {job.job_id} 执行失败: {e}")
+            await self.queue.fail(job, f"{type(e).__name__}: {e}")
+        else:
+            await self.queue.ack(job)
+            logger.info(f"任务 {job.job_id} 完成")
+
+    async def _run_logged(self, job: Job):
+        logger.info(f"开始执行任务 {job.job_id}: {job.kind.value} {job.payload}")
+        await self.run_job(job)
+
+    def _start(self, job: Job):
+        task = asyncio.create_task(self._execute(job))
+        self.tasks[job.job_id] = task
+        task.add_done_callback(lambda _, job_id=job.job_id: self.tasks.pop(job_id, None))
+
+    async def _heartbeat(self):
+        now = time.monotonic()
+        if now - self._last_heartbeat < settings.JOB_VISIBILITY_TIMEOUT / 3:
+            return
+        self._last_heartbeat = now
+        await self.queue.heartbeat(self.consumer, list(self.tasks))
+
+    async def poll(self):
+        """执行一轮调度：投递到期重试和合并后的审查、接管超时任务、读取新任务"""
+        await self.queue.promote_due()
+        await self.debouncer.flush_due()
+        free = self.prefetch - len(self.tasks)
+        if free <= 0:
+            await asyncio.wait(
+                list(self.tasks.values()),
+                timeout=self.block_ms / 1000,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        else:
+            jobs = await self.queue.claim_stale(self.consumer, free)
+            if not jobs:
+                jobs = await self.queue.read(self.consumer, free, self.block_ms)
+            for job in jobs:
+                self._start(job)
+        await self._heartbeat()
+
+    async def run(self):
+        logger.info(f"worker {self.consumer} 启动，并发数 {self.concurrency}，预取 {self.prefetch}")
+        self._running = True
+        while self._running:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.exception(f"读取任务队列失败: {e}")
+                await asyncio.sleep(1)
+
+        # 停止读取新任务，等待执行中的任务完成
+        if self.tasks:
+            logger.info(f"等待 {len(self.tasks)} 个执行中的任务完成")
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        logger.info(f"worker {self.consumer} 已停止")
+
+    def stop(self):
+        self._running = False
+
+
+async def main():
+    setup_logging(debug=settings.DEBUG)
+    container = get_container()
+    await container.startup()
+    worker = ReviewWorker(reviewer_service=container.reviewer_service)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await container.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""AI 客户端并发基准测试
+
+对比旧的同步 OpenAI 客户端（阻塞事件循环）和新的异步客户端：
+N 个并发审查请求打到一个固定延迟的本地假 LLM 上，
+异步客户端应在约 1 个 LLM 延迟内全部完成，同步客户端则需要约 N 个。
+
+用法: python -m benchmarks.bench_ai_concurrency --requests 10 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fake_openai import ThreadedFakeOpenAIServer
+
+
+async def _run_blocking(base_url: str, n: int) -> float:
+    """旧实现：在 async 函数中调用同步客户端"""
+    import httpx
+    from openai import OpenAI
+
+    client = OpenAI(api_key="bench", base_url=base_url, http_client=httpx.Client())
+
+    async def one():
+        client.chat.completions.create(
+            model="fake", messages=[{"role": "user", "content": "review"}]
+        )
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(n)])
+    return time.perf_counter() - start
+
+
+async def _run_async(n: int, stream: bool) -> float:
+    """新实现：共享连接池的 AsyncOpenAI"""
+    from app.infra.ai.client import AIClient, close_http_client
+
+    client = AIClient()
+    messages = [{"role": "user", "content": "review"}]
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[client._create_completion(messages, stream=stream) for _ in range(n)]
+    )
+    elapsed = time.perf_counter() - start
+    await close_http_client()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    server = ThreadedFakeOpenAIServer(latency=args.latency).start()
+    os.environ["GPT_API_URL"] = server.base_url
+    os.environ.setdefault("GPT_API_KEY", "bench")
+    try:
+        print(f"并发请求数: {args.requests}, LLM 延迟: {args.latency}s")
+        blocking = await _run_blocking(server.base_url, args.requests)
+        print(f"同步客户端 (旧):      {blocking:.2f}s")
+        non_stream = await _run_async(args.requests, stream=False)
+        print(f"异步客户端:           {non_stream:.2f}s")
+        streamed = await _run_async(args.requests, stream=True)
+        print(f"异步客户端 (stream):  {streamed:.2f}s")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
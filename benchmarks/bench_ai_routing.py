@@ -0,0 +1,81 @@
+"""AI 多端点路由基准测试
+
+启动多个延迟和错误率不同的本地假 LLM，对比单端点与按 EWMA 延迟路由的
+总耗时、失败数和各端点请求分布。
+
+用法: python -m benchmarks.bench_ai_routing --requests 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+async def _run(endpoints: List[Dict], n: int, concurrency: int):
+    import httpx
+
+    from app.infra.ai.router import EndpointRouter
+
+    http_client = httpx.AsyncClient()
+    router = EndpointRouter(endpoints, http_client)
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            try:
+                await router.call(
+                    lambda client, endpoint: client.chat.completions.create(
+                        model="fake", messages=[{"role": "user", "content": "review"}]
+                    )
+                )
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(n)])
+    elapsed = time.perf_counter() - start
+    await http_client.aclose()
+    return elapsed, failures, router.stats()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GPT_API_KEY", "bench")
+    servers = [
+        FakeOpenAIServer(latency=0.4),
+        FakeOpenAIServer(latency=0.05),
+        FakeOpenAIServer(latency=0.1, error_rate=0.3),
+    ]
+    for server in servers:
+        await server.start()
+    try:
+        endpoints = [{"url": server.base_url, "keys": ["k1", "k2"]} for server in servers]
+        print(f"请求数: {args.requests}, 并发: {args.concurrency}")
+
+        elapsed, failures, _ = await _run(endpoints[:1], args.requests, args.concurrency)
+        print(f"单端点 (0.4s):   {elapsed:.2f}s, 失败 {failures}")
+
+        elapsed, failures, stats = await _run(endpoints, args.requests, args.concurrency)
+        print(f"多端点路由:      {elapsed:.2f}s, 失败 {failures}")
+        for server, endpoint in zip(servers, stats):
+            print(
+                f"  延迟 {server.latency}s 错误率 {server.error_rate}: "
+                f"请求 {endpoint['requests']}, 失败 {endpoint['failures']}, "
+                f"EWMA {endpoint['latency_ewma'] or 0:.3f}s"
+            )
+    finally:
+        for server in servers:
+            await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""diff 行索引基准测试
+
+生成多 hunk 的大 diff，对比数组索引与逐行保存 dict 的解析耗时、内存占用，
+以及按新行号查找所在 hunk / 判断行是否可评论的耗时。
+
+用法: python -m benchmarks.bench_diff_index --lines 100000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from app.models.diff import DiffIndex
+
+
+def _make_diff(lines: int, hunk_size: int = 40) -> str:
+    rng = random.Random(42)
+    out = []
+    old = new = 1
+    while lines > 0:
+        size = min(hunk_size, lines)
+        body = []
+        adds = dels = 0
+        for _ in range(size):
+            op = rng.choice(" +-  ")
+            body.append(f"{op}    value_{rng.randrange(10 ** 6)} = compute(items, key=lambda x: x.id)")
+            adds += op == "+"
+            dels += op == "-"
+        out.append(f"@@ -{old},{size - adds} +{new},{size - dels} @@ def func_{old}():")
+        out.extend(body)
+        old += size - adds + 20
+        new += size - dels + 20
+        lines -= size
+    return "\n".join(out)
+
+
+def _dict_lines(text: str):
+    """逐行保存 {新行号: 内容} 的对照实现"""
+    changes = {}
+    new = 0
+    for line in text.splitlines():
+        if line.startswith("@@"):
+            new = int(line.split("+")[1].split(",")[0])
+        elif not line.startswith("-"):
+            changes[new] = line[1:]
+            new += 1
+    return changes
+
+
+def _measure(name, build, text):
+    # 耗时和内存分开测量，避免 tracemalloc 的开销计入解析耗时
+    start = time.perf_counter()
+    build(text)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build(text)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<16} 解析 {elapsed * 1000:8.1f}ms  内存 {current / 1024 / 1024:7.2f} MB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    text = _make_diff(args.lines)
+    print(f"diff: {args.lines} 行, {len(text.encode('utf-8')) / 1024 / 1024:.1f} MB")
+
+    _measure("dict 逐行", _dict_lines, text)
+    index = _measure("DiffIndex", DiffIndex, text)
+    print(f"DiffIndex 数组 {index.nbytes() / 1024 / 1024:.2f} MB, {len(index.hunk_starts)} 个 hunk")
+
+    rng = random.Random(7)
+    last = index.new_side[-1]
+    targets = [rng.randrange(1, last + 1) for _ in range(args.lookups)]
+    start = time.perf_counter()
+    found = sum(index.contains_new_line(n) for n in targets)
+    hunks = sum(index.hunk_for_new_line(n) >= 0 for n in targets)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.lookups} 次查找 {elapsed * 1000:.1f}ms ({elapsed / args.lookups / 2 * 1e6:.2f}us/次), "
+        f"可评论 {found}, 在 hunk 内 {hunks}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""diff 提示词压缩基准测试
+
+生成混合的 MR：普通源码改动、依赖锁文件、生成代码、只有格式化变化的文件和重命名，
+统计压缩前后提示词的 token 数和压缩耗时。
+
+用法: python -m benchmarks.bench_diff_minify --files 60 --source-context 8
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+
+from app.infra.ai.tokenizer import get_tokenizer
+from app.models.git import ChangeType, FileDiff, MergeRequest, MergeRequestState
+from app.models.pipeline.minify import DiffMinifier
+
+
+def _hunk(rng: random.Random, start: int, context: int, changes: int) -> list:
+    lines = [f"@@ -{start},{2 * context + changes} +{start},{2 * context + changes} @@ def func_{start}():"]
+    lines += [f"     value_{start + i} = compute(items, key=lambda x: x.id)" for i in range(context)]
+    for i in range(changes):
+        lines.append(f"-    total_{i} = sum(item.price for item in items)")
+        lines.append(f"+    total_{i} = sum(item.price * item.count for item in items if item.active)")
+    lines += [f"     result_{start + i}.append(value)" for i in range(context)]
+    return lines
+
+
+def _source(rng: random.Random, context: int) -> str:
+    lines = []
+    for h in range(rng.randrange(1, 5)):
+        lines += _hunk(rng, 1 + h * 100, context, rng.randrange(1, 4))
+    return "\n".join(lines)
+
+
+def _reformatted(rng: random.Random) -> str:
+    lines = ["@@ -1,40 +1,40 @@"]
+    for i in range(40):
+        lines.append(f"-if(x_{i}>0){{call(x_{i});}}")
+        lines.append(f"+if (x_{i} > 0) {{ call(x_{i}); }}")
+    return "\n".join(lines)
+
+
+def _lockfile(rng: random.Random) -> str:
+    lines = ["@@ -1,400 +1,400 @@"]
+    for i in range(200):
+        lines.append(f'-    "node_modules/dep-{i}": {{"version": "1.{rng.randrange(9)}.0", "integrity": "sha512-{i:064x}"}},')
+        lines.append(f'+    "node_modules/dep-{i}": {{"version": "2.{rng.randrange(9)}.0", "integrity": "sha512-{i + 1:064x}"}},')
+    return "\n".join(lines)
+
+
+def _make_mr(files: int, context: int) -> MergeRequest:
+    rng = random.Random(42)
+    file_diffs = []
+    for i in range(files):
+        kind = i % 10
+        if kind == 0:
+            file_diffs.append(FileDiff(new_file_path=f"web/pkg{i}/package-lock.json", change_type=ChangeType.MODIFY, diff_content=_lockfile(rng)))
+        elif kind == 1:
+            file_diffs.append(FileDiff(new_file_path=f"api/v{i}/service_pb2.py", change_type=ChangeType.MODIFY, diff_content=_source(rng, context)))
+        elif kind == 2:
+            file_diffs.append(FileDiff(new_file_path=f"src/fmt_{i}.c", change_type=ChangeType.MODIFY, diff_content=_reformatted(rng)))
+        elif kind == 3:
+            file_diffs.append(FileDiff(new_file_path=f"src/new_{i}.py", old_file_path=f"src/old_{i}.py", change_type=ChangeType.MODIFY, diff_content=""))
+        else:
+            path = f"src/module_{i}.py"
+            file_diffs.append(FileDiff(new_file_path=path, old_file_path=path, change_type=ChangeType.MODIFY, diff_content=_source(rng, context)))
+    return MergeRequest(
+        mr_id="1",
+        owner="bench",
+        repo="bench",
+        title="bench",
+        author="bench",
+        state=MergeRequestState.OPEN,
+        description="",
+        source_branch="feature",
+        target_branch="main",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+        file_diffs=file_diffs,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=60)
+    parser.add_argument("--source-context", type=int, default=8, help="源码 hunk 中每处变更前后的上下文行数")
+    parser.add_argument("--context", type=int, default=3, help="压缩后保留的上下文行数")
+    args = parser.parse_args()
+
+    mr = _make_mr(args.files, args.source_context)
+    tokenizer = get_tokenizer()
+    minifier = DiffMinifier(context_lines=args.context)
+
+    start = time.perf_counter()
+    file_diffs, report = minifier.minify(mr, tokenizer)
+    elapsed = time.perf_counter() - start
+
+    print(f"MR: {len(mr.file_diffs)} 个文件, tokenizer {tokenizer.name}")
+    print(f"发送给模型: {len(file_diffs)} 个文件, 省略 {len(report.omitted)} 个")
+    print(f"去掉空白 hunk {report.hunks_collapsed} 个, 上下文 {report.context_trimmed} 行")
+    print(
+        f"token: {report.tokens_before} -> {report.tokens_after}, "
+        f"节省 {report.tokens_saved} ({report.tokens_saved / report.tokens_before:.0%}), "
+        f"耗时 {elapsed * 1000:.1f}ms（含 token 计数）"
+    )
+
+
+if __name__ == "__main__":
+    main()
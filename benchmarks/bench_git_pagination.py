@@ -0,0 +1,64 @@
+"""PR 文件分页获取基准测试
+
+本地假 GitHub 提供一个 3000 文件的 PR（每页 100 个，共 30 页），对比：
+- 旧实现：只请求一次 /files，拿到默认的前 30 个文件
+- 顺序翻页：逐页请求全部文件
+- 并发翻页：读取 Link rel="last" 后并发请求其余页
+
+用法: python -m benchmarks.bench_git_pagination --files 3000 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fake_github import FakeGitHubServer
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GPT_API_KEY", "bench")
+    os.environ.setdefault("GIT_SERVICE", "github")
+    os.environ.setdefault("GITHUB_TOKEN", "bench")
+    from app.infra.config.settings import get_settings
+    from app.infra.git.github.client import GitHubClient
+
+    # 只比较分页方式，关闭条件请求缓存
+    get_settings().GIT_HTTP_CACHE_ENABLED = False
+    server = await FakeGitHubServer(files=args.files, latency=args.latency).start()
+    client = GitHubClient()
+    client.github_api_url = server.base_url
+    url = "/repos/owner/repo/pulls/1/files"
+    try:
+        print(f"PR 文件数: {args.files}, 每次请求延迟: {args.latency}s")
+
+        start = time.perf_counter()
+        files = await client._request("GET", url)
+        print(f"旧实现 (单次请求):   {time.perf_counter() - start:.2f}s, 文件 {len(files)}")
+
+        settings = get_settings()
+        concurrency = settings.GIT_PAGINATION_CONCURRENCY
+        settings.GIT_PAGINATION_CONCURRENCY = 1
+        start = time.perf_counter()
+        files = await client._paginate(url)
+        print(f"顺序翻页:            {time.perf_counter() - start:.2f}s, 文件 {len(files)}")
+        settings.GIT_PAGINATION_CONCURRENCY = concurrency
+
+        server.max_concurrency = 0
+        start = time.perf_counter()
+        mr = await client.get_merge_request("owner", "repo", "1")
+        print(
+            f"并发翻页 (并发 {concurrency}):  {time.perf_counter() - start:.2f}s, "
+            f"文件 {len(mr.file_diffs)}, 最大并发 {server.max_concurrency}"
+        )
+    finally:
+        await client.close()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""速率限制器并发争用基准测试
+
+大量并发请求争抢同一个限流键，统计放行数和 Redis 往返次数：
+旧实现（GET 后 SET/INCR）会超额放行且每次检查需要 2 次往返，
+令牌桶 Lua 脚本应严格放行上限数量，每次检查 1 次往返。
+
+默认使用 fakeredis 并为每条命令注入网络延迟，可通过 --redis-url 指向真实 Redis。
+
+用法: python -m benchmarks.bench_rate_limiter --requests 1000 --limit 100
+"""
+import argparse
+import asyncio
+import os
+import time
+
+
+class RoundTripCounter:
+    """包装 Redis 客户端的 execute_command，统计往返次数并模拟网络延迟"""
+
+    def __init__(self, redis, latency: float):
+        self.count = 0
+        self.redis = redis
+        self.original = original = redis.execute_command
+
+        async def execute_command(*args, **kwargs):
+            self.count += 1
+            await asyncio.sleep(latency)
+            return await original(*args, **kwargs)
+
+        redis.execute_command = execute_command
+
+    def restore(self):
+        self.redis.execute_command = self.original
+
+
+async def _legacy_check(redis, key: str, max_count: int) -> bool:
+    """旧实现：非原子的 GET + SET/INCR"""
+    count = await redis.get(key)
+    if count is None:
+        await redis.set(key, 1, ex=3600)
+        return True
+    if int(count) >= max_count:
+        return False
+    await redis.incr(key)
+    return True
+
+
+async def _run(redis, check, n: int, limit: int, latency: float):
+    counter = RoundTripCounter(redis, latency)
+    start = time.perf_counter()
+    results = await asyncio.gather(*[check(limit) for _ in range(n)])
+    elapsed = time.perf_counter() - start
+    counter.restore()
+    return sum(results), counter.count, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--latency", type=float, default=0.001, help="fakeredis 每条命令的模拟延迟（秒）")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GPT_API_KEY", "bench")
+    from app.infra.rate_limiter import RateLimiter
+
+    if args.redis_url:
+        import aioredis
+
+        redis = aioredis.from_url(args.redis_url)
+        latency = 0.0
+    else:
+        from fakeredis.aioredis import FakeRedis
+
+        redis = FakeRedis()
+        latency = args.latency
+
+    await redis.delete("bench:legacy", "bench:bucket")
+    print(f"并发请求数: {args.requests}, 上限: {args.limit}")
+
+    admitted, trips, elapsed = await _run(
+        redis, lambda limit: _legacy_check(redis, "bench:legacy", limit), args.requests, args.limit, latency
+    )
+    print(
+        f"旧实现 (GET+INCR): 放行 {admitted}, 超额 {max(0, admitted - args.limit)}, "
+        f"往返 {trips / args.requests:.2f}/次, {elapsed:.3f}s"
+    )
+
+    limiter = RateLimiter(redis=redis)
+    # 预先加载脚本，避免首批并发请求都走 NOSCRIPT 回退
+    await limiter.get_remaining("bench:bucket", args.limit)
+    admitted, trips, elapsed = await _run(
+        redis,
+        lambda limit: limiter.check_and_increment("bench:bucket", limit),
+        args.requests,
+        args.limit,
+        latency,
+    )
+    print(
+        f"令牌桶 (Lua):      放行 {admitted}, 超额 {max(0, admitted - args.limit)}, "
+        f"往返 {trips / args.requests:.2f}/次, {elapsed:.3f}s"
+    )
+    await redis.delete("bench:legacy", "bench:bucket")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""每个 webhook 的对象分配和连接池创建基准测试
+
+对比两种方式处理一次 MR 审查 + 一次评论回复 webhook 时创建的对象：
+- 按请求构造：Depends() 每次新建 ReviewerService（Bot、CodeReviewPipeline、RedisClient），
+  每次审查 / 回复新建 AIClient（自带 RedisClient、RateLimiter）和 RateLimiter，
+  每个 RateLimiter / RedisClient 都调用 aioredis.from_url 创建新的连接池
+- 生命周期共享：ServiceContainer 在启动时创建一次，请求只取共享实例
+
+不发起网络请求，只统计 aioredis 连接池创建次数、内存分配和构造耗时。
+
+用法: python -m benchmarks.bench_service_allocation --webhooks 200
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+
+class PoolCounter:
+    """包装 aioredis 连接池的构造，统计创建的连接池数量"""
+
+    def __init__(self):
+        import aioredis
+
+        self.count = 0
+        self.module = aioredis
+        self.original = original = aioredis.ConnectionPool.__init__
+
+        def init(pool, *args, **kwargs):
+            self.count += 1
+            original(pool, *args, **kwargs)
+
+        aioredis.ConnectionPool.__init__ = init
+
+    def restore(self):
+        self.module.ConnectionPool.__init__ = self.original
+
+
+async def per_request_webhook():
+    """按旧实现为一次审查和一次评论回复构造的对象"""
+    import aioredis
+
+    from app.infra.cache.redis_client import RedisClient
+    from app.infra.config.settings import get_settings
+    from app.infra.rate_limiter import RateLimiter
+    from app.services.discussion_service import DiscussionService
+    from app.services.reviewer_service import ReviewerService
+
+    url = get_settings().REDIS_URL
+
+    def redis_client() -> RedisClient:
+        # 旧实现中每个 RedisClient / RateLimiter 都调用 aioredis.from_url
+        client = RedisClient()
+        client.redis = aioredis.from_url(url)
+        return client
+
+    def rate_limiter() -> RateLimiter:
+        return RateLimiter(redis=aioredis.from_url(url))
+
+    objects = []
+    for _ in range(2):  # 审查 webhook + 评论 webhook 各一次 Depends()
+        service = ReviewerService()
+        service.redis_client = redis_client()
+        objects.append(service)
+    # 审查：Bot 的 MR 限流 + pipeline 中的 AIClient（RedisClient + RateLimiter）
+    objects += [rate_limiter(), redis_client(), rate_limiter()]
+    # 回复：评论限流 + DiscussionService + AIClient（RedisClient + RateLimiter）
+    objects += [rate_limiter(), DiscussionService(), redis_client(), rate_limiter()]
+    return objects
+
+
+async def shared_webhook():
+    """生命周期共享实例下同样两次 webhook 取用的对象"""
+    from app.infra.ai.client import get_ai_client
+    from app.infra.rate_limiter import get_rate_limiter
+    from app.services.discussion_service import get_discussion_service
+    from app.services.reviewer_service import get_reviewer_service
+
+    objects = []
+    for _ in range(2):
+        service = get_reviewer_service()
+        await service.redis_client.initialize()
+        objects.append(service)
+    objects += [get_rate_limiter(), get_ai_client(), get_rate_limiter()]
+    objects += [get_rate_limiter(), get_discussion_service(), get_ai_client(), get_rate_limiter()]
+    return objects
+
+
+async def measure(name: str, build, webhooks: int):
+    counter = PoolCounter()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        kept = [await build() for _ in range(webhooks)]
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        counter.restore()
+    print(
+        f"{name}: 连接池 {counter.count / webhooks:.2f} 个/webhook, "
+        f"内存峰值 {peak / webhooks / 1024:.1f} KB/webhook, 构造耗时 {elapsed / webhooks * 1000:.2f} ms/webhook"
+    )
+    return kept
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--webhooks", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GPT_API_KEY", "bench")
+    os.environ.setdefault("GITLAB_TOKEN", "bench")
+    from app.services.container import get_container
+
+    # 共享实例在启动时创建，不计入单次 webhook
+    get_container()
+    print(f"webhook 数: {args.webhooks}（每次包含一次审查和一次评论回复）")
+    await measure("按请求构造", per_request_webhook, args.webhooks)
+    await measure("生命周期共享", shared_webhook, args.webhooks)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""Tokenizer 吞吐基准测试
+
+生成包含中英文注释的大 diff，测量各 tokenizer 的吞吐量、
+FileDiff 缓存命中后的耗时，以及旧的 len // 4 估算相对 tokenizer 的偏差。
+
+用法: python -m benchmarks.bench_tokenizer --lines 50000
+"""
+import argparse
+import random
+import time
+
+from app.infra.ai.tokenizer import HeuristicTokenizer, get_tokenizer
+from app.models.git import ChangeType, FileDiff
+
+
+def _make_diff(lines: int) -> str:
+    rng = random.Random(42)
+    samples = [
+        "+    result = compute_value(items, key=lambda x: x.id)  # 计算结果",
+        "-    if not user.is_active: return None",
+        "     for index, item in enumerate(self.items):",
+        "+    # 这里需要处理空列表的情况，避免抛出异常",
+        "+    logger.info(f\"处理完成: {len(items)} 条记录\")",
+        "+    const handler = async (req, res) => { await next(req); };",
+    ]
+    out = ["@@ -1,{0} +1,{0} @@".format(lines)]
+    out.extend(rng.choice(samples) for _ in range(lines))
+    return "\n".join(out)
+
+
+def _measure(name, tokenizer, text):
+    start = time.perf_counter()
+    tokens = tokenizer.count(text)
+    elapsed = time.perf_counter() - start
+    mb = len(text.encode("utf-8")) / 1024 / 1024
+    print(f"{name:<24} {tokens:>10} tokens  {elapsed:7.3f}s  {mb / elapsed:8.1f} MB/s")
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=50000)
+    args = parser.parse_args()
+
+    text = _make_diff(args.lines)
+    print(f"diff: {args.lines} 行, {len(text.encode('utf-8')) / 1024 / 1024:.1f} MB")
+
+    reference = None
+    configured = get_tokenizer()
+    if configured.name != "heuristic":
+        reference = _measure(configured.name, configured, text)
+    heuristic = _measure("heuristic", HeuristicTokenizer(), text)
+    reference = reference or heuristic
+
+    legacy = len(text) // 4
+    print(f"{'len // 4 (旧)':<24} {legacy:>10} tokens  偏差 {(legacy - reference) / reference:+.1%}")
+
+    file_diff = FileDiff(new_file_path="big.py", change_type=ChangeType.MODIFY, diff_content=text)
+    start = time.perf_counter()
+    file_diff.token_count(configured)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(1000):
+        file_diff.token_count(configured)
+    cached = (time.perf_counter() - start) / 1000
+    print(f"FileDiff.token_count 首次 {first * 1000:.1f}ms, 缓存命中 {cached * 1e6:.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""本地 GitHub REST API 的假服务，用于基准测试
+
+提供一个带大量文件和评论的 PR，分页接口返回 Link 响应头，可注入固定延迟。
+响应带 ETag，请求携带匹配的 If-None-Match 时返回 304。
+同时提供 .diff 格式的 PR、GraphQL PR 快照查询和提交比较接口。
+"""
+import asyncio
+import hashlib
+import json
+from typing import Optional
+
+from aiohttp import web
+
+
+class FakeGitHubServer:
+    """模拟 PR、文件和评论接口的本地服务"""
+
+    def __init__(self, files: int = 3000, comments: int = 0, latency: float = 0.05):
+        self.files = files
+        self.comments = comments
+        self.latency = latency
+        self.compare_files = 1  # 比较接口返回的文件数（前 N 个文件）
+        self.compare_status = "ahead"
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.max_concurrency = 0
+        self._active = 0
+        self.port: Optional[int] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def _enter(self):
+        self.request_count += 1
+        self._active += 1
+        self.max_concurrency = max(self.max_concurrency, self._active)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self._active -= 1
+
+    def _json(self, request: web.Request, data, headers=None) -> web.Response:
+        body = json.dumps(data)
+        etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            # 与 GitHub 一致，304 响应不带分页头
+            self.not_modified_count += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        headers = {**(headers or {}), "ETag": etag}
+        return web.Response(text=body, content_type="application/json", headers=headers)
+
+    def _page(self, request: web.Request, items):
+        per_page = int(request.query.get("per_page", 30))
+        page = int(request.query.get("page", 1))
+        last = max(1, (len(items) + per_page - 1) // per_page)
+        links = []
+        base = str(request.url.with_query({}))
+        if page < last:
+            links.append(f'<{base}?per_page={per_page}&page={page + 1}>; rel="next"')
+            links.append(f'<{base}?per_page={per_page}&page={last}>; rel="last"')
+        headers = {"Link": ", ".join(links)} if links else {}
+        start = (page - 1) * per_page
+        return self._json(request, items[start : start + per_page], headers)
+
+    def _file_items(self):
+        return [
+            {
+                "filename": f"src/module_{i}.py",
+                "status": "modified",
+                "patch": f"@@ -1,1 +1,1 @@\n-old_{i}\n+new_{i}",
+            }
+            for i in range(min(self.files, 3000))
+        ]
+
+    def _comment_items(self):
+        return [
+            {
+                "id": i,
+                "user": {"login": "reviewer"},
+                "body": f"comment {i}",
+                "path": "src/module_0.py",
+                "line": 1,
+                "created_at": "2024-01-01T00:00:00Z",
+                "updated_at": "2024-01-01T00:00:00Z",
+            }
+            for i in range(self.comments)
+        ]
+
+    def _diff_text(self) -> str:
+        parts = []
+        for file in self._file_items():
+            path = file["filename"]
+            parts.append(
+                f"diff --git a/{path} b/{path}\nindex 0000000..1111111 100644\n"
+                f"--- a/{path}\n+++ b/{path}\n{file['patch']}\n"
+            )
+        return "".join(parts)
+
+    async def _handle_pull(self, request: web.Request) -> web.Response:
+        await self._enter()
+        if "diff" in request.headers.get("Accept", ""):
+            return web.Response(text=self._diff_text(), content_type="text/plain")
+        number = int(request.match_info["number"])
+        return self._json(
+            request,
+            {
+                "number": number,
+                "title": "large change",
+                "user": {"login": "author"},
+                "state": "open",
+                "body": "",
+                "head": {"ref": "feature", "sha": "0" * 40},
+                "base": {"ref": "main"},
+                "created_at": "2024-01-01T00:00:00Z",
+                "updated_at": "2024-01-01T00:00:00Z",
+                "labels": [],
+                "requested_reviewers": [],
+                "comments": self.comments,
+            }
+        )
+
+    async def _handle_files(self, request: web.Request) -> web.Response:
+        await self._enter()
+        return self._page(request, self._file_items())
+
+    async def _handle_comments(self, request: web.Request) -> web.Response:
+        await self._enter()
+        return self._page(request, self._comment_items())
+
+    async def _handle_compare(self, request: web.Request) -> web.Response:
+        await self._enter()
+        files = self._file_items()[: self.compare_files]
+        return self._json(request, {"status": self.compare_status, "files": files})
+
+    async def _handle_graphql(self, request: web.Request) -> web.Response:
+        await self._enter()
+        variables = (await request.json())["variables"]
+        pull_request = {
+            "number": variables["number"],
+            "title": "large change",
+            "body": "",
+            "state": "OPEN",
+            "createdAt": "2024-01-01T00:00:00Z",
+            "updatedAt": "2024-01-01T00:00:00Z",
+            "headRefName": "feature",
+            "baseRefName": "main",
+            "headRefOid": "0" * 40,
+            "author": {"login": "author"},
+            "labels": {"nodes": []},
+            "reviewRequests": {"nodes": []},
+            "comments": {"totalCount": self.comments},
+        }
+
+        def connection(items, cursor, size):
+            start = int(cursor) if cursor else 0
+            end = start + size
+            return {
+                "pageInfo": {"hasNextPage": end < len(items), "endCursor": str(end)},
+                "nodes": items[start:end],
+            }
+
+        if variables["withFiles"]:
+            files = [
+                {"path": file["filename"], "changeType": "MODIFIED"} for file in self._file_items()
+            ]
+            pull_request["files"] = connection(files, variables.get("filesCursor"), 100)
+        if variables["withThreads"]:
+            threads = [
+                {
+                    "id": f"thread_{comment['id']}",
+                    "comments": {
+                        "pageInfo": {"hasNextPage": False, "endCursor": None},
+                        "nodes": [
+                            {
+                                "databaseId": comment["id"],
+                                "body": comment["body"],
+                                "createdAt": comment["created_at"],
+                                "updatedAt": comment["updated_at"],
+                                "path": comment["path"],
+                                "line": comment["line"],
+                                "originalLine": comment["line"],
+                                "author": comment["user"],
+                                "replyTo": None,
+                            }
+                        ]
+                    }
+                }
+                for comment in self._comment_items()
+            ]
+            pull_request["reviewThreads"] = connection(threads, variables.get("threadsCursor"), 50)
+        return web.json_response({"data": {"repository": {"pullRequest": pull_request}}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/repos/{owner}/{repo}/pulls/{number}", self._handle_pull)
+        app.router.add_get("/repos/{owner}/{repo}/pulls/{number}/files", self._handle_files)
+        app.router.add_get("/repos/{owner}/{repo}/pulls/{number}/comments", self._handle_comments)
+        app.router.add_get("/repos/{owner}/{repo}/compare/{basehead}", self._handle_compare)
+        app.router.add_post("/graphql", self._handle_graphql)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
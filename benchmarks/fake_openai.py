@@ -0,0 +1,117 @@
+"""本地 OpenAI 兼容的假 LLM 服务，用于基准测试
+
+支持注入固定延迟、错误响应和流式响应（SSE）。
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Optional
+
+from aiohttp import web
+
+
+class FakeOpenAIServer:
+    """模拟 /chat/completions 接口的本地服务"""
+
+    def __init__(
+        self,
+        latency: float = 1.0,
+        reply: str = '{"summary": "ok", "comments": []}',
+        error_rate: float = 0.0,
+        error_status: int = 503,
+    ):
+        self.latency = latency
+        self.reply = reply
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.request_count = 0
+        self.port: Optional[int] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def _handle_completion(self, request: web.Request) -> web.StreamResponse:
+        self.request_count += 1
+        body = await request.json()
+        await asyncio.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            return web.json_response(
+                {"error": {"message": "injected error", "type": "server_error"}},
+                status=self.error_status,
+            )
+
+        created = int(time.time())
+        if not body.get("stream"):
+            return web.json_response(
+                {
+                    "id": f"chatcmpl-{self.request_count}",
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": body.get("model", "fake"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": self.reply},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                }
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i in range(0, len(self.reply), 16):
+            chunk = {
+                "id": f"chatcmpl-{self.request_count}",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", "fake"),
+                "choices": [
+                    {"index": 0, "delta": {"content": self.reply[i : i + 16]}, "finish_reason": None}
+                ],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._handle_completion)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+class ThreadedFakeOpenAIServer:
+    """在独立线程的事件循环中运行假 LLM，避免被阻塞式客户端卡死"""
+
+    def __init__(self, **kwargs):
+        self.server = FakeOpenAIServer(**kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return self.server.base_url
+
+    def start(self) -> "ThreadedFakeOpenAIServer":
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self._loop).result()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
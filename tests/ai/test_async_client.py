@@ -0,0 +1,159 @@
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+from app.infra.ai.client import AIClient, Message
+from app.infra.ai.router import EndpointRouter
+from app.infra.ai.single_flight import SingleFlight
+from app.infra.cache.redis_client import RedisClient
+from app.infra.cache.response_cache import ResponseCache
+
+LATENCY = 0.2
+
+
+def _completion_body(content: str) -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "fake",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+    }
+
+
+async def _slow_handler(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(LATENCY)
+    body = json.loads(request.content)
+    if body.get("stream"):
+        chunks = []
+        for piece in ["he", "llo"]:
+            chunk = {
+                "id": "chatcmpl-test",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "fake",
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            chunks.append(f"data: {json.dumps(chunk)}\n\n")
+        chunks.append("data: [DONE]\n\n")
+        return httpx.Response(
+            200, headers={"Content-Type": "text/event-stream"}, content="".join(chunks)
+        )
+    return httpx.Response(200, json=_completion_body("hello"))
+
+
+@pytest.fixture
+def ai_client():
+    return AIClient(http_client=httpx.AsyncClient(transport=httpx.MockTransport(_slow_handler)))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_completions_do_not_block(ai_client):
+    """测试并发请求在约一个 LLM 延迟内完成"""
+    messages = [{"role": "user", "content": "review"}]
+    await ai_client._create_completion(messages)  # 预热
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *[ai_client._create_completion(messages) for _ in range(10)]
+    )
+    elapsed = time.perf_counter() - start
+
+    assert results == ["hello"] * 10
+    assert elapsed < LATENCY * 3
+
+
+@pytest.mark.asyncio
+async def test_stream_completion(ai_client):
+    """测试流式响应被异步迭代并拼接"""
+    messages = [{"role": "user", "content": "review"}]
+    assert await ai_client._create_completion(messages, stream=True) == "hello"
+
+
+@pytest.mark.asyncio
+async def test_chat_repeated_prompt_served_from_cache():
+    """测试相同的请求第二次命中缓存，不再调用上游"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json=_completion_body("review result"))
+
+    client = AIClient(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    redis_client = RedisClient()
+    redis_client.redis = FakeRedis()
+    client.response_cache = ResponseCache(namespace="test:chat", redis_client=redis_client)
+    client.rate_limiter.check_and_increment = AsyncMock(return_value=True)
+
+    messages = [Message("system", "review"), Message("user", "审查代码变更：diff")]
+    assert await client.chat(messages) == "review result"
+    assert await client.chat(messages) == "review result"
+
+    assert len(calls) == 1
+    assert client.rate_limiter.check_and_increment.await_count == 1
+    assert client.response_cache.stats()["local_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_chats_coalesce():
+    """测试并发的相同请求（包括流式）合并为一次上游调用"""
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return await _slow_handler(request)
+
+    client = AIClient(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    redis_client = RedisClient()
+    redis_client.redis = FakeRedis()
+    client.response_cache = ResponseCache(namespace="test:coalesce", redis_client=redis_client)
+    client.single_flight = SingleFlight(namespace="test:coalesce", redis_client=redis_client)
+    client.rate_limiter.check_and_increment = AsyncMock(return_value=True)
+
+    messages = [Message("user", "审查代码变更：same diff")]
+
+    async def stream_once() -> str:
+        return "".join([delta async for delta in client.chat_stream(messages)])
+
+    results = await asyncio.gather(stream_once(), *[client.chat(messages) for _ in range(3)])
+
+    assert results == ["hello"] * 4
+    assert len(calls) == 1
+    assert client.rate_limiter.check_and_increment.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_key_uses_routed_model():
+    """测试不同模型的端点响应不共用缓存，缓存按实际响应的模型保存"""
+    models = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        model = json.loads(request.content)["model"]
+        models.append(model)
+        return httpx.Response(200, json=_completion_body(f"from {model}"))
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client = AIClient(http_client=http_client)
+    redis_client = RedisClient()
+    redis_client.redis = FakeRedis()
+    client.response_cache = ResponseCache(namespace="test:routed", redis_client=redis_client)
+    client.rate_limiter.check_and_increment = AsyncMock(return_value=True)
+    messages = [Message("user", "审查代码变更：routed diff")]
+
+    client.router = EndpointRouter([{"url": "http://a/v1", "keys": ["k"], "model": "model-a"}], http_client)
+    assert await client.chat(messages) == "from model-a"
+    assert await client.chat(messages) == "from model-a"
+
+    client.router = EndpointRouter([{"url": "http://b/v1", "keys": ["k"], "model": "model-b"}], http_client)
+    assert await client.chat(messages) == "from model-b"
+    assert models == ["model-a", "model-b"]
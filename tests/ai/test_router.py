@@ -0,0 +1,131 @@
+import asyncio
+import json
+from collections import Counter
+
+import httpx
+import openai
+import pytest
+
+from app.infra.ai.router import EndpointRouter
+
+
+def _completion_body(content: str) -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "fake",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+    }
+
+
+class FakeHosts:
+    """按 host 模拟多个 OpenAI 兼容端点，可注入延迟和状态码"""
+
+    def __init__(self, latencies, statuses=None):
+        self.latencies = latencies
+        self.statuses = statuses or {}
+        self.hits = Counter()
+        self.keys = Counter()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.hits[host] += 1
+        self.keys[request.headers["Authorization"]] += 1
+        await asyncio.sleep(self.latencies.get(host, 0))
+        status = self.statuses.get(host, 200)
+        if status != 200:
+            return httpx.Response(status, json={"error": {"message": "injected"}})
+        body = json.loads(request.content)
+        return httpx.Response(200, json=_completion_body(f"{host}:{body['model']}"))
+
+
+def _router(fake: FakeHosts, endpoints) -> EndpointRouter:
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(fake.handler))
+    return EndpointRouter(endpoints, http_client)
+
+
+async def _complete(router: EndpointRouter) -> str:
+    completion = await router.call(
+        lambda client, endpoint: client.chat.completions.create(
+            model=endpoint.model or "default",
+            messages=[{"role": "user", "content": "review"}],
+        )
+    )
+    return completion.choices[0].message.content
+
+
+@pytest.mark.asyncio
+async def test_routes_to_lowest_latency_endpoint():
+    """测试探测后请求集中到延迟最低的端点"""
+    fake = FakeHosts({"slow": 0.1, "fast": 0.01})
+    router = _router(
+        fake,
+        [{"url": "http://slow/v1", "keys": ["a"]}, {"url": "http://fast/v1", "keys": ["b"]}],
+    )
+
+    for _ in range(10):
+        await _complete(router)
+
+    assert fake.hits["slow"] == 1
+    assert fake.hits["fast"] == 9
+
+
+@pytest.mark.asyncio
+async def test_fails_over_on_server_error():
+    """测试 5xx 时转移到其他端点并让故障端点进入冷却"""
+    fake = FakeHosts({}, statuses={"broken": 503})
+    router = _router(
+        fake,
+        [
+            {"url": "http://broken/v1", "keys": ["a"], "weight": 10},
+            {"url": "http://healthy/v1", "keys": ["b"], "model": "backup-model"},
+        ],
+    )
+
+    assert await _complete(router) == "healthy:backup-model"
+    assert await _complete(router) == "healthy:backup-model"
+    assert fake.hits["broken"] == 1
+
+    stats = {endpoint["url"]: endpoint for endpoint in router.stats()}
+    assert stats["http://broken/v1"]["cooling_down"]
+    assert stats["http://broken/v1"]["failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rotates_keys_and_skips_rate_limited_key():
+    """测试同一端点内轮换 key，429 时冷却该 key 后换 key 重试"""
+    fake = FakeHosts({})
+    router = _router(fake, [{"url": "http://api/v1", "keys": ["k1", "k2"]}])
+
+    for _ in range(4):
+        await _complete(router)
+    assert fake.keys["Bearer k1"] == 2
+    assert fake.keys["Bearer k2"] == 2
+
+    endpoint = router.endpoints[0]
+    endpoint.cool_key(0, 60)
+    for _ in range(3):
+        await _complete(router)
+    assert fake.keys["Bearer k1"] == 2
+    assert fake.keys["Bearer k2"] == 5
+
+
+@pytest.mark.asyncio
+async def test_raises_client_errors_without_failover():
+    """测试 4xx（非 429）直接抛出，不尝试其他端点"""
+    fake = FakeHosts({}, statuses={"first": 400})
+    router = _router(
+        fake,
+        [{"url": "http://first/v1", "keys": ["a"]}, {"url": "http://second/v1", "keys": ["b"]}],
+    )
+
+    with pytest.raises(openai.BadRequestError):
+        await _complete(router)
+    assert fake.hits["second"] == 0
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+from app.infra.ai.single_flight import SingleFlight
+from app.infra.cache.redis_client import RedisClient
+
+
+def _single_flight(redis: FakeRedis) -> SingleFlight:
+    redis_client = RedisClient()
+    redis_client.redis = redis
+    flight = SingleFlight(namespace="test:singleflight", redis_client=redis_client)
+    flight.poll_interval = 0.01
+    return flight
+
+
+class Upstream:
+    def __init__(self, fail_first: bool = False):
+        self.calls = 0
+        self.fail_first = fail_first
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if self.fail_first and self.calls == 1:
+            raise RuntimeError("upstream error")
+        return "response"
+
+
+@pytest.mark.asyncio
+async def test_local_requests_share_one_call():
+    """测试同一进程内相同请求只调用一次上游"""
+    flight = _single_flight(FakeRedis())
+    upstream = Upstream()
+
+    results = await asyncio.gather(*[flight.do("key", upstream) for _ in range(5)])
+
+    assert results == ["response"] * 5
+    assert upstream.calls == 1
+    assert flight.counters["local_shared"] == 4
+
+
+@pytest.mark.asyncio
+async def test_workers_share_one_call_through_redis():
+    """测试多个 worker（各自的 SingleFlight）通过 Redis 共享一次上游调用"""
+    redis = FakeRedis()
+    workers = [_single_flight(redis) for _ in range(3)]
+    upstream = Upstream()
+
+    results = await asyncio.gather(*[worker.do("key", upstream) for worker in workers])
+
+    assert results == ["response"] * 3
+    assert upstream.calls == 1
+    assert sum(worker.counters["remote_shared"] for worker in workers) == 2
+
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_when_leader_fails():
+    """测试 leader 失败后 follower 重新竞争锁并请求上游"""
+    redis = FakeRedis()
+    leader, follower = _single_flight(redis), _single_flight(redis)
+    upstream = Upstream(fail_first=True)
+
+    results = await asyncio.gather(
+        leader.do("key", upstream), follower.do("key", upstream), return_exceptions=True
+    )
+
+    assert isinstance(results[0], RuntimeError)
+    assert results[1] == "response"
+    assert upstream.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_followers_recover_when_leader_cancelled():
+    """测试 leader 被取消（如流式调用方提前关闭）时，进程内等待者自行请求而不是被一起取消"""
+    flight = _single_flight(FakeRedis())
+    upstream = Upstream()
+
+    leader = asyncio.ensure_future(flight.do("key", upstream))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.ensure_future(flight.do("key", upstream)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await asyncio.gather(*followers) == ["response"] * 3
+    assert leader.cancelled()
+    assert upstream.calls == 2
@@ -0,0 +1,71 @@
+import logging
+
+from app.infra.ai import tokenizer as tokenizer_module
+from app.infra.ai.tokenizer import BaseTokenizer, HeuristicTokenizer, get_tokenizer, pack_to_budget
+from app.models.git import ChangeType, FileDiff
+
+
+class CountingTokenizer(BaseTokenizer):
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def count(self, text: str) -> int:
+        self.calls += 1
+        return len(text)
+
+
+def test_heuristic_counts_cjk_per_character():
+    """测试中文按字符计数，不再被 len // 4 严重低估"""
+    tokenizer = HeuristicTokenizer()
+    chinese = "审查代码变更并给出建议" * 10
+    assert tokenizer.count(chinese) == len(chinese)
+    assert tokenizer.count("abcd" * 10) == 10
+    assert tokenizer.count("") == 0
+
+
+def test_file_diff_token_count_is_memoized():
+    """测试 FileDiff 的 token 数按内容缓存"""
+    tokenizer = CountingTokenizer()
+    file_diff = FileDiff(
+        new_file_path="a.py", change_type=ChangeType.MODIFY, diff_content="+print(1)"
+    )
+
+    assert file_diff.token_count(tokenizer) == 9
+    assert file_diff.token_count(tokenizer) == 9
+    assert tokenizer.calls == 1
+
+    file_diff.diff_content = "+print(12)"
+    assert file_diff.token_count(tokenizer) == 10
+    assert tokenizer.calls == 2
+
+
+def test_pack_to_budget_keeps_order_and_budget():
+    """测试装箱不超预算且保持原始顺序"""
+    items = [30, 80, 10, 50, 120, 20]
+    bins = pack_to_budget(items, 100, lambda item: item)
+
+    assert sorted(item for b in bins for item in b) == sorted(items)
+    assert all(sum(b) <= 100 or len(b) == 1 for b in bins)
+    for b in bins:
+        assert b == sorted(b, key=items.index)
+    assert len(bins) == 3
+
+
+def test_unknown_tokenizer_kind_warns(monkeypatch, caplog):
+    """测试 TOKENIZER 配置错误时记录警告并按 auto 处理"""
+
+    def unavailable(model, encoding):
+        raise ImportError("tiktoken not installed")
+
+    monkeypatch.setattr(tokenizer_module, "_load_tiktoken", unavailable)
+    get_tokenizer.cache_clear()
+    try:
+        with caplog.at_level(logging.WARNING, logger=tokenizer_module.__name__):
+            tokenizer = get_tokenizer("heurstic")
+        assert isinstance(tokenizer, HeuristicTokenizer)
+        assert "未知的 TOKENIZER 配置 'heurstic'" in caplog.text
+        assert "加载 tiktoken 失败" in caplog.text
+    finally:
+        get_tokenizer.cache_clear()
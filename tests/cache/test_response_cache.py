@@ -0,0 +1,53 @@
+import pytest
+
+from app.infra.cache.response_cache import LRUCache, ResponseCache
+
+
+@pytest.fixture
+def response_cache(redis_client):
+    return ResponseCache(namespace="test:ai:response", redis_client=redis_client)
+
+
+def test_fingerprint_uses_full_normalized_messages():
+    """测试缓存键覆盖完整消息，并忽略空白差异"""
+    prefix = "审查代码变更：" + "x" * 100
+    messages_a = [{"role": "user", "content": prefix + "file_a", "timestamp": "t1"}]
+    messages_b = [{"role": "user", "content": prefix + "file_b", "timestamp": "t1"}]
+    messages_a_crlf = [{"role": "user", "content": prefix + "file_a  \r\n", "timestamp": "t2"}]
+
+    key_a = ResponseCache.fingerprint("model", 0.3, messages_a)
+    assert key_a != ResponseCache.fingerprint("model", 0.3, messages_b)
+    assert key_a != ResponseCache.fingerprint("model", 0.5, messages_a)
+    assert key_a != ResponseCache.fingerprint("other", 0.3, messages_a)
+    assert key_a == ResponseCache.fingerprint("model", 0.3, messages_a_crlf)
+
+
+def test_lru_evicts_by_entries_and_bytes():
+    """测试 LRU 按条目数和字节数淘汰"""
+    cache = LRUCache(max_entries=2, max_bytes=10, ttl=60)
+    cache.set("a", "1234")
+    cache.set("b", "1234")
+    cache.get("a")
+    cache.set("c", "1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1234"
+
+    cache.set("d", "12345678")
+    assert len(cache) == 1
+    assert cache.size_bytes == 8
+
+
+@pytest.mark.asyncio
+async def test_two_tier_lookup(response_cache, redis_client):
+    """测试进程内未命中时回源 Redis 并回填"""
+    assert await response_cache.get("key") is None
+    await response_cache.set("key", "response")
+
+    other = ResponseCache(namespace="test:ai:response", redis_client=redis_client)
+    assert await other.get("key") == "response"
+    assert await other.get("key") == "response"
+
+    stats = other.stats()
+    assert stats["redis_hits"] == 1
+    assert stats["local_hits"] == 1
+    assert response_cache.stats()["misses"] == 1
@@ -2,8 +2,34 @@ import os
 import sys
 from pathlib import Path
 
+import pytest
+
 # 获取项目根目录
 root_dir = Path(__file__).parent.parent
 
 # 将项目根目录添加到 Python 路径
-sys.path.insert(0, str(root_dir)) 
\ No newline at end of file
+sys.path.insert(0, str(root_dir))
+
+from fakeredis.aioredis import FakeRedis  # noqa: E402
+
+from app.infra.cache.redis_client import RedisClient  # noqa: E402
+
+
+@pytest.fixture
+def redis_client():
+    """每个测试独立的 RedisClient，Redis 使用 fakeredis"""
+    client = RedisClient()
+    client.redis = FakeRedis()
+    return client
+
+
+@pytest.fixture
+def isolated_cache(monkeypatch, redis_client):
+    """将模块级共享缓存替换为使用 fakeredis 的独立实例，返回安装函数"""
+
+    def install(module, attr: str, cache_class, namespace: str):
+        cache = cache_class(namespace=namespace, redis_client=redis_client)
+        monkeypatch.setattr(module, attr, cache)
+        return cache
+
+    return install
@@ -0,0 +1,10 @@
+import pytest
+
+from app.infra.cache import http_cache
+from app.infra.cache.http_cache import ConditionalCache
+
+
+@pytest.fixture(autouse=True)
+def conditional_cache(isolated_cache):
+    """每个测试使用独立的条件请求缓存"""
+    return isolated_cache(http_cache, "_conditional_cache", ConditionalCache, "test:git:http")
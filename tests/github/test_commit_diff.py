@@ -0,0 +1,56 @@
+import pytest
+
+from app.infra.git.base import COMPARE_MAX_FILES
+from app.infra.git.github.client import GitHubClient
+from app.infra.git.gitlab.client import GitLabClient
+from benchmarks.fake_github import FakeGitHubServer
+
+
+@pytest.mark.asyncio
+async def test_commit_diff_between_heads():
+    """测试获取两次推送之间的文件变更，强制推送后返回 None"""
+    server = await FakeGitHubServer(files=10, latency=0).start()
+    client = GitHubClient()
+    client.github_api_url = server.base_url
+    server.compare_files = 2
+    try:
+        file_diffs = await client.get_commit_diff("owner", "repo", "a" * 40, "b" * 40)
+        assert [f.new_file_path for f in file_diffs] == ["src/module_0.py", "src/module_1.py"]
+        assert file_diffs[0].diff_content.startswith("@@")
+
+        # 旧 head 不在新 head 的历史中
+        server.compare_status = "diverged"
+        assert await client.get_commit_diff("owner", "repo", "c" * 40, "b" * 40) is None
+    finally:
+        await client.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_gitlab_commit_diff_requires_ancestor(monkeypatch):
+    """测试 GitLab 只在旧 head 是新 head 祖先时直接比较两个提交，否则返回 None"""
+    merge_base = {"id": "a" * 40}
+    diffs = [{"new_path": "src/a.py", "old_path": "src/a.py", "diff": "@@ -1 +1 @@\n-a\n+b"}]
+    requests = []
+
+    async def fake_request(method, url, **kwargs):
+        requests.append(url)
+        if "/merge_base" in url:
+            return merge_base
+        return {"diffs": diffs, "compare_timeout": False}
+
+    client = GitLabClient()
+    monkeypatch.setattr(client, "_request", fake_request)
+
+    file_diffs = await client.get_commit_diff("group", "repo", "a" * 40, "b" * 40)
+    assert [f.new_file_path for f in file_diffs] == ["src/a.py"]
+    assert "straight=true" in requests[-1]
+
+    # 强制推送后合并基点不是旧 head
+    merge_base["id"] = "c" * 40
+    assert await client.get_commit_diff("group", "repo", "a" * 40, "b" * 40) is None
+
+    # 文件数达到上限时结果不完整
+    merge_base["id"] = "a" * 40
+    diffs[:] = diffs * COMPARE_MAX_FILES
+    assert await client.get_commit_diff("group", "repo", "a" * 40, "b" * 40) is None
@@ -0,0 +1,46 @@
+import pytest
+import pytest_asyncio
+
+from app.infra.git.github.client import GitHubClient
+from benchmarks.fake_github import FakeGitHubServer
+
+
+@pytest_asyncio.fixture
+async def github():
+    server = await FakeGitHubServer(files=250, latency=0).start()
+    client = GitHubClient()
+    client.github_api_url = server.base_url
+    yield server, client
+    await client.close()
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_refetch_is_served_from_304(github, conditional_cache):
+    """测试重复获取 PR 时发送条件请求，304 响应使用缓存内容（包括分页信息）"""
+    server, client = github
+    first = await client.get_merge_request("owner", "repo", "1")
+    assert server.not_modified_count == 0
+
+    second = await client.get_merge_request("owner", "repo", "1")
+    # PR 信息 1 次 + 文件 3 页，全部 304
+    assert server.not_modified_count == 4
+    assert [f.new_file_path for f in second.file_diffs] == [
+        f.new_file_path for f in first.file_diffs
+    ]
+    assert len(second.file_diffs) == 250
+
+    stats = conditional_cache.stats()
+    assert stats["not_modified"] == 4
+    assert stats["hit_ratio"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_cache_is_scoped_by_token(github, conditional_cache):
+    """测试不同 token 不共享缓存条目"""
+    server, client = github
+    await client._request("GET", "/repos/owner/repo/pulls/1")
+
+    client.token = "another-token"
+    await client._request("GET", "/repos/owner/repo/pulls/1")
+    assert server.not_modified_count == 0
@@ -0,0 +1,43 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from app.infra.git.github.client import GitHubClient
+
+
+@pytest_asyncio.fixture
+async def github_api():
+    async def handle_pull(request: web.Request) -> web.Response:
+        return web.json_response({"number": int(request.match_info["mr_id"])})
+
+    app = web.Application()
+    app.router.add_get("/repos/{owner}/{repo}/pulls/{mr_id}", handle_pull)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}"
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_requests_reuse_pooled_connection(github_api):
+    """测试多次请求复用同一个长连接，并在关闭后释放"""
+    client = GitHubClient()
+    client.github_api_url = github_api
+
+    for i in range(20):
+        data = await client._request("GET", f"/repos/owner/repo/pulls/{i}")
+        assert data["number"] == i
+
+    stats = client.pool_stats()
+    assert stats["requests"] == 20
+    assert stats["connections_created"] == 1
+    assert stats["connections_reused"] == 19
+    assert stats["idle"] == 1
+
+    session = client._session
+    await client.close()
+    assert session.closed
+    assert "idle" not in client.pool_stats()
@@ -0,0 +1,92 @@
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.infra.git.github.client import GitHubClient
+from app.models.comment import Comment, CommentPosition, CommentType
+from app.models.git import MergeRequest, MergeRequestState
+
+
+def _mr() -> MergeRequest:
+    return MergeRequest(
+        mr_id="7",
+        owner="owner",
+        repo="repo",
+        title="t",
+        author="a",
+        state=MergeRequestState.OPEN,
+        description="",
+        source_branch="feature",
+        target_branch="main",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+        head_sha="abc123",
+    )
+
+
+def _comment(i: int, comment_type: CommentType = CommentType.FILE) -> Comment:
+    return Comment(
+        comment_id=str(i),
+        author="bot",
+        content=f"comment {i}",
+        created_at=datetime.utcnow(),
+        comment_type=comment_type,
+        mr_id="7",
+        position=(
+            CommentPosition(new_file_path=f"f{i}.py", new_line_number=i + 1)
+            if comment_type == CommentType.FILE
+            else None
+        ),
+    )
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = GitHubClient()
+    monkeypatch.setattr("app.infra.git.github.client.settings.GITHUB_REVIEW_MAX_COMMENTS", 50)
+    client._request = AsyncMock(return_value={})
+    return client
+
+
+@pytest.mark.asyncio
+async def test_review_batches_comments_with_summary(client):
+    """测试行内评论按上限拆分为多个审查，总结只随第一个审查提交，且不再查询 head SHA"""
+    comments = [_comment(i) for i in range(120)] + [_comment(999, CommentType.GENERAL)]
+    await client.create_review("owner", "repo", _mr(), comments)
+
+    calls = client._request.await_args_list
+    assert [call.args for call in calls] == [("POST", "/repos/owner/repo/pulls/7/reviews")] * 3
+    payloads = [call.kwargs["json"] for call in calls]
+    assert [len(p["comments"]) for p in payloads] == [50, 50, 20]
+    assert {p["commit_id"] for p in payloads} == {"abc123"}
+    assert payloads[0]["body"] == "comment 999"
+    assert payloads[1]["body"] == payloads[2]["body"] == ""
+    assert payloads[0]["comments"][0] == {
+        "path": "f0.py",
+        "line": 1,
+        "side": "RIGHT",
+        "body": "comment 0",
+    }
+
+
+@pytest.mark.asyncio
+async def test_review_falls_back_to_single_comments(client):
+    """测试审查提交失败时该批评论退回逐条发布"""
+
+    async def request(method, url, **kwargs):
+        if url.endswith("/reviews"):
+            raise RuntimeError("422 line is not part of the diff")
+        return {}
+
+    client._request = AsyncMock(side_effect=request)
+    comments = [_comment(1), _comment(2), _comment(3, CommentType.GENERAL)]
+    await client.create_review("owner", "repo", _mr(), comments)
+
+    urls = [call.args[1] for call in client._request.await_args_list]
+    assert urls == [
+        "/repos/owner/repo/pulls/7/reviews",
+        "/repos/owner/repo/pulls/7/comments",
+        "/repos/owner/repo/pulls/7/comments",
+        "/repos/owner/repo/issues/7/comments",
+    ]
@@ -0,0 +1,176 @@
+import pytest
+import pytest_asyncio
+
+from app.infra.git.github.client import GitHubClient
+from app.infra.git.github import graphql_client
+from app.infra.git.github.graphql_client import GitHubGraphQLClient, parse_unified_diff
+from benchmarks.fake_github import FakeGitHubServer
+
+DIFF = """diff --git a/app/a.py b/app/a.py
+index 1111111..2222222 100644
+--- a/app/a.py
++++ b/app/a.py
+@@ -1,2 +1,2 @@
+ keep
+--- a/not/a/header
++new
+\\ No newline at end of file
+diff --git a/old name.py b/new name.py
+similarity index 90%
+rename from old name.py
+rename to new name.py
+--- a/old name.py
++++ b/new name.py
+@@ -3 +3 @@
+-x
++y
+diff --git a/gone.py b/gone.py
+deleted file mode 100644
+--- a/gone.py
++++ /dev/null
+@@ -1 +0,0 @@
+-bye
+diff --git a/logo.png b/logo.png
+Binary files a/logo.png and b/logo.png differ
+"""
+
+
+def test_parse_unified_diff():
+    """测试按文件拆分 diff，处理重命名、删除、二进制文件和 hunk 内类似头部的行"""
+    patches, renames = parse_unified_diff(DIFF)
+    assert patches == {
+        "app/a.py": "@@ -1,2 +1,2 @@\n keep\n--- a/not/a/header\n+new\n\\ No newline at end of file",
+        "new name.py": "@@ -3 +3 @@\n-x\n+y",
+        "gone.py": "@@ -1 +0,0 @@\n-bye",
+        "logo.png": "",
+    }
+    assert renames == {"new name.py": "old name.py"}
+
+
+async def _clients(server):
+    rest = GitHubClient()
+    graphql = GitHubGraphQLClient()
+    for client in (rest, graphql):
+        client.github_api_url = server.base_url
+    graphql.graphql_url = f"{server.base_url}/graphql"
+    return rest, graphql
+
+
+@pytest_asyncio.fixture
+async def server():
+    server = await FakeGitHubServer(files=250, comments=70, latency=0).start()
+    yield server
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_graphql_snapshot_matches_rest(server):
+    """测试 GraphQL 快照与 REST 接口映射出的模型一致"""
+    rest, graphql = await _clients(server)
+    try:
+        rest_mr = await rest.get_merge_request("owner", "repo", "1")
+        graphql_mr = await graphql.get_merge_request("owner", "repo", "1")
+        assert graphql_mr.head_sha == rest_mr.head_sha
+        assert [(f.new_file_path, f.change_type, f.diff_content) for f in graphql_mr.file_diffs] == [
+            (f.new_file_path, f.change_type, f.diff_content) for f in rest_mr.file_diffs
+        ]
+
+        rest_comments = await rest.list_comments("owner", "repo", rest_mr)
+        graphql_comments = await graphql.list_comments("owner", "repo", graphql_mr)
+        assert [(c.comment_id, c.comment_type, c.position) for c in graphql_comments] == [
+            (c.comment_id, c.comment_type, c.position) for c in rest_comments
+        ]
+    finally:
+        await rest.close()
+        await graphql.close()
+
+
+@pytest.mark.asyncio
+async def test_comment_reply_reads_share_one_snapshot():
+    """测试一次评论回复的全部读取只发起一次 GraphQL 查询（并发获取 diff）"""
+    server = await FakeGitHubServer(files=80, comments=30, latency=0).start()
+    _, graphql = await _clients(server)
+    try:
+        mr = await graphql.get_merge_request("owner", "repo", "1")
+        comment = await graphql.get_comment("owner", "repo", mr, "5")
+        await graphql.get_merge_request("owner", "repo", "1")
+        await graphql.list_comments("owner", "repo", mr)
+
+        assert comment.content == "comment 5"
+        assert server.request_count == 2
+
+        # 返回副本，调用方修改不影响快照
+        mr.file_diffs = []
+        assert len((await graphql.get_merge_request("owner", "repo", "1")).file_diffs) == 80
+    finally:
+        await graphql.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_long_review_thread_is_paginated(monkeypatch):
+    """测试超过一页评论的 review 线程继续分页获取，重命名文件保留旧路径"""
+    comments = [
+        {
+            "databaseId": i,
+            "body": f"comment {i}",
+            "createdAt": "2024-01-01T00:00:00Z",
+            "updatedAt": "2024-01-01T00:00:00Z",
+            "path": "new name.py",
+            "line": 3,
+            "originalLine": 3,
+            "author": {"login": "user"},
+            "replyTo": {"databaseId": 1} if i > 1 else None,
+        }
+        for i in range(1, 251)
+    ]
+
+    def page(start):
+        end = start + 100
+        return {
+            "pageInfo": {"hasNextPage": end < len(comments), "endCursor": str(end)},
+            "nodes": comments[start:end],
+        }
+
+    async def fake_graphql(query, variables):
+        if query == graphql_client._THREAD_COMMENTS_QUERY:
+            assert variables["id"] == "thread_1"
+            return {"node": {"comments": page(int(variables["cursor"]))}}
+        no_more = {"hasNextPage": False, "endCursor": None}
+        return {
+            "repository": {
+                "pullRequest": {
+                    "number": 1,
+                    "title": "PR",
+                    "body": "",
+                    "state": "OPEN",
+                    "headRefName": "feature",
+                    "baseRefName": "main",
+                    "headRefOid": "head",
+                    "createdAt": "2024-01-01T00:00:00Z",
+                    "updatedAt": "2024-01-01T00:00:00Z",
+                    "author": {"login": "user"},
+                    "labels": {"nodes": []},
+                    "reviewRequests": {"nodes": []},
+                    "comments": {"totalCount": 0},
+                    "files": {"pageInfo": no_more, "nodes": [{"path": "new name.py", "changeType": "RENAMED"}]},
+                    "reviewThreads": {"pageInfo": no_more, "nodes": [{"id": "thread_1", "comments": page(0)}]},
+                }
+            }
+        }
+
+    async def fake_diff(owner, repo, mr_id):
+        return parse_unified_diff(DIFF)
+
+    graphql = GitHubGraphQLClient()
+    monkeypatch.setattr(graphql, "_graphql", fake_graphql)
+    monkeypatch.setattr(graphql, "_get_diff_patches", fake_diff)
+    try:
+        mr = await graphql.get_merge_request("owner", "repo", "1")
+        assert mr.file_diffs[0].old_file_path == "old name.py"
+        assert mr.file_diffs[0].diff_content == "@@ -3 +3 @@\n-x\n+y"
+
+        listed = await graphql.list_comments("owner", "repo", mr)
+        assert [c.comment_id for c in listed] == [str(i) for i in range(1, 251)]
+    finally:
+        await graphql.close()
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+
+from app.infra.git.base import _last_page
+from app.infra.git.github.client import GitHubClient
+from app.models.git import MergeRequest, MergeRequestState
+from benchmarks.fake_github import FakeGitHubServer
+
+
+@pytest_asyncio.fixture
+async def github():
+    server = await FakeGitHubServer(files=250, comments=130, latency=0.01).start()
+    client = GitHubClient()
+    client.github_api_url = server.base_url
+    yield server, client
+    await client.close()
+    await server.stop()
+
+
+def test_last_page_from_headers():
+    """测试从 GitLab 和 GitHub 的分页响应头读取总页数"""
+    assert _last_page({"X-Total-Pages": "7"}) == 7
+    link = (
+        '<https://api.github.com/repos/o/r/pulls/1/files?per_page=100&page=2>; rel="next", '
+        '<https://api.github.com/repos/o/r/pulls/1/files?per_page=100&page=30>; rel="last"'
+    )
+    assert _last_page({"Link": link}) == 30
+    assert _last_page({}) is None
+
+
+@pytest.mark.asyncio
+async def test_get_merge_request_fetches_all_file_pages(github):
+    """测试 PR 文件超过一页时获取全部文件并保持顺序"""
+    server, client = github
+    mr = await client.get_merge_request("owner", "repo", "1")
+
+    assert len(mr.file_diffs) == 250
+    assert [f.new_file_path for f in mr.file_diffs] == [f"src/module_{i}.py" for i in range(250)]
+    assert mr.head_sha == "0" * 40
+    # PR 信息 1 次 + 文件 3 页
+    assert server.request_count == 4
+
+
+@pytest.mark.asyncio
+async def test_list_comments_fetches_all_pages(github):
+    """测试评论列表获取全部分页"""
+    _, client = github
+    mr = MergeRequest(
+        mr_id="1",
+        owner="owner",
+        repo="repo",
+        title="t",
+        author="a",
+        state=MergeRequestState.OPEN,
+        description="",
+        source_branch="feature",
+        target_branch="main",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    )
+    comments = await client.list_comments("owner", "repo", mr)
+    assert [c.comment_id for c in comments] == [str(i) for i in range(130)]
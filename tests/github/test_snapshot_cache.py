@@ -0,0 +1,47 @@
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+from app.infra.cache.redis_client import RedisClient
+from app.infra.cache.snapshot_cache import SnapshotCache
+from app.infra.git.cached_client import CachedGitClient
+from app.infra.git.github.client import GitHubClient
+from benchmarks.fake_github import FakeGitHubServer
+
+
+def _worker(server, redis):
+    """模拟一个 worker：独立的客户端和进程内缓存，共享 Redis"""
+    redis_client = RedisClient()
+    redis_client.redis = redis
+    client = GitHubClient()
+    client.github_api_url = server.base_url
+    return CachedGitClient(client, SnapshotCache(namespace="test:git:snapshot", redis_client=redis_client))
+
+
+@pytest.mark.asyncio
+async def test_snapshot_shared_across_services_and_workers():
+    """测试同一 head 的 MR 只下载一次，push 后失效"""
+    server = await FakeGitHubServer(files=150, latency=0).start()
+    redis = FakeRedis()
+    first, second = _worker(server, redis), _worker(server, redis)
+    try:
+        mr = await first.get_merge_request("owner", "repo", "1")
+        downloads = server.request_count
+        assert len(mr.file_diffs) == 150
+
+        # 同一请求中的其他服务、其他 worker 都复用快照
+        mr.file_diffs = []
+        assert len((await first.get_merge_request("owner", "repo", "1")).file_diffs) == 150
+        cached = await second.get_merge_request("owner", "repo", "1")
+        assert cached.head_sha == mr.head_sha
+        assert len(cached.file_diffs) == 150
+        assert server.request_count == downloads
+        assert second.cache.stats()["hits"] == 1
+
+        # 任一 worker 收到 push webhook 后，所有 worker 重新获取
+        await second.invalidate("owner", "repo", "1")
+        await first.get_merge_request("owner", "repo", "1")
+        assert server.request_count > downloads
+    finally:
+        await first.close()
+        await second.close()
+        await server.stop()
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+from app.infra.config.settings import get_settings
+from app.infra.debouncer import MergeRequestDebouncer
+from app.infra.git.base_webhook_handler import MergeRequestEvent
+from app.infra.job_queue import JobQueue
+
+
+@pytest.fixture
+def quiet_period(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "MR_DEBOUNCE_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "MR_DEBOUNCE_MAX_WAIT", 1.0)
+
+
+def _event(mr_id: str, head_sha: str) -> MergeRequestEvent:
+    return MergeRequestEvent(owner="o", repo="r", mr_id=mr_id, head_sha=head_sha)
+
+
+@pytest.mark.asyncio
+async def test_local_burst_runs_once_with_latest_head(quiet_period):
+    """测试进程内模式下同一 MR 的连续事件只审查一次，且使用最新 head"""
+    debouncer = MergeRequestDebouncer(use_queue=False)
+    reviewed = []
+
+    async def runner(event):
+        reviewed.append((event.mr_id, event.head_sha))
+
+    results = []
+    for i in range(5):
+        results.append(await debouncer.submit(_event("1", f"sha{i}"), runner))
+        await asyncio.sleep(0.01)
+    await debouncer.submit(_event("2", "other"), runner)
+    await asyncio.sleep(0.2)
+
+    assert results == [False, True, True, True, True]
+    assert sorted(reviewed) == [("1", "sha4"), ("2", "other")]
+    assert debouncer.stats()["coalesced"] == 4
+
+
+@pytest.mark.asyncio
+async def test_queue_mode_flushes_one_job_after_quiet_period(quiet_period):
+    """测试任务队列模式下静默期结束后只投递一个审查任务"""
+    queue = JobQueue(stream="test:jobs", group="test", redis=FakeRedis())
+    debouncer = MergeRequestDebouncer(queue=queue, use_queue=True)
+
+    for i in range(3):
+        await debouncer.submit(_event("1", f"sha{i}"))
+    assert await debouncer.flush_due() == 0
+
+    await asyncio.sleep(0.1)
+    assert await debouncer.flush_due() == 1
+    jobs = await queue.read("worker", 10, 10)
+    assert [job.payload for job in jobs] == [
+        {"owner": "o", "repo": "r", "mr_id": "1", "head_sha": "sha2", "incremental": False}
+    ]
+
+    # 合并状态已清理，新的推送重新开始计时
+    assert await debouncer.submit(_event("1", "sha3")) is False
@@ -0,0 +1,73 @@
+import pytest
+from fakeredis.aioredis import FakeRedis
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import webhook
+from app.infra.cache import idempotency
+from app.infra.cache.idempotency import DeliveryDeduplicator
+from app.infra.cache.redis_client import RedisClient
+from app.infra.config.settings import get_settings
+
+
+@pytest.fixture
+def deduplicator(monkeypatch):
+    redis_client = RedisClient()
+    redis_client.redis = FakeRedis()
+    deduplicator = DeliveryDeduplicator(namespace="test:webhook", redis_client=redis_client)
+    monkeypatch.setattr(idempotency, "_deduplicator", deduplicator)
+    return deduplicator
+
+
+def _count_round_trips(redis):
+    calls = []
+    execute_command = redis.execute_command
+
+    async def counting(*args, **kwargs):
+        calls.append(args[0])
+        return await execute_command(*args, **kwargs)
+
+    redis.execute_command = counting
+    return calls
+
+
+def test_delivery_key_prefers_platform_id(deduplicator):
+    """测试优先使用平台投递 ID，没有时使用请求体哈希"""
+    assert deduplicator.key("github", {"X-GitHub-Delivery": "abc"}, b"{}") == "test:webhook:github:abc"
+    assert deduplicator.key("gitlab", {"Idempotency-Key": "k", "X-Gitlab-Event-UUID": "u"}, b"{}") == "test:webhook:gitlab:k"
+    assert deduplicator.key("gitlab", {}, b"{}") == deduplicator.key("gitlab", {}, b"{}")
+    assert deduplicator.key("gitlab", {}, b"{}") != deduplicator.key("gitlab", {}, b"{ }")
+
+
+@pytest.mark.asyncio
+async def test_duplicates_cost_at_most_one_round_trip(deduplicator):
+    """测试重复投递最多一次 Redis 往返，其他 worker 的记录同样生效"""
+    calls = _count_round_trips(deduplicator.redis_client.redis)
+    assert not await deduplicator.is_duplicate("test:webhook:github:1")
+    assert await deduplicator.is_duplicate("test:webhook:github:1")
+    assert calls == ["SET"]
+
+    other_worker = DeliveryDeduplicator(namespace="test:webhook", redis_client=deduplicator.redis_client)
+    calls.clear()
+    assert await other_worker.is_duplicate("test:webhook:github:1")
+    assert calls == ["SET"]
+
+    await deduplicator.forget("test:webhook:github:1")
+    assert not await deduplicator.is_duplicate("test:webhook:github:1")
+
+
+def test_retried_delivery_is_ignored(deduplicator, monkeypatch):
+    """测试平台重试同一投递时直接忽略"""
+    monkeypatch.setattr(get_settings(), "GITLAB_WEBHOOK_SECRET", "secret")
+    monkeypatch.setattr(get_settings(), "GITLAB_REPOS", "owner/repo")
+    app = FastAPI()
+    app.include_router(webhook.router)
+    client = TestClient(app)
+    headers = {"X-Gitlab-Token": "secret", "X-Gitlab-Event": "System Hook", "Idempotency-Key": "delivery-1"}
+    payload = {"event_type": "project_create", "project": {"path_with_namespace": "owner/repo"}}
+
+    first = client.post("/webhook/gitlab", json=payload, headers=headers)
+    second = client.post("/webhook/gitlab", json=payload, headers=headers)
+    assert first.json()["event"] == "ping"
+    assert second.json() == {"message": "Duplicate delivery ignored"}
+    assert deduplicator.stats()["duplicates"] == 1
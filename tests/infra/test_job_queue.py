@@ -0,0 +1,119 @@
+import asyncio
+
+import aiohttp
+import pytest
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+from fakeredis.aioredis import FakeRedis
+
+from app.infra.config.settings import get_settings
+from app.infra.job_queue import JobKind, JobQueue
+from app.services.reviewer_service import ReviewSkipped
+from app.worker import ReviewWorker
+
+
+class FakeReviewerService:
+    def __init__(self, failures: int = 0, error: Exception = RuntimeError("upstream error")):
+        self.failures = failures
+        self.error = error
+        self.calls = []
+
+    async def review_mr(self, owner, repo, mr_id, check_limit=True, head_sha=None):
+        self.calls.append(("review_mr", mr_id, check_limit))
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+
+    async def handle_comment(self, owner, repo, mr_id, comment_id):
+        self.calls.append(("handle_comment", mr_id, comment_id))
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_DELAY", 0.0)
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 3)
+    return JobQueue(stream="test:jobs", group="test", redis=FakeRedis())
+
+
+async def _drain(worker: ReviewWorker, rounds: int = 5):
+    for _ in range(rounds):
+        await worker.poll()
+        if worker.tasks:
+            await asyncio.gather(*worker.tasks.values())
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_executed_and_acked(queue):
+    """测试任务执行成功后确认并从队列删除"""
+    service = FakeReviewerService()
+    worker = ReviewWorker(queue=queue, reviewer_service=service, concurrency=2, block_ms=10)
+    await queue.enqueue(JobKind.REVIEW_MR, {"owner": "o", "repo": "r", "mr_id": "1"})
+    await queue.enqueue(JobKind.HANDLE_COMMENT, {"owner": "o", "repo": "r", "mr_id": "1", "comment_id": "9"})
+    await queue.enqueue(JobKind.REVIEW_MR, {"owner": "o", "repo": "r", "mr_id": "2", "check_limit": False})
+
+    await _drain(worker)
+
+    assert sorted(service.calls) == [
+        ("handle_comment", "1", "9"),
+        ("review_mr", "1", True),
+        ("review_mr", "2", False),
+    ]
+    assert await queue.stats() == {"queued": 0, "pending": 0, "retrying": 0, "dead": 0}
+
+
+@pytest.mark.asyncio
+async def test_failed_jobs_retry_then_dead_letter(queue):
+    """测试失败任务退避重试，超过最大次数转入死信 stream"""
+    recovering = FakeReviewerService(failures=1)
+    worker = ReviewWorker(queue=queue, reviewer_service=recovering, block_ms=10)
+    await queue.enqueue(JobKind.REVIEW_MR, {"owner": "o", "repo": "r", "mr_id": "1"})
+    await _drain(worker)
+    assert len(recovering.calls) == 2
+    assert (await queue.stats())["dead"] == 0
+
+    broken = FakeReviewerService(failures=10)
+    worker = ReviewWorker(queue=queue, reviewer_service=broken, block_ms=10)
+    await queue.enqueue(JobKind.REVIEW_MR, {"owner": "o", "repo": "r", "mr_id": "2"})
+    await _drain(worker)
+    assert len(broken.calls) == 3
+    assert await queue.stats() == {"queued": 0, "pending": 0, "retrying": 0, "dead": 1}
+    dead = await queue.redis.xrange(queue.dead_key)
+    assert dead[0][1][b"error"] == b"RuntimeError: upstream error"
+
+
+@pytest.mark.asyncio
+async def test_permanent_failures_are_not_retried(queue):
+    """测试达到审查次数限制的任务直接确认，MR 不存在的任务直接转入死信 stream"""
+    skipped = FakeReviewerService(failures=10, error=ReviewSkipped("limit"))
+    worker = ReviewWorker(queue=queue, reviewer_service=skipped, block_ms=10)
+    await queue.enqueue(JobKind.REVIEW_MR, {"owner": "o", "repo": "r", "mr_id": "1"})
+    await _drain(worker)
+    assert len(skipped.calls) == 1
+    assert await queue.stats() == {"queued": 0, "pending": 0, "retrying": 0, "dead": 0}
+
+    request_info = aiohttp.RequestInfo(URL("https://api.github.com/repos/o/r/pulls/2"), "GET", CIMultiDictProxy(CIMultiDict()))
+    not_found = aiohttp.ClientResponseError(request_info, (), status=404, message="Not Found")
+    missing = FakeReviewerService(failures=10, error=not_found)
+    worker = ReviewWorker(queue=queue, reviewer_service=missing, block_ms=10)
+    await queue.enqueue(JobKind.REVIEW_MR, {"owner": "o", "repo": "r", "mr_id": "2"})
+    await _drain(worker)
+    assert len(missing.calls) == 1
+    assert await queue.stats() == {"queued": 0, "pending": 0, "retrying": 0, "dead": 1}
+
+
+@pytest.mark.asyncio
+async def test_stale_jobs_are_claimed(queue, monkeypatch):
+    """测试崩溃 worker 未确认的任务被其他 worker 接管"""
+    await queue.enqueue(JobKind.REVIEW_MR, {"owner": "o", "repo": "r", "mr_id": "1"})
+    assert len(await queue.read("crashed", 10, 10)) == 1
+
+    service = FakeReviewerService()
+    worker = ReviewWorker(queue=queue, reviewer_service=service, block_ms=10)
+    await _drain(worker)
+    assert service.calls == []
+
+    monkeypatch.setattr(get_settings(), "JOB_VISIBILITY_TIMEOUT", 0)
+    await _drain(worker)
+    assert service.calls == [("review_mr", "1", True)]
+    assert (await queue.stats())["pending"] == 0
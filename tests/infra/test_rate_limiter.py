@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+from app.infra.rate_limiter import RateLimiter, ReviewAdmission
+
+
+@pytest.fixture
+def rate_limiter():
+    return RateLimiter(redis=FakeRedis())
+
+
+@pytest.mark.asyncio
+async def test_concurrent_checks_never_over_admit(rate_limiter):
+    """测试并发检查时放行数严格等于上限"""
+    results = await asyncio.gather(
+        *[rate_limiter.check_and_increment("test:limit", 10) for _ in range(50)]
+    )
+    assert sum(results) == 10
+    assert await rate_limiter.get_remaining("test:limit", 10) == 0
+
+
+@pytest.mark.asyncio
+async def test_weighted_cost(rate_limiter):
+    """测试按消耗扣减配额，超过剩余配额时拒绝且不扣减"""
+    assert await rate_limiter.check_and_increment("test:cost", 10, cost=7)
+    assert not await rate_limiter.check_and_increment("test:cost", 10, cost=5)
+    assert await rate_limiter.check_and_increment("test:cost", 10, cost=3)
+    assert await rate_limiter.get_remaining("test:cost", 10) == 0
+
+
+@pytest.mark.asyncio
+async def test_tokens_refill_over_time(rate_limiter):
+    """测试令牌按时间匀速恢复，而不是在整点一次性重置"""
+    rate_limiter.settings = rate_limiter.settings.model_copy(update={"RATE_LIMIT_EXPIRE": 1})
+    for _ in range(4):
+        assert await rate_limiter.check_and_increment("test:refill", 4)
+    assert not await rate_limiter.check_and_increment("test:refill", 4)
+
+    await asyncio.sleep(0.3)
+    assert await rate_limiter.check_and_increment("test:refill", 4)
+    assert not await rate_limiter.check_and_increment("test:refill", 4)
+
+
+@pytest.mark.asyncio
+async def test_replaces_legacy_counter_key(rate_limiter):
+    """测试旧版固定窗口计数器键被替换为令牌桶"""
+    await rate_limiter.redis.set("test:legacy", 3, ex=60)
+    assert await rate_limiter.check_and_increment("test:legacy", 5)
+    assert await rate_limiter.get_remaining("test:legacy", 5) == 4
+
+
+@pytest.mark.asyncio
+async def test_reserved_budget(rate_limiter):
+    """测试预留额度只能由不带预留的请求使用"""
+    assert await rate_limiter.check_and_increment("test:reserve", 10, cost=6, reserve=3)
+    assert not await rate_limiter.check_and_increment("test:reserve", 10, cost=2, reserve=3)
+    assert await rate_limiter.check_and_increment("test:reserve", 10, cost=4)
+    assert await rate_limiter.get_remaining("test:reserve", 10) == 0
+
+
+class CountingRedis(FakeRedis):
+    """统计发往 Redis 的命令数"""
+
+    commands = 0
+
+    async def execute_command(self, *args, **kwargs):
+        self.commands += 1
+        return await super().execute_command(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_begin_review_single_round_trip():
+    """测试审查准入检查只访问一次 Redis，并按顺序返回 MR 上限和每小时上限"""
+    rate_limiter = RateLimiter(redis=CountingRedis())
+    rate_limiter.settings = rate_limiter.settings.model_copy(
+        update={"MAX_MR_REVIEWS": 2, "MAX_MR_REVIEWS_PER_HOUR": 3}
+    )
+
+    # 首次调用需要加载脚本，之后每次只有一条 EVALSHA
+    assert await rate_limiter.begin_review("o", "r", "1") == ReviewAdmission.ALLOWED
+    rate_limiter.redis.commands = 0
+    assert await rate_limiter.begin_review("o", "r", "1") == ReviewAdmission.ALLOWED
+    assert rate_limiter.redis.commands == 1
+
+    assert await rate_limiter.begin_review("o", "r", "1") == ReviewAdmission.MR_LIMIT
+    # 不检查 MR 审查次数时仍受每小时上限约束
+    assert await rate_limiter.begin_review("o", "r", "1", check_limit=False) == ReviewAdmission.ALLOWED
+    assert await rate_limiter.begin_review("o", "r", "2") == ReviewAdmission.HOURLY_LIMIT
+
+
+@pytest.mark.asyncio
+async def test_cancel_review(rate_limiter):
+    """测试撤销审查后审查次数恢复"""
+    rate_limiter.settings = rate_limiter.settings.model_copy(update={"MAX_MR_REVIEWS": 1})
+    assert await rate_limiter.begin_review("o", "r", "1") == ReviewAdmission.ALLOWED
+    assert await rate_limiter.begin_review("o", "r", "1") == ReviewAdmission.MR_LIMIT
+    await rate_limiter.cancel_review("o", "r", "1")
+    assert await rate_limiter.begin_review("o", "r", "1") == ReviewAdmission.ALLOWED
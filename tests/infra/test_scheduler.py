@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.infra.scheduler import JobClass, ReviewScheduler, current_job_class
+
+
+async def _run_all(scheduler, jobs):
+    """先占满执行槽，再提交 jobs，返回执行顺序"""
+    order = []
+    gate = asyncio.Event()
+
+    async def blocker():
+        await gate.wait()
+
+    async def record(name):
+        order.append((name, current_job_class.get()))
+
+    blocking = asyncio.ensure_future(scheduler.run(JobClass.FULL, "blocker", blocker))
+    await asyncio.sleep(0)
+    tasks = []
+    for name, job_class, repo in jobs:
+        tasks.append(asyncio.ensure_future(scheduler.run(job_class, repo, lambda name=name: record(name))))
+        await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(blocking, *tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_replies_run_before_reviews():
+    """测试评论回复优先于增量审查，增量审查优先于全量审查"""
+    scheduler = ReviewScheduler(concurrency=1, class_limits={})
+    order = await _run_all(
+        scheduler,
+        [
+            ("full", JobClass.FULL, "o/a"),
+            ("incremental", JobClass.INCREMENTAL, "o/a"),
+            ("reply", JobClass.REPLY, "o/a"),
+        ],
+    )
+    assert order == [
+        ("reply", JobClass.REPLY),
+        ("incremental", JobClass.INCREMENTAL),
+        ("full", JobClass.FULL),
+    ]
+    stats = scheduler.stats()
+    assert stats["reply"]["completed"] == 1
+    assert stats["full"]["wait_max"] >= stats["reply"]["wait_max"]
+
+
+@pytest.mark.asyncio
+async def test_busy_repo_does_not_starve_others():
+    """测试同一优先级内按仓库公平排队，权重高的仓库获得更多执行机会"""
+    scheduler = ReviewScheduler(concurrency=1, class_limits={})
+    jobs = [(f"a{i}", JobClass.FULL, "o/busy") for i in range(5)]
+    jobs += [(f"b{i}", JobClass.FULL, "o/quiet") for i in range(2)]
+    order = [name for name, _ in await _run_all(scheduler, jobs)]
+    assert order == ["a0", "b0", "a1", "b1", "a2", "a3", "a4"]
+
+    scheduler = ReviewScheduler(concurrency=1, class_limits={}, repo_weights={"o/quiet": 2})
+    order = [name for name, _ in await _run_all(scheduler, jobs)]
+    assert order.index("b1") < order.index("a1")
+
+
+@pytest.mark.asyncio
+async def test_class_concurrency_limit():
+    """测试全量审查不会占满所有执行槽"""
+    scheduler = ReviewScheduler(concurrency=3, class_limits={"full": 2})
+    gate = asyncio.Event()
+    tasks = [
+        asyncio.ensure_future(scheduler.run(JobClass.FULL, "o/a", gate.wait)) for _ in range(4)
+    ]
+    await asyncio.sleep(0)
+    stats = scheduler.stats()["full"]
+    assert (stats["running"], stats["queued"]) == (2, 2)
+
+    replied = await scheduler.run(JobClass.REPLY, "o/a", lambda: asyncio.sleep(0, result="done"))
+    assert replied == "done"
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert scheduler.running == 0
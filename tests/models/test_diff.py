@@ -0,0 +1,58 @@
+from app.models.diff import DiffIndex, LineOp
+from app.models.git import ChangeType, FileDiff
+
+PATCH = "\n".join(
+    [
+        "@@ -10,4 +10,5 @@ def f():",
+        " a",
+        "-b",
+        "+B",
+        "+C",
+        "",
+        " d",
+        "\\ No newline at end of file",
+        "@@ -40,2 +41,3 @@",
+        " x",
+        "+y",
+        " z",
+    ]
+)
+
+
+def test_parse_hunks():
+    """测试解析 hunk 的行号、操作码和行内容"""
+    index = DiffIndex(PATCH)
+    assert index.line_count == PATCH.count("\n") + 1
+    assert list(index.new_side) == [10, 11, 12, 13, 14, 41, 42, 43]
+    assert (index.additions, index.deletions) == (3, 1)
+    assert [index.hunk_new_range(i) for i in range(2)] == [(10, 15), (41, 44)]
+    assert list(index.hunk_old_starts) == [10, 40]
+    assert [index.hunk_lines(i) for i in range(2)] == [(0, 6), (6, 9)]
+    assert [index.hunk_section(i) for i in range(2)] == ["def f():", ""]
+
+    deleted = index.ops.index(LineOp.DELETE)
+    assert index.old_lines[deleted] == 11
+    assert index.line(deleted) == "b"
+    assert index.line(index.find_new_line(12)) == "C"
+
+
+def test_new_line_lookups():
+    """测试按新行号查找行、hunk 和最近的可评论行"""
+    index = DiffIndex(PATCH)
+    assert index.is_added(11) and not index.is_added(10)
+    assert index.contains_new_line(14)
+    assert not index.contains_new_line(20)
+    assert index.hunk_for_new_line(42) == 1
+    assert index.hunk_for_new_line(30) == -1
+    assert index.nearest_new_line(30) == 41
+    assert index.nearest_new_line(1) == 10
+
+
+def test_file_diff_index_cached():
+    """测试同一 diff 只解析一次，内容变化后重新解析"""
+    file_diff = FileDiff(new_file_path="f.py", change_type=ChangeType.MODIFY, diff_content=PATCH)
+    assert file_diff.index() is file_diff.index()
+    assert file_diff.line_count == PATCH.count("\n") + 1
+
+    file_diff.diff_content = "@@ -1 +1 @@\n+only"
+    assert list(file_diff.index().new_side) == [1]
@@ -0,0 +1,10 @@
+import pytest
+
+from app.infra.cache import file_review_cache
+from app.infra.cache.file_review_cache import FileReviewCache
+
+
+@pytest.fixture(autouse=True)
+def file_review_results(isolated_cache):
+    """每个测试使用独立的文件审查结果缓存"""
+    return isolated_cache(file_review_cache, "_file_review_cache", FileReviewCache, "test:review:file")
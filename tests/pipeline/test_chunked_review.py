@@ -0,0 +1,117 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app.infra.ai.tokenizer import HeuristicTokenizer
+from app.models.git import ChangeType, FileDiff, MergeRequest, MergeRequestState
+from app.models.pipeline import code_review
+from app.models.pipeline.base import AIReviewComment
+from app.models.pipeline.chunking import dedupe_comments, pack_file_diffs
+
+
+def _file_diff(path: str, lines: int) -> FileDiff:
+    return FileDiff(
+        new_file_path=path,
+        old_file_path=path,
+        change_type=ChangeType.MODIFY,
+        diff_content="\n".join([f"@@ -0,0 +1,{lines} @@"] + [f"+line {i}" for i in range(lines)]),
+    )
+
+
+@pytest.fixture
+def large_mr():
+    return MergeRequest(
+        mr_id="1",
+        owner="test-owner",
+        repo="test-repo",
+        title="Large PR",
+        author="test-user",
+        state=MergeRequestState.OPEN,
+        description="Test description",
+        source_branch="feature",
+        target_branch="main",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+        file_diffs=[_file_diff(f"src/file_{i}.py", 50) for i in range(12)],
+    )
+
+
+class FakeAIClient:
+    """按请求中的文件路径返回评论的假 AI 客户端"""
+
+    def __init__(self, latency: float = 0.05):
+        self.tokenizer = HeuristicTokenizer()
+        self.latency = latency
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    def _count_tokens(self, text: str) -> int:
+        return self.tokenizer.count(text)
+
+    @staticmethod
+    def generate_session_id() -> str:
+        return "session"
+
+    async def chat(self, messages, session_id=None, **kwargs) -> str:
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.latency)
+        self.active -= 1
+
+        prompt = messages[-1].content
+        if "file_new_path" not in prompt:
+            return "merged summary"
+        paths = [line.split(": ", 1)[1] for line in prompt.splitlines() if line.startswith("file_new_path")]
+        comments = [
+            {"new_file_path": path, "new_line_number": 1, "content": "Check this", "type": "issue"}
+            for path in paths
+        ]
+        # 每个分块都报告同一个全局问题，合并时应去重
+        comments.append({"new_file_path": "src/file_0.py", "new_line_number": 1, "content": "check  THIS", "type": "issue"})
+        return json.dumps({"summary": f"chunk of {len(paths)}", "comments": comments})
+
+
+def test_pack_file_diffs_respects_budget():
+    """测试装箱不超过预算且不丢文件"""
+    files = [_file_diff(f"f{i}.py", n) for i, n in enumerate([10, 200, 40, 90, 5, 150])]
+    tokenizer = HeuristicTokenizer()
+    chunks = pack_file_diffs(files, 1000, tokenizer)
+
+    packed = [f.new_file_path for chunk in chunks for f in chunk]
+    assert sorted(packed) == sorted(f.new_file_path for f in files)
+    for chunk in chunks:
+        assert len(chunk) == 1 or sum(f.token_count(tokenizer) for f in chunk) <= 1000
+
+
+def test_dedupe_comments():
+    """测试评论按文件、行号和归一化内容去重"""
+    comments = [
+        AIReviewComment(new_file_path="a.py", new_line_number=3, content="Fix  this"),
+        AIReviewComment(new_file_path="a.py", new_line_number=3, content="fix this"),
+        AIReviewComment(new_file_path="a.py", new_line_number=4, content="fix this"),
+    ]
+    assert len(dedupe_comments(comments)) == 2
+
+
+@pytest.mark.asyncio
+async def test_chunked_review(monkeypatch, large_mr):
+    """测试分块并发审查、并发上限和合并"""
+    fake_client = FakeAIClient()
+    monkeypatch.setattr(code_review, "get_ai_client", lambda: fake_client)
+    monkeypatch.setattr(code_review.settings, "ENABLE_CHUNKED_REVIEW", True)
+    monkeypatch.setattr(code_review.settings, "REVIEW_CHUNK_MAX_TOKENS", 1500)
+    monkeypatch.setattr(code_review.settings, "REVIEW_CHUNK_CONCURRENCY", 2)
+
+    result = await code_review.CodeReviewPipeline().review(large_mr)
+
+    chunk_calls = fake_client.calls - 1  # 最后一次为合并总结
+    assert chunk_calls > 1
+    assert fake_client.max_active <= 2
+    assert result.summary == "merged summary"
+    assert sorted(c.position.new_file_path for c in result.comments) == sorted(
+        f.new_file_path for f in large_mr.file_diffs
+    )
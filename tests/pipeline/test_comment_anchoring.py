@@ -0,0 +1,165 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app.infra.git.gitlab.client import GitLabClient
+from app.models.git import ChangeType, FileDiff, MergeRequest, MergeRequestState
+from app.models.pipeline import code_review
+from app.models.pipeline.anchoring import CommentAnchorer
+from app.models.pipeline.base import AIReviewComment, ReviewPipeline
+
+PATCH = "\n".join(
+    [
+        "@@ -20,4 +20,6 @@ class Service:",
+        "     def run(self):",
+        "-        items = load()",
+        "+        items = load_all(limit=100)",
+        "+        total = sum(item.price for item in items)",
+        "         for item in items:",
+        "+            logger.info(item)",
+        "             process(item)",
+    ]
+)
+
+
+def _mr() -> MergeRequest:
+    return MergeRequest(
+        mr_id="1",
+        owner="test-owner",
+        repo="test-repo",
+        title="PR",
+        author="test-user",
+        state=MergeRequestState.OPEN,
+        description="",
+        source_branch="feature",
+        target_branch="main",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+        file_diffs=[
+            FileDiff(new_file_path="src/service.py", old_file_path="src/service.py", change_type=ChangeType.MODIFY, diff_content=PATCH),
+            FileDiff(new_file_path="src/removed.py", change_type=ChangeType.DELETE, diff_content="@@ -1,1 +0,0 @@\n-gone"),
+        ],
+    )
+
+
+def _comment(line: int, content: str = "check", path: str = "src/service.py") -> AIReviewComment:
+    return AIReviewComment(new_file_path=path, new_line_number=line, content=content, type="issue")
+
+
+def test_anchor_keeps_and_snaps_lines():
+    """测试 diff 中的行保留，附近的行吸附到最近的可评论行，过远的行无法定位"""
+    anchorer = CommentAnchorer(_mr(), max_distance=10)
+    assert anchorer.anchor(_comment(22)).new_line_number == 22
+    assert anchorer.anchor(_comment(30)).new_line_number == 25
+    assert anchorer.anchor(_comment(12)).new_line_number == 20
+    assert anchorer.anchor(_comment(80)) is None
+
+
+@pytest.mark.asyncio
+async def test_context_line_position_has_old_line(monkeypatch):
+    """测试定位到上下文行的评论带上旧侧行号，GitLab 位置同时包含 old_line"""
+    anchorer = CommentAnchorer(_mr(), max_distance=10)
+    assert anchorer.anchor(_comment(21)).old_line_number is None
+    anchored = anchorer.anchor(_comment(26))
+    assert (anchored.new_line_number, anchored.old_line_number) == (25, 23)
+
+    requests = []
+
+    async def fake_request(method, url, **kwargs):
+        requests.append((method, url, kwargs.get("json")))
+
+    async def fake_version(project_id, mr_id):
+        return {"base_commit_sha": "base", "start_commit_sha": "start", "head_commit_sha": "head"}
+
+    client = GitLabClient()
+    monkeypatch.setattr(client, "_request", fake_request)
+    monkeypatch.setattr(client, "_get_latest_mr_version", fake_version)
+    comment = ReviewPipeline._from_ai_comment("review", anchored, "1")
+    await client.create_comment("test-owner", "test-repo", comment, _mr())
+
+    assert len(requests) == 1
+    method, url, body = requests[0]
+    assert url.endswith("/merge_requests/1/discussions")
+    assert body["position"]["new_line"] == 25
+    assert body["position"]["old_line"] == 23
+    assert body["position"]["old_path"] == "src/service.py"
+
+
+def test_incremental_review_anchors_against_full_diff():
+    """测试增量审查的评论按 MR 的完整 diff 定位，不按新提交之间的 diff 定位"""
+    mr = _mr()
+    inter_diff = FileDiff(
+        new_file_path="src/service.py",
+        old_file_path="src/service.py",
+        change_type=ChangeType.MODIFY,
+        diff_content="@@ -40,1 +40,2 @@\n     return items\n+    # done",
+    )
+    mr = mr.model_copy(update={"file_diffs": [inter_diff], "anchor_file_diffs": mr.file_diffs, "base_review_sha": "a" * 40})
+
+    anchorer = CommentAnchorer(mr, max_distance=20)
+    # 第 41 行只在新提交的 diff 中，MR 的 diff 中最近的可评论行是 25
+    assert anchorer.anchor(_comment(41)).new_line_number == 25
+    assert anchorer.anchor(_comment(22)).new_line_number == 22
+
+
+def test_anchor_matches_quoted_code():
+    """测试行号无效且评论引用了代码时按相似度定位到对应行"""
+    anchorer = CommentAnchorer(_mr())
+    comment = anchorer.anchor(_comment(2, "Avoid `total = sum(item.price for item in items)` before filtering"))
+    assert comment.new_line_number == 22
+
+    block = "Log at debug level:\n```python\nlogger.debug(item)\n```"
+    assert anchorer.anchor(_comment(1, block)).new_line_number == 24
+
+
+def test_anchor_keeps_valid_line_with_quoted_code():
+    """测试行号有效时不因引用的代码在其他行出现而移动"""
+    anchorer = CommentAnchorer(_mr())
+    comment = anchorer.anchor(_comment(21, "Use `logger.info(item)` like below instead of `load()`"))
+    assert comment.new_line_number == 21
+
+
+def test_anchor_quoted_match_limited_to_nearby_lines():
+    """测试模糊匹配只在原行号附近查找，过远的相似行不会被选中"""
+    anchorer = CommentAnchorer(_mr(), max_distance=2)
+    assert anchorer.anchor(_comment(200, "`logger.info(item)`")) is None
+
+
+def test_anchor_resolves_paths():
+    """测试路径前缀和后缀匹配，不在 diff 中或已删除的文件无法定位"""
+    anchorer = CommentAnchorer(_mr())
+    assert anchorer.anchor(_comment(21, path="b/src/service.py")).new_file_path == "src/service.py"
+    assert anchorer.anchor(_comment(21, path="service.py")).new_file_path == "src/service.py"
+    assert anchorer.anchor(_comment(1, path="src/other.py")) is None
+    assert anchorer.anchor(_comment(1, path="src/removed.py")) is None
+
+
+class FakeAIClient:
+    @staticmethod
+    def generate_session_id() -> str:
+        return "session"
+
+    async def chat(self, messages, session_id=None, **kwargs) -> str:
+        return json.dumps(
+            {
+                "summary": "summary",
+                "comments": [
+                    {"new_file_path": "src/service.py", "new_line_number": 23, "content": "ok line", "type": "issue"},
+                    {"new_file_path": "src/service.py", "new_line_number": 200, "content": "far away", "type": "issue"},
+                ],
+            }
+        )
+
+
+@pytest.mark.asyncio
+async def test_unanchored_comments_folded_into_summary(monkeypatch):
+    """测试无法定位的评论不发布为行内评论，而是并入总结"""
+    monkeypatch.setattr(code_review, "get_ai_client", lambda: FakeAIClient())
+    monkeypatch.setattr(code_review.settings, "ENABLE_CHUNKED_REVIEW", False)
+    monkeypatch.setattr(code_review.settings, "GPT_LANGUAGE", "中文")
+
+    result = await code_review.CodeReviewPipeline().review(_mr())
+    assert [(c.position.new_file_path, c.position.new_line_number) for c in result.comments] == [("src/service.py", 23)]
+    assert "far away" in result.summary
+    assert "第 200 行" in result.summary
@@ -0,0 +1,154 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app.infra.ai.tokenizer import HeuristicTokenizer
+from app.models.git import ChangeType, FileDiff, MergeRequest, MergeRequestState
+from app.models.pipeline import code_review
+from app.models.pipeline.minify import DiffMinifier, compile_globs
+
+
+def _file(path: str, patch: str, change_type=ChangeType.MODIFY, old_path=None) -> FileDiff:
+    return FileDiff(new_file_path=path, old_file_path=old_path or path, change_type=change_type, diff_content=patch)
+
+
+def _mr(file_diffs) -> MergeRequest:
+    return MergeRequest(
+        mr_id="1",
+        owner="test-owner",
+        repo="test-repo",
+        title="PR",
+        author="test-user",
+        state=MergeRequestState.OPEN,
+        description="",
+        source_branch="feature",
+        target_branch="main",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+        file_diffs=file_diffs,
+    )
+
+
+def _context(start: int, count: int) -> list:
+    return [f" line {n}" for n in range(start, start + count)]
+
+
+# 两处变更之间隔着 10 行上下文
+WIDE_PATCH = "\n".join(
+    ["@@ -1,16 +1,16 @@ class A:"]
+    + _context(1, 2)
+    + ["-old = 3", "+new = 3"]
+    + _context(4, 10)
+    + ["-old = 14", "+new = 14"]
+    + _context(15, 2)
+)
+
+
+def test_compile_globs():
+    """测试 glob 规则：不含 / 的模式匹配任意目录，** 跨目录，* 不跨目录"""
+    pattern = compile_globs("package-lock.json,*.min.js,vendor/**,**/node_modules/**")
+    assert pattern.match("package-lock.json")
+    assert pattern.match("web/app/package-lock.json")
+    assert pattern.match("static/js/app.min.js")
+    assert pattern.match("vendor/github.com/pkg/errors/errors.go")
+    assert pattern.match("web/node_modules/left-pad/index.js")
+    assert not pattern.match("src/vendor/client.go")
+    assert not pattern.match("src/app.js")
+    assert compile_globs(" , ") is None
+
+
+def test_trim_context_keeps_line_numbers():
+    """测试裁剪上下文后拆分为两个 hunk，变更行的行号不变"""
+    minified, omitted, collapsed, trimmed = DiffMinifier(exclude="", context_lines=2).minify_file(_file("a.py", WIDE_PATCH))
+    assert omitted is None and collapsed == 0
+    assert trimmed == 6
+
+    lines = minified.diff_content.split("\n")
+    assert lines[0] == "@@ -1,5 +1,5 @@ class A:"
+    assert lines[7] == "@@ -12,5 +12,5 @@ class A:"
+    index = minified.index()
+    assert index.is_added(3) and index.is_added(14)
+    assert not index.contains_new_line(8)
+
+    unchanged, *_ = DiffMinifier(exclude="", context_lines=10).minify_file(_file("a.py", WIDE_PATCH))
+    assert unchanged.diff_content is WIDE_PATCH
+
+
+def test_whitespace_only_changes_collapsed():
+    """测试只有空白变化的 hunk 被去掉，缩进有语义的文件保留缩进变化"""
+    reformat = "@@ -1,2 +1,2 @@\n-int a=1;\n+int a = 1;  \n-  return a;\n+\treturn a;"
+    real = "@@ -10,1 +10,1 @@\n-return 1;\n+return 2;"
+    minifier = DiffMinifier(exclude="")
+
+    minified, omitted, collapsed, _ = minifier.minify_file(_file("a.c", f"{reformat}\n{real}"))
+    assert collapsed == 1
+    assert minified.diff_content == real
+
+    minified, omitted, collapsed, _ = minifier.minify_file(_file("a.c", reformat))
+    assert minified is None and omitted.reason == "whitespace"
+
+    indent = "@@ -1,1 +1,1 @@\n-    return a\n+return a"
+    minified, omitted, collapsed, _ = minifier.minify_file(_file("a.py", indent))
+    assert omitted is None and collapsed == 0
+
+
+def test_minify_report():
+    """测试排除、重命名和二进制文件只保留说明，统计节省的 token"""
+    lockfile = "@@ -1,3 +1,3 @@\n" + "\n".join(f'-  "dep{i}": "1.0",\n+  "dep{i}": "1.1",' for i in range(50))
+    mr = _mr(
+        [
+            _file("src/app.py", WIDE_PATCH),
+            _file("web/package-lock.json", lockfile),
+            _file("docs/new.md", "", old_path="docs/old.md"),
+            _file("logo.png", "", change_type=ChangeType.ADD),
+        ]
+    )
+    file_diffs, report = DiffMinifier(exclude="package-lock.json", context_lines=1).minify(mr, HeuristicTokenizer())
+
+    assert [f.new_file_path for f in file_diffs] == ["src/app.py"]
+    assert [(o.path, o.reason) for o in report.omitted] == [
+        ("web/package-lock.json", "excluded"),
+        ("docs/new.md", "renamed"),
+        ("logo.png", "binary"),
+    ]
+    assert report.omitted[0].additions == 50
+    assert report.context_trimmed == 10
+    assert 0 < report.tokens_after < report.tokens_before
+    assert report.tokens_saved == report.tokens_before - report.tokens_after
+
+
+class FakeAIClient:
+    def __init__(self):
+        self.prompts = []
+
+    @staticmethod
+    def generate_session_id() -> str:
+        return "session"
+
+    async def chat(self, messages, session_id=None, **kwargs) -> str:
+        self.prompts.append(messages[-1].content)
+        return json.dumps({"summary": "summary", "comments": []})
+
+
+@pytest.mark.asyncio
+async def test_pipeline_sends_minified_prompt(monkeypatch):
+    """测试审查提示词中只包含压缩后的 diff 和省略文件的说明"""
+    ai_client = FakeAIClient()
+    monkeypatch.setattr(code_review, "get_ai_client", lambda: ai_client)
+    monkeypatch.setattr(code_review.settings, "ENABLE_CHUNKED_REVIEW", False)
+    monkeypatch.setattr(code_review.settings, "ENABLE_DIFF_MINIFY", True)
+    monkeypatch.setattr(code_review.settings, "DIFF_CONTEXT_LINES", 1)
+    monkeypatch.setattr(code_review.settings, "GPT_LANGUAGE", "English")
+
+    mr = _mr([_file("src/app.py", WIDE_PATCH), _file("yarn.lock", "@@ -1,1 +1,1 @@\n-a@1\n+a@2")])
+    await code_review.CodeReviewPipeline().review(mr)
+
+    prompt = ai_client.prompts[0]
+    assert "Changes not shown:\n- yarn.lock (+1 -1): generated or vendored, omitted" in prompt
+    assert "+a@2" not in prompt
+    assert " line 8" not in prompt
+    assert "+new = 14" in prompt
+    # 原始 MR 不受影响
+    assert mr.file_diffs[0].diff_content is WIDE_PATCH
+    assert mr.omitted_files_note is None
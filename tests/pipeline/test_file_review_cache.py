@@ -0,0 +1,108 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app.infra.cache.file_review_cache import patch_fingerprint
+from app.models.git import ChangeType, FileDiff, MergeRequest, MergeRequestState
+from app.models.pipeline import code_review
+
+
+def _patch(start: int, body: str) -> str:
+    return f"@@ -{start},3 +{start},4 @@ def f():\n context\n-old\n+{body}\n+added\n context"
+
+
+def _mr(patches) -> MergeRequest:
+    return MergeRequest(
+        mr_id="1",
+        owner="test-owner",
+        repo="test-repo",
+        title="PR",
+        author="test-user",
+        state=MergeRequestState.OPEN,
+        description="",
+        source_branch="feature",
+        target_branch="main",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+        file_diffs=[
+            FileDiff(new_file_path=path, old_file_path=path, change_type=ChangeType.MODIFY, diff_content=patch)
+            for path, patch in patches.items()
+        ],
+    )
+
+
+class FakeAIClient:
+    """对请求中的每个文件在第一行新增代码处（hunk 起始行 + 1）提一条意见"""
+
+    def __init__(self, path_format: str = "{}"):
+        self.reviewed = []
+        self.path_format = path_format
+
+    @staticmethod
+    def generate_session_id() -> str:
+        return "session"
+
+    async def chat(self, messages, session_id=None, **kwargs) -> str:
+        prompt = messages[-1].content
+        paths = [line.split(": ", 1)[1] for line in prompt.splitlines() if line.startswith("file_new_path")]
+        starts = [int(line.split("+")[1].split(",")[0]) for line in prompt.splitlines() if line.startswith("@@")]
+        self.reviewed.append(paths)
+        comments = [
+            {"new_file_path": self.path_format.format(path), "new_line_number": start + 1, "content": f"issue in {path}", "type": "issue"}
+            for path, start in zip(paths, starts)
+        ]
+        return json.dumps({"summary": f"reviewed {len(paths)}", "comments": comments})
+
+
+def test_fingerprint_ignores_line_offsets():
+    """测试 hunk 平移后指纹不变，内容变化时指纹变化"""
+    assert patch_fingerprint(_patch(10, "new")) == patch_fingerprint(_patch(250, "new"))
+    assert patch_fingerprint(_patch(10, "new")) != patch_fingerprint(_patch(10, "other"))
+
+
+@pytest.mark.asyncio
+async def test_rebased_mr_only_reviews_changed_files(monkeypatch, file_review_results):
+    """测试变基后只有改动的文件发送给模型，缓存的意见换算到新行号"""
+    ai_client = FakeAIClient()
+    monkeypatch.setattr(code_review, "get_ai_client", lambda: ai_client)
+    monkeypatch.setattr(code_review.settings, "ENABLE_CHUNKED_REVIEW", False)
+    pipeline = code_review.CodeReviewPipeline()
+
+    await pipeline.review(_mr({f"f_{10 * i}.py": _patch(10 * i, f"new_{i}") for i in range(1, 6)}))
+    assert len(ai_client.reviewed[-1]) == 5
+
+    # 变基：所有 hunk 下移 100 行，只有一个文件的内容变化
+    rebased = {f"f_{10 * i}.py": _patch(10 * i + 100, f"new_{i}") for i in range(1, 6)}
+    rebased["f_10.py"] = _patch(110, "changed")
+    result = await pipeline.review(_mr(rebased))
+
+    assert ai_client.reviewed[-1] == ["f_10.py"]
+    lines = {c.position.new_file_path: c.position.new_line_number for c in result.comments}
+    assert lines["f_20.py"] == 121
+    assert lines["f_50.py"] == 151
+    assert len(result.comments) == 5
+    assert "4 个文件" in result.summary or "4 file" in result.summary
+    assert file_review_results.stats()["hits"] == 4
+
+
+@pytest.mark.asyncio
+async def test_cache_resolves_finding_paths(monkeypatch, file_review_results):
+    """测试意见路径带前缀时仍按文件缓存，无法确定所属文件时不缓存"""
+    monkeypatch.setattr(code_review.settings, "ENABLE_CHUNKED_REVIEW", False)
+    pipeline = code_review.CodeReviewPipeline()
+    patches = {"src/a.py": _patch(10, "a"), "src/b.py": _patch(20, "b")}
+
+    monkeypatch.setattr(code_review, "get_ai_client", lambda: FakeAIClient("b/{}"))
+    await pipeline.review(_mr(patches))
+    result = await pipeline.review(_mr(patches))
+    assert {c.position.new_file_path for c in result.comments} == {"src/a.py", "src/b.py"}
+    assert file_review_results.stats()["hits"] == 2
+
+    # 意见指向 diff 中不存在的路径，该批文件都不缓存
+    ai_client = FakeAIClient("unknown/{}")
+    monkeypatch.setattr(code_review, "get_ai_client", lambda: ai_client)
+    other = {"src/c.py": _patch(10, "c"), "src/d.py": _patch(20, "d")}
+    await pipeline.review(_mr(other))
+    await pipeline.review(_mr(other))
+    assert len(ai_client.reviewed) == 2
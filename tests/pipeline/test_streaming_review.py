@@ -0,0 +1,107 @@
+import asyncio
+import json
+import random
+from datetime import datetime
+
+import pytest
+
+from app.infra.ai.tokenizer import HeuristicTokenizer
+from app.models.git import ChangeType, FileDiff, MergeRequest, MergeRequestState
+from app.models.pipeline import code_review
+from app.models.pipeline.base import IncrementalReviewParser
+
+RESPONSE = "```json\n" + json.dumps(
+    {
+        "summary": "两处问题",
+        "comments": [
+            {"new_file_path": "a.py", "new_line_number": 3, "content": 'use "{}" carefully \\ ok', "type": "issue"},
+            {"new_file_path": "a.py", "new_line_number": 8, "content": "nice", "type": "praise"},
+            {"new_file_path": "b.py", "new_line_number": 1, "content": "missing [check]", "type": "suggestion"},
+        ],
+    },
+    ensure_ascii=False,
+) + "\n```"
+
+
+def _split(text: str, seed: int):
+    rng = random.Random(seed)
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 12)
+        yield text[pos : pos + size]
+        pos += size
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_parser_emits_each_comment(seed):
+    """测试任意分段下评论在对象闭合时产出，字符串中的括号和转义不受影响"""
+    parser = IncrementalReviewParser()
+    emitted = []
+    for delta in _split(RESPONSE, seed):
+        for comment in parser.feed(delta):
+            emitted.append((comment, len(parser.text)))
+
+    assert [c.new_line_number for c, _ in emitted] == [3, 8, 1]
+    assert emitted[0][0].content == 'use "{}" carefully \\ ok'
+    # 第一条评论在响应结束前就已产出
+    assert emitted[0][1] < len(RESPONSE) // 2
+
+    result = parser.finish()
+    assert result.summary == "两处问题"
+    assert len(result.comments) == 3
+
+
+class StreamingFakeAIClient:
+    def __init__(self):
+        self.tokenizer = HeuristicTokenizer()
+        self.finished_at = None
+
+    @staticmethod
+    def generate_session_id() -> str:
+        return "session"
+
+    async def chat_stream(self, messages, session_id=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        for delta in _split(RESPONSE, 0):
+            await asyncio.sleep(0.005)
+            yield delta
+        self.finished_at = loop.time()
+
+
+@pytest.mark.asyncio
+async def test_streaming_review_posts_comments_early(monkeypatch):
+    """测试流式审查在生成结束前回调评论，结果复用已回调的评论对象"""
+    fake_client = StreamingFakeAIClient()
+    monkeypatch.setattr(code_review, "get_ai_client", lambda: fake_client)
+    monkeypatch.setattr(code_review.settings, "ENABLE_STREAMING_REVIEW", True)
+    monkeypatch.setattr(code_review.settings, "ENABLE_CHUNKED_REVIEW", False)
+
+    mr = MergeRequest(
+        mr_id="1",
+        owner="test-owner",
+        repo="test-repo",
+        title="Test PR",
+        author="test-user",
+        state=MergeRequestState.OPEN,
+        description="",
+        source_branch="feature",
+        target_branch="main",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+        file_diffs=[
+            FileDiff(new_file_path=path, change_type=ChangeType.MODIFY, diff_content="@@ -0,0 +1,3 @@\n+x\n+y\n+z")
+            for path in ("a.py", "b.py")
+        ],
+    )
+
+    received = []
+
+    async def on_comment(comment):
+        received.append((comment, asyncio.get_running_loop().time()))
+
+    result = await code_review.CodeReviewPipeline().review(mr, on_comment=on_comment)
+
+    assert [c.position.new_file_path for c, _ in received] == ["a.py", "b.py"]
+    assert received[0][1] < fake_client.finished_at
+    assert [id(c) for c in result.comments] == [id(c) for c, _ in received]
+    assert result.summary == "两处问题"
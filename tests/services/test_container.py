@@ -0,0 +1,23 @@
+import pytest
+
+from app.infra.ai.client import get_ai_client
+from app.infra.rate_limiter import get_rate_limiter
+from app.services.container import ServiceContainer
+from app.services.reviewer_service import get_reviewer_service
+
+
+@pytest.mark.asyncio
+async def test_container_shares_and_drains_pools():
+    """测试请求复用生命周期内的共享实例，关闭时释放连接池"""
+    container = ServiceContainer()
+    assert get_reviewer_service() is container.reviewer_service
+    assert get_ai_client() is container.ai_client
+    assert get_ai_client().rate_limiter is get_rate_limiter() is container.rate_limiter
+    assert container.reviewer_service.redis_client is container.redis_client
+
+    await container.git_client.warm_up()
+    session = container.git_client._session
+    assert session is not None and not session.closed
+
+    await container.shutdown()
+    assert session.closed
@@ -2,11 +2,14 @@ import asyncio
 from datetime import datetime
 
 import pytest
+from fakeredis.aioredis import FakeRedis
 
+from app.infra.cache.redis_client import RedisClient
+from app.infra.rate_limiter import RateLimiter
 from app.models.comment import Comment, CommentType
-from app.models.git import MergeRequest, MergeRequestState
+from app.models.git import ChangeType, FileDiff, MergeRequest, MergeRequestState
 from app.models.review import ReviewResult
-from app.services.reviewer_service import ReviewerService
+from app.services.reviewer_service import ReviewerService, ReviewSkipped
 
 
 @pytest.fixture
@@ -69,3 +72,118 @@ async def test_handle_comment_normal_reply(reviewer_service, test_mr):
 #     except Exception as e:
 #         print(f"Test failed: {str(e)}")
 #         return False
+
+
+class _StubGitClient:
+    """返回固定 MR，比较接口返回第一个文件的新变更"""
+
+    def __init__(self, mr: MergeRequest):
+        self.mr = mr
+        self.compared = []
+
+    async def get_merge_request(self, owner, repo, mr_id):
+        return self.mr.model_copy()
+
+    async def invalidate(self, owner, repo, mr_id):
+        pass
+
+    async def get_commit_diff(self, owner, repo, base_sha, head_sha):
+        self.compared.append((base_sha, head_sha))
+        return [
+            FileDiff(new_file_path="a.py", change_type=ChangeType.MODIFY, diff_content="@@ -1 +1 @@\n-x\n+y"),
+            FileDiff(new_file_path="merged_from_main.py", change_type=ChangeType.MODIFY, diff_content="+z"),
+        ]
+
+
+class _StubBot:
+    def __init__(self):
+        self.reviewed = []
+
+    async def review_mr(self, mr, admission=None):
+        self.reviewed.append(mr)
+        return ReviewResult(
+            mr_id=mr.mr_id, summary=f"summary@{mr.head_sha}", overall_status="commented", review_date=datetime.utcnow()
+        )
+
+
+@pytest.fixture
+def incremental_service(test_mr):
+    redis = FakeRedis()
+    service = ReviewerService()
+    service.redis_client = RedisClient()
+    service.redis_client.redis = redis
+    service.rate_limiter = RateLimiter(redis=redis)
+    test_mr.file_diffs = [
+        FileDiff(new_file_path="a.py", change_type=ChangeType.MODIFY, diff_content="@@ -1 +1 @@\n-x\n+y"),
+        FileDiff(new_file_path="b.py", change_type=ChangeType.MODIFY, diff_content="@@ -1 +1 @@\n-u\n+v"),
+    ]
+    test_mr.head_sha = "1" * 40
+    service.git_client = _StubGitClient(test_mr)
+    service.bot = _StubBot()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_incremental_review_only_new_commits(incremental_service):
+    """测试新推送只审查上次审查之后的变更，并带上上次的总结"""
+    service = incremental_service
+    owner, repo = service.git_client.mr.owner, service.git_client.mr.repo
+
+    # 没有审查记录时退回全量审查
+    await service.review_mr(owner, repo, "1", incremental=True)
+    assert len(service.bot.reviewed[-1].file_diffs) == 2
+    assert service.bot.reviewed[-1].base_review_sha is None
+
+    service.git_client.mr.head_sha = "2" * 40
+    await service.review_mr(owner, repo, "1", head_sha="2" * 40, incremental=True)
+    reviewed = service.bot.reviewed[-1]
+    assert service.git_client.compared == [("1" * 40, "2" * 40)]
+    assert [f.new_file_path for f in reviewed.file_diffs] == ["a.py"]
+    assert reviewed.base_review_sha == "1" * 40
+    assert reviewed.previous_summary == f"summary@{'1' * 40}"
+    assert [f.new_file_path for f in reviewed.anchor_file_diffs] == ["a.py", "b.py"]
+
+    state = await service.redis_client.get_review_state(owner, repo, "1")
+    assert state["head_sha"] == "2" * 40
+
+    # head 未变化时（如 #ai: review）执行全量审查
+    await service.review_mr(owner, repo, "1", incremental=True)
+    assert len(service.bot.reviewed[-1].file_diffs) == 2
+
+
+@pytest.mark.asyncio
+async def test_incremental_fallback_checks_review_limit(incremental_service, monkeypatch):
+    """测试增量审查退回全量审查时仍受单个 MR 审查次数限制，被拒绝的审查不计数"""
+    service = incremental_service
+    owner, repo = service.git_client.mr.owner, service.git_client.mr.repo
+    monkeypatch.setattr(service.settings, "MAX_MR_REVIEWS", 1)
+    monkeypatch.setattr(service.settings, "MAX_MR_REVIEWS_PER_HOUR", 100)
+
+    await service.review_mr(owner, repo, "1", incremental=True)
+
+    # 强制推送后无法获取增量 diff，退回全量审查
+    async def rewritten(*args):
+        return None
+
+    monkeypatch.setattr(service.git_client, "get_commit_diff", rewritten)
+    service.git_client.mr.head_sha = "2" * 40
+    with pytest.raises(ReviewSkipped, match="maximum review limit"):
+        await service.review_mr(owner, repo, "1", head_sha="2" * 40, incremental=True)
+    assert len(service.bot.reviewed) == 1
+    assert await service.redis_client.get_mr_review_count(owner, repo, "1") == 1
+
+    # 手动触发的审查不检查次数限制
+    await service.review_mr(owner, repo, "1", check_limit=False, incremental=True)
+    assert len(service.bot.reviewed) == 2
+
+
+@pytest.mark.asyncio
+async def test_closed_mr_is_skipped(incremental_service):
+    """测试已关闭的 MR 不再审查，也不计入审查次数"""
+    service = incremental_service
+    mr = service.git_client.mr
+    mr.state = MergeRequestState.CLOSED
+    with pytest.raises(ReviewSkipped, match="closed"):
+        await service.review_mr(mr.owner, mr.repo, "1")
+    assert service.bot.reviewed == []
+    assert await service.redis_client.get_mr_review_count(mr.owner, mr.repo, "1") == 0